@@ -12,6 +12,8 @@ import json
 import os
 
 from app.core.config import settings
+from app.core.embeddings import embedding_registry_stats
+from app.core.query_cache import split_stats_line
 
 router = APIRouter()
 
@@ -31,9 +33,10 @@ class ChatRequest(BaseModel):
     system_prompt: str = Field(
         default=(
             "You are AuraRAG, a highly capable AI assistant. "
-            "You have access to two tools: search_documents (searches the user's "
-            "uploaded document base) and web_search (searches the internet in "
-            "real-time via Google). Use them whenever needed to give accurate, "
+            "You have access to three tools: search_documents (searches the user's "
+            "uploaded document base), search_documents_batch (the same search for "
+            "several sub-questions in one call) and web_search (searches the "
+            "internet in real-time via Google). Use them whenever needed to give accurate, "
             "cited answers. Always mention the source of your information."
         )
     )
@@ -67,6 +70,8 @@ async def redis_append(redis, session_id: str, role: str, text: str):
     key = f"chat:{session_id}"
     await redis.rpush(key, json.dumps({"role": role, "text": text}))
     await redis.ltrim(key, -50, -1)   # keep last 50 messages
+    if settings.session_ttl_seconds > 0:
+        await redis.expire(key, settings.session_ttl_seconds)
 
 
 async def redis_history(redis, session_id: str) -> List[Dict]:
@@ -85,9 +90,15 @@ def mcp_tool_to_gemini(tool) -> types.FunctionDeclaration:
     for name, prop in schema.get("properties", {}).items():
         prop_type = prop.get("type", "string").upper()
         gemini_type = getattr(types.Type, prop_type, types.Type.STRING)
+        items = None
+        if gemini_type == types.Type.ARRAY:
+            # Gemini rejects array parameters without an item schema
+            item_type = prop.get("items", {}).get("type", "string").upper()
+            items = types.Schema(type=getattr(types.Type, item_type, types.Type.STRING))
         properties[name] = types.Schema(
             type=gemini_type,
-            description=prop.get("description", "")
+            description=prop.get("description", ""),
+            items=items,
         )
 
     return types.FunctionDeclaration(
@@ -119,7 +130,7 @@ def parse_sources(tool_name: str, tool_result: str) -> List[SourceItem]:
                     url=lines.get("Link"),
                     preview=lines.get("Snippet"),
                 ))
-    elif tool_name == "search_documents":
+    elif tool_name in ("search_documents", "search_documents_batch"):
         for block in tool_result.split("\n\n"):
             if block.startswith("[Segment"):
                 first_line = block.splitlines()[0]
@@ -232,7 +243,7 @@ async def run_agentic_chat(
                     tool_args = dict(fc_part.function_call.args)
 
                     # Inject top_k / session_id where relevant
-                    if tool_name == "search_documents":
+                    if tool_name in ("search_documents", "search_documents_batch"):
                         tool_args.setdefault("top_k", top_k)
                         tool_args.setdefault("session_id", session_id)
 
@@ -243,9 +254,13 @@ async def run_agentic_chat(
                     try:
                         mcp_result = await mcp_session.call_tool(tool_name, tool_args)
                         result_text = mcp_result.content[0].text
+                        # Cache stats are for the trace, not for Gemini
+                        result_text, cache_line = split_stats_line(result_text)
                         reasoning.append(
                             f"📥 `{tool_name}` returned {len(result_text)} chars."
                         )
+                        if cache_line:
+                            reasoning.append(f"🧠 {cache_line}")
                         # Parse sources
                         all_sources.extend(parse_sources(tool_name, result_text))
 
@@ -318,4 +333,4 @@ async def chat_endpoint(
 
 @router.get("/health")
 async def health():
-    return {"status": "ok"}
\ No newline at end of file
+    return {"status": "ok", "embeddings": embedding_registry_stats()}
\ No newline at end of file
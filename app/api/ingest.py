@@ -4,17 +4,22 @@ import uuid
 
 from app.core.extract import extract_text_from_pdf, extract_text_from_txt
 from app.core.utils import chunk_sentences, chunk_sliding
-from app.core.embeddings import HFEmbeddingProvider
-from app.core.pineconeAdapter import PineconeVectorAdapter
-from app.core.db import AsyncSessionLocal, Documents
+from app.core.embeddings import EmbeddingQueueFull, HFEmbeddingProvider
+from app.core import embeddings as embedding_registry
+from app.core.config import settings
+from app.core.vector_backend import VectorBackend, get_vector_backend
+from app.core import db
+from app.core.db import Documents
 
 router = APIRouter()
 
-def get_embedding_provider():
-    return HFEmbeddingProvider(model_name="sentence-transformers/all-MiniLM-L6-v2")
+def get_embedding_provider() -> HFEmbeddingProvider:
+    # Shared per process; building a provider per request reloaded the model
+    return embedding_registry.get_embedding_provider(settings.embedding_model)
 
-def get_vector_adapter():
-    return PineconeVectorAdapter()
+def get_vector_adapter() -> VectorBackend:
+    # Shared so the adapter's session matrix cache survives across requests
+    return get_vector_backend()
 
 @router.post("/upload")
 async def upload_document(
@@ -25,7 +30,7 @@ async def upload_document(
     chunk_size: int = Form(500),
     overlap: int = Form(50),
     embedding_provider: HFEmbeddingProvider = Depends(get_embedding_provider),
-    vector_adapter: PineconeVectorAdapter = Depends(get_vector_adapter),
+    vector_adapter: VectorBackend = Depends(get_vector_adapter),
 ):
 
     data = await file.read()
@@ -47,26 +52,29 @@ async def upload_document(
 
     session_id = session_id or str(uuid.uuid4())
 
-    embeddings_raw = await embedding_provider.embed(chunks)
-
-    embeddings_clean = []
-    for emb in embeddings_raw:
-        if hasattr(emb, "tolist"):
-            embeddings_clean.append([float(x) for x in emb.tolist()])
-        else:
-            embeddings_clean.append([float(x) for x in emb])
+    # A contiguous float32 (n, dim) matrix, handed to the backend as is
+    try:
+        vectors, cache_stats = await embedding_provider.embed_with_stats(chunks)
+    except EmbeddingQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
 
     ids = [f"{file.filename}_chunk_{i}" for i in range(len(chunks))]
     metadatas = [{"text_preview": chunk, "source": file.filename, "session_id": session_id} for chunk in chunks]
 
-    await vector_adapter.upsert(ids=ids, vectors=embeddings_clean, metadatas=metadatas)
+    await vector_adapter.upsert(ids=ids, vectors=vectors, metadatas=metadatas)
 
-    async with AsyncSessionLocal() as session:
-        doc = Documents(
-            source=source or file.filename,
-            metadata={"num_chunks": len(chunks), "session_id": session_id, "text_preview": chunks[0]}
-        )
-        session.add(doc)
-        await session.commit()
+    # No database_url: there is no Documents table to record the upload in
+    if db.engine is not None:
+        async with db.AsyncSessionLocal() as session:
+            doc = Documents(
+                source=source or file.filename,
+                metadata={"num_chunks": len(chunks), "session_id": session_id, "text_preview": chunks[0]}
+            )
+            session.add(doc)
+            await session.commit()
 
-    return {"message": f"Uploaded and processed {file.filename} with {len(chunks)} chunks.", "session_id": session_id}
+    return {
+        "message": f"Uploaded and processed {file.filename} with {len(chunks)} chunks.",
+        "session_id": session_id,
+        "embedding_cache": cache_stats.to_dict(),
+    }
@@ -0,0 +1,28 @@
+import asyncio
+
+from fastapi import APIRouter, Depends
+
+from app.api.chat import get_redis
+from app.core.document_versions import delete_session_versions, versioning_enabled
+from app.core.near_dedup import get_dedup_index
+from app.core.session_reaper import chat_history_keys
+from app.core.vector_backend import get_vector_backend
+
+router = APIRouter()
+
+
+@router.delete("/sessions/{session_id}")
+async def delete_session(
+    session_id: str,
+    redis=Depends(get_redis),
+    vector_adapter=Depends(get_vector_backend),
+):
+    """Delete a session's document chunks, document versions, dedup index entries and chat history."""
+    chunks_deleted = await vector_adapter.delete_session(session_id)
+    if versioning_enabled():
+        await delete_session_versions([session_id])
+    dedup_index = get_dedup_index()
+    if dedup_index is not None:
+        await asyncio.get_running_loop().run_in_executor(None, dedup_index.delete_sessions, [session_id])
+    await redis.delete(*chat_history_keys(session_id))
+    return {"session_id": session_id, "chunks_deleted": chunks_deleted}
@@ -1,149 +1,574 @@
 from fastapi import APIRouter, UploadFile, File, Query, HTTPException
 from pydantic import BaseModel
-from typing import List
-import io
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple, Union
+import asyncio
+import json
+import os
+import tarfile
+import tempfile
+import time
+import zipfile
 
+from app.core.archives import expand_archive, is_archive
 from app.core.config import settings
-from app.core.embeddings import HFEmbeddingProvider
-from app.core.pineconeAdapter import PineconeVectorAdapter
+from app.core.document_versions import (
+    DocumentVersion, file_sha256, latest_version, record_version, versioning_enabled,
+)
+from app.core.embeddings import EmbeddingQueueFull, get_embedding_provider
+from app.core.extract import DocumentTooLarge
+from app.core.ingest_jobs import IngestJob, IngestJobQueue, JobRetry, JobStore
+from app.core.ingest_pipeline import (
+    SUPPORTED_EXTENSIONS, IngestError, IngestProgress, IngestSource, content_chunk_ids, file_extension,
+    ingest_documents, remove_spool, spool_upload,
+)
+from app.core.near_dedup import DedupRun, get_dedup_index
+from app.core.pdf_extractor import get_pdf_extractor
+from app.core.vector_backend import get_vector_backend
 
 router = APIRouter()
 
-# ── Lazy singletons ───────────────────────────────────────────────────────────
-_embeddings = None
-_vector_adapter = None
-
-
+# ── Shared singletons ─────────────────────────────────────────────────────────
 def get_embeddings():
-    global _embeddings
-    if _embeddings is None:
-        _embeddings = HFEmbeddingProvider()
-    return _embeddings
+    return get_embedding_provider(settings.embedding_model)
 
 
 def get_vector_adapter():
-    global _vector_adapter
-    if _vector_adapter is None:
-        _vector_adapter = PineconeVectorAdapter(
-            api_key=settings.pinecone_api_key,
-            index_name=settings.pinecone_index_name,
-            dimension=settings.embedding_dimension,
+    return get_vector_backend()
+
+
+_ingest_queue: Optional[IngestJobQueue] = None
+
+
+def get_ingest_queue() -> IngestJobQueue:
+    """Process-wide job queue; its workers are started and stopped by the app lifespan."""
+    global _ingest_queue
+    if _ingest_queue is None:
+        os.makedirs(settings.ingest_job_dir, exist_ok=True)
+        store = JobStore(
+            os.path.join(settings.ingest_job_dir, "jobs.db"),
+            lease_seconds=settings.ingest_job_lease_seconds,
+            max_running=settings.ingest_max_running,
         )
-    return _vector_adapter
+        _ingest_queue = IngestJobQueue(
+            store, {"upload": run_upload_job, "bulk": run_bulk_job},
+            workers=settings.ingest_workers,
+            max_queued=settings.ingest_max_queued,
+            ttl_seconds=settings.ingest_job_ttl_seconds,
+        )
+    return _ingest_queue
 
 
 # ── Response schema ───────────────────────────────────────────────────────────
 class UploadResponse(BaseModel):
     filename: str
     chunks: int
+    pages: int = 0
     session_id: str
     message: str
+    embedding_cache: Optional[Dict[str, float]] = None
+    # With document versioning: chunks kept from the previous version, chunks
+    # of it deleted, and the version number this upload became
+    chunks_reused: int = 0
+    chunks_removed: int = 0
+    version: Optional[int] = None
+    # With chunk dedup: near-duplicates found (skipped or linked), and their
+    # share of the chunks checked (the ones not reused)
+    chunks_duplicate: int = 0
+    dedup_ratio: Optional[float] = None
+
+
+class BulkFileResult(BaseModel):
+    filename: str
+    status: str  # ingested, unchanged, failed or skipped
+    chunks: int = 0
+    pages: int = 0
+    error: Optional[str] = None
+    chunks_reused: int = 0
+    chunks_removed: int = 0
+    version: Optional[int] = None
+    chunks_duplicate: int = 0
+
+
+class BulkUploadResponse(BaseModel):
+    session_id: str
+    files: List[BulkFileResult]
+    documents: int  # documents ingested
+    unchanged: int  # documents identical to their latest version, not ingested again
+    failed: int
+    chunks: int
+    chunks_reused: int
+    chunks_duplicate: int
+    dedup_ratio: Optional[float]
+    pages: int
+    batches: int
+    seconds: float
+    docs_per_second: float
+    chunks_per_second: float
+    embedding_cache: Optional[Dict[str, float]] = None
+
+
+class JobResponse(BaseModel):
+    job_id: str
+    kind: str  # "upload" (one file) or "bulk"
+    status: str  # queued, running, succeeded or failed
+    filename: str
+    session_id: str
+    size_bytes: int
+    attempts: int
+    # documents, pages, chunks, chunks_embedded, chunks_upserted, chunks_reused, chunks_duplicate,
+    # batches, embedding_cache
+    progress: Dict[str, Any]
+    result: Optional[Union[UploadResponse, BulkUploadResponse]] = None
+    error: Optional[str] = None
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    @classmethod
+    def from_job(cls, job: IngestJob) -> "JobResponse":
+        return cls(
+            job_id=job.id,
+            kind=job.kind,
+            status=job.status,
+            filename=job.filename,
+            session_id=job.session_id,
+            size_bytes=job.size,
+            attempts=job.attempts,
+            progress=job.progress,
+            result=job.result,
+            error=job.error,
+            created_at=job.created_at,
+            started_at=job.started_at,
+            finished_at=job.finished_at,
+        )
+
+
+# ── Ingestion jobs ────────────────────────────────────────────────────────────
+def positional_prefix(session_id: str, filename: str) -> str:
+    """What every positional chunk id of the document starts with (before its index)."""
+    return f"{session_id}_{filename}_chunk"
 
 
-# ── Text extraction ───────────────────────────────────────────────────────────
-def extract_text(file_bytes: bytes, filename: str) -> str:
-    """Extract raw text from PDF or plain text files."""
-    ext = filename.lower().split(".")[-1]
+def chunk_naming(session_id: str, filename: str, content_ids: bool = False
+                 ) -> Tuple[Callable[[int, str], str], Callable[[int, str], Dict[str, Any]]]:
+    """
+    chunk_id and chunk_metadata of a document's chunks. With content_ids a
+    chunk is named by a hash of its text, so the chunks an edit leaves alone
+    keep their ids from one version of the document to the next.
+    """
+    def chunk_id(i: int, chunk: str) -> str:
+        return f"{positional_prefix(session_id, filename)}{i}"
+
+    def chunk_metadata(i: int, chunk: str) -> Dict[str, Any]:
+        return {
+            "text_preview": chunk,
+            "source": filename,
+            "session_id": session_id,
+            "chunk_index": i,
+        }
+
+    if content_ids:
+        chunk_id = content_chunk_ids(f"{session_id}_{filename}")
+    return chunk_id, chunk_metadata
+
+
+class DocumentIngest:
+    """
+    One document of an ingestion job. With document versioning on, the
+    latest stored version's chunk ids are the source's known_ids, so only
+    chunks that are new since then are embedded and stored; commit() then
+    deletes the chunks the edit removed and records the new version.
+    """
+    def __init__(self, session_id: str, filename: str, path: str):
+        self.session_id = session_id
+        self.filename = filename
+        self.path = path
+        self.versioned = versioning_enabled()
+        self.content_hash: Optional[str] = None
+        self.previous: Optional[DocumentVersion] = None
+        self.version: Optional[int] = None
+        self.chunks_removed = 0
+        self.source = IngestSource(path, file_extension(filename),
+                                   *chunk_naming(session_id, filename, content_ids=self.versioned))
+
+    async def load_previous(self):
+        if self.versioned:
+            self.content_hash = await file_sha256(self.path)
+            self.previous = await latest_version(self.session_id, self.filename)
+            if self.previous is not None:
+                self.source.known_ids = set(self.previous.chunk_ids)
+
+    @property
+    def unchanged(self) -> bool:
+        """The file is byte for byte its latest version: nothing to ingest."""
+        return self.previous is not None and self.previous.content_hash == self.content_hash
+
+    def stored_ids(self) -> List[str]:
+        """Ids this run may have stored so far (new chunks are embedded in document order)."""
+        return self.source.new_ids()[:self.source.progress.chunks_embedded]
 
-    if ext == "pdf":
+    async def commit(self, vector_adapter):
+        """
+        Record the new version and delete the chunks it no longer has. Its
+        chunk ids include near-duplicates a skip run dropped (skipped_ids), so
+        the next version counts them as reused instead of checking them again.
+        """
+        if not self.versioned:
+            return
+        self.version, replaced = await record_version(
+            self.session_id, self.filename, self.content_hash, self.source.chunk_ids,
+            meta={"pages": self.source.progress.pages, "chunks": self.source.progress.chunks},
+        )
+        # Diff against the version this run started from and the one actually
+        # superseded, in case another run committed in between
+        current = set(self.source.chunk_ids)
+        removed = []
+        for version in (self.previous, replaced):
+            if version is not None:
+                removed.extend(vid for vid in version.chunk_ids if vid not in current and vid not in removed)
+        if removed:
+            await vector_adapter.delete(removed)
+            dedup_index = get_dedup_index()
+            if dedup_index is not None:
+                await asyncio.get_running_loop().run_in_executor(None, dedup_index.delete, removed)
+        self.chunks_removed = len(removed)
+
+
+def _dedup_ratio(chunks_duplicate: int, chunks_checked: int) -> Optional[float]:
+    if not settings.chunk_dedup:
+        return None
+    return round(chunks_duplicate / chunks_checked, 4) if chunks_checked else 0.0
+
+
+async def _commit_dedup(dedup: Optional[DedupRun], documents: List[DocumentIngest]):
+    """Keep the near-duplicate index entries of the documents that were stored; drop the rest."""
+    if dedup is not None:
+        chunk_ids = [vid for d in documents for vid in d.source.new_ids()]
+        await asyncio.get_running_loop().run_in_executor(None, dedup.commit, chunk_ids)
+
+
+async def _ingest(session_id: str, documents: List[DocumentIngest], vector_adapter, progress: IngestProgress,
+                  **options) -> Optional[DedupRun]:
+    """
+    Run the pipeline over the documents that changed, rolling all of them
+    back on IngestError. Returns the run's near-duplicate detection, if on,
+    for _commit_dedup() once the caller knows which documents it keeps.
+    """
+    sources = [d.source for d in documents]
+    dedup_index = get_dedup_index()
+    dedup = None
+    if dedup_index is not None:
+        # Chunks of the versions being replaced stand in for nothing until the
+        # new version turns out to keep them (DedupRun.keep). Unversioned
+        # documents reuse positional ids, so none of their old chunks can.
+        replaced = [vid for d in documents if d.previous is not None for vid in d.previous.chunk_ids]
+        overwritten = [positional_prefix(session_id, d.filename) for d in documents if not d.versioned]
+        dedup = dedup_index.run(session_id, settings.dedup_scope, settings.chunk_dedup, exclude=replaced,
+                                overwrite_prefixes=overwritten)
+    try:
+        await ingest_documents(
+            sources,
+            embeddings=get_embeddings(),
+            vector_backend=vector_adapter,
+            queue_depth=settings.ingest_queue_depth,
+            boundaries="content" if versioning_enabled() else "fixed",
+            progress=progress,
+            pdf_extractor=get_pdf_extractor(),
+            dedup=dedup,
+            **options,
+        )
+    except IngestError as e:
+        # Drop the batches already stored rather than leave half a document searchable
+        stored = [vid for d in documents for vid in d.stored_ids()]
+        if stored:
+            await vector_adapter.delete(stored)
+        await _commit_dedup(dedup, [])
+        if isinstance(e.__cause__, EmbeddingQueueFull):
+            raise JobRetry(str(e.__cause__))
+        raise
+    return dedup
+
+
+async def run_upload_job(job: IngestJob, progress: IngestProgress) -> Dict[str, Any]:
+    """
+    Extract, chunk, embed and upsert a spooled upload, streamed batch by
+    batch so memory stays bounded however large the document is. A new
+    version of a document already in the session only costs its changes.
+    """
+    vector_adapter = get_vector_adapter()
+    document = DocumentIngest(job.session_id, job.filename, job.path)
+    await document.load_previous()
+    if document.unchanged:
+        previous = document.previous
+        return UploadResponse(
+            filename=job.filename,
+            chunks=len(previous.chunk_ids),
+            session_id=job.session_id,
+            message=f"{job.filename} is unchanged since version {previous.version}",
+            chunks_reused=len(previous.chunk_ids),
+            version=previous.version,
+        ).model_dump()
+
+    dedup = await _ingest(job.session_id, [document], vector_adapter, progress,
+                          batch_size=settings.ingest_batch_size)
+    source = document.source
+    if source.error is not None:
+        if source.new_ids():
+            await vector_adapter.delete(source.new_ids())
+        await _commit_dedup(dedup, [])
+        if isinstance(source.error, DocumentTooLarge):
+            raise source.error
+        raise IngestError("extraction", source.error) from source.error
+    if not progress.chunks:
+        await _commit_dedup(dedup, [])
+        raise ValueError("Could not extract any text from the file.")
+    await _commit_dedup(dedup, [document])
+    await document.commit(vector_adapter)
+
+    message = f"Successfully ingested {progress.chunks} chunks from {job.filename}"
+    if document.previous is not None:
+        message += (f" ({progress.chunks - progress.chunks_reused} new, {progress.chunks_reused} unchanged, "
+                    f"{document.chunks_removed} removed since version {document.previous.version})")
+    if progress.chunks_duplicate:
+        message += (f"; {progress.chunks_duplicate} near-duplicate chunks "
+                    f"{'linked' if settings.chunk_dedup == 'link' else 'skipped'}")
+    return UploadResponse(
+        filename=job.filename,
+        chunks=progress.chunks,
+        pages=progress.pages,
+        session_id=job.session_id,
+        message=message,
+        embedding_cache=progress.cache.to_dict(),
+        chunks_reused=progress.chunks_reused,
+        chunks_removed=document.chunks_removed,
+        version=document.version,
+        chunks_duplicate=progress.chunks_duplicate,
+        dedup_ratio=_dedup_ratio(progress.chunks_duplicate, progress.chunks - progress.chunks_reused),
+    ).model_dump()
+
+
+def _is_document(name: str) -> bool:
+    # Skips the resource forks macOS adds to zips (__MACOSX/, ._name)
+    base = os.path.basename(name)
+    return (file_extension(name) in SUPPORTED_EXTENSIONS and not base.startswith("._")
+            and not name.startswith("__MACOSX/"))
+
+
+def _expand_bulk_upload(job_dir: str) -> Tuple[List[Tuple[str, str]], List[BulkFileResult]]:
+    """
+    The spooled files of a bulk job, with archives expanded: ([(name, path)],
+    results so far). Names must be unique: a document's chunk ids and
+    versions are keyed by (session, name), so a second file of the same name
+    would overwrite or diff away the first one's chunks. Later files with a
+    name already taken are reported as failed.
+    """
+    with open(os.path.join(job_dir, "manifest.json")) as f:
+        manifest = json.load(f)
+    documents: List[Tuple[str, str]] = []
+    results: List[BulkFileResult] = []
+    names: Set[str] = set()
+
+    def add(name: str, path: str):
+        if name in names:
+            results.append(BulkFileResult(filename=name, status="failed",
+                                          error="Another file in this upload has the same name."))
+        else:
+            names.add(name)
+            documents.append((name, path))
+
+    for n, entry in enumerate(manifest):
+        if not is_archive(entry["filename"]):
+            add(entry["filename"], entry["path"])
+            continue
+        remaining = settings.bulk_max_files - len(documents)
         try:
-            import pypdf
-            reader = pypdf.PdfReader(io.BytesIO(file_bytes))
-            return "\n".join(
-                page.extract_text() or "" for page in reader.pages
-            )
-        except ImportError:
-            raise HTTPException(
-                status_code=500,
-                detail="pypdf not installed. Run: pip install pypdf"
+            if remaining <= 0:
+                raise DocumentTooLarge(f"Upload has more than {settings.bulk_max_files} documents.")
+            # A retried job expands its archives again from scratch
+            member_dir = os.path.join(job_dir, f"archive{n:03d}")
+            remove_spool(member_dir)
+            os.makedirs(member_dir)
+            members, skipped = expand_archive(
+                entry["path"], member_dir,
+                accept=_is_document,
+                max_files=remaining, max_bytes=settings.bulk_max_mb * 2**20,
             )
+        except (DocumentTooLarge, zipfile.BadZipFile, tarfile.TarError) as e:
+            results.append(BulkFileResult(filename=entry["filename"], status="failed", error=str(e)))
+            continue
+        for name, path in members:
+            add(name, path)
+        results.extend(BulkFileResult(filename=name, status="skipped", error="Not a supported document")
+                       for name in skipped)
+    return documents, results
 
-    elif ext in ("txt", "md"):
-        return file_bytes.decode("utf-8", errors="ignore")
 
-    else:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Unsupported file type: .{ext}. Supported: pdf, txt, md"
-        )
+async def run_bulk_job(job: IngestJob, progress: IngestProgress) -> Dict[str, Any]:
+    """
+    Ingest every file of a bulk upload in one pipeline run: documents are
+    extracted side by side and their chunks pooled into large embed batches,
+    each stored with a single upsert. A document that fails is reported and
+    its chunks removed; the others are kept.
+    """
+    loop = asyncio.get_running_loop()
+    started = time.perf_counter()
+    files, results = await loop.run_in_executor(None, _expand_bulk_upload, job.path)
+
+    documents = []
+    for name, path in files:
+        document = DocumentIngest(job.session_id, name, path)
+        await document.load_previous()
+        if document.unchanged:
+            previous = document.previous
+            results.append(BulkFileResult(filename=name, status="unchanged", chunks=len(previous.chunk_ids),
+                                          chunks_reused=len(previous.chunk_ids), version=previous.version))
+        else:
+            documents.append(document)
+
+    vector_adapter = get_vector_adapter()
+    dedup = await _ingest(job.session_id, documents, vector_adapter, progress,
+                          batch_size=settings.bulk_batch_size,
+                          extract_concurrency=settings.bulk_extract_concurrency)
 
+    stale = [vid for d in documents if d.source.error is not None for vid in d.source.new_ids()]
+    if stale:
+        await vector_adapter.delete(stale)
+    await _commit_dedup(dedup, [d for d in documents if d.source.error is None])
+    for document in documents:
+        source = document.source
+        if source.error is not None:
+            results.append(BulkFileResult(filename=document.filename, status="failed", error=str(source.error)))
+        elif not source.progress.chunks:
+            results.append(BulkFileResult(filename=document.filename, status="failed",
+                                          error="Could not extract any text from the file."))
+        else:
+            await document.commit(vector_adapter)
+            results.append(BulkFileResult(
+                filename=document.filename, status="ingested",
+                chunks=source.progress.chunks, pages=source.progress.pages,
+                chunks_reused=source.progress.chunks_reused, chunks_removed=document.chunks_removed,
+                version=document.version, chunks_duplicate=source.progress.chunks_duplicate,
+            ))
 
-# ── Chunking ──────────────────────────────────────────────────────────────────
-def split_into_chunks(text: str, chunk_size: int = 500, overlap: int = 50) -> List[str]:
-    """Split text into overlapping word chunks."""
-    words = text.split()
-    chunks = []
-    start = 0
-    while start < len(words):
-        end = start + chunk_size
-        chunk = " ".join(words[start:end])
-        if chunk.strip():
-            chunks.append(chunk)
-        start += chunk_size - overlap
-    return chunks
+    ingested = [r for r in results if r.status == "ingested"]
+    seconds = time.perf_counter() - started
+    chunks = sum(r.chunks for r in ingested)
+    chunks_reused = sum(r.chunks_reused for r in ingested)
+    chunks_duplicate = sum(r.chunks_duplicate for r in ingested)
+    return BulkUploadResponse(
+        session_id=job.session_id,
+        files=results,
+        documents=len(ingested),
+        unchanged=sum(r.status == "unchanged" for r in results),
+        failed=sum(r.status == "failed" for r in results),
+        chunks=chunks,
+        chunks_reused=chunks_reused,
+        chunks_duplicate=chunks_duplicate,
+        dedup_ratio=_dedup_ratio(chunks_duplicate, chunks - chunks_reused),
+        pages=sum(r.pages for r in ingested),
+        batches=progress.batches,
+        seconds=round(seconds, 3),
+        docs_per_second=round(len(ingested) / seconds, 2) if seconds else 0.0,
+        chunks_per_second=round(chunks / seconds, 1) if seconds else 0.0,
+        embedding_cache=progress.cache.to_dict(),
+    ).model_dump()
 
 
-# ── Upload endpoint ───────────────────────────────────────────────────────────
-@router.post("/upload", response_model=UploadResponse)
+# ── Upload endpoints ──────────────────────────────────────────────────────────
+def _check_accepting(queue: IngestJobQueue):
+    if queue.is_full():
+        raise HTTPException(status_code=503, detail="Too many uploads waiting for ingestion.",
+                            headers={"Retry-After": "30"})
+
+
+@router.post("/upload", response_model=JobResponse, status_code=202)
 async def upload_document(
     file: UploadFile = File(...),
     session_id: str = Query(..., description="Session ID to associate uploaded doc with"),
 ):
     """
-    Upload a PDF or text file. Extracts text, splits into chunks,
-    embeds via HuggingFace, and stores in Pinecone under the session_id.
+    Upload a PDF or text file. The file is spooled to disk and queued for
+    ingestion; the response carries a job ID to poll at GET /rag/jobs/{job_id}
+    for progress and the final result.
     """
-    # 1. Read file bytes
-    file_bytes = await file.read()
-    if not file_bytes:
+    ext = file_extension(file.filename)
+    if ext not in SUPPORTED_EXTENSIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported file type: .{ext}. Supported: {', '.join(SUPPORTED_EXTENSIONS)}"
+        )
+
+    queue = get_ingest_queue()
+    _check_accepting(queue)
+    try:
+        path, size = await spool_upload(file, settings.ingest_job_dir, settings.upload_max_mb * 2**20)
+    except DocumentTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    if not size:
+        os.unlink(path)
         raise HTTPException(status_code=400, detail="Uploaded file is empty.")
 
-    # 2. Extract text
+    job = await queue.submit("upload", session_id, file.filename, path, size)
+    return JobResponse.from_job(job)
+
+
+@router.post("/upload/bulk", response_model=JobResponse, status_code=202)
+async def upload_documents(
+    files: List[UploadFile] = File(...),
+    session_id: str = Query(..., description="Session ID to associate uploaded docs with"),
+):
+    """
+    Upload many PDF / text files and zip or tar archives of them as one
+    ingestion job. The result at GET /rag/jobs/{job_id} lists every file's
+    outcome along with docs/sec and chunks/sec for the whole upload.
+    """
+    for file in files:
+        ext = file_extension(file.filename)
+        if ext not in SUPPORTED_EXTENSIONS and not is_archive(file.filename):
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unsupported file type: {file.filename}. "
+                       f"Supported: {', '.join(SUPPORTED_EXTENSIONS)} and zip / tar archives"
+            )
+    if len(files) > settings.bulk_max_files:
+        raise HTTPException(status_code=413, detail=f"At most {settings.bulk_max_files} files per upload.")
+
+    queue = get_ingest_queue()
+    _check_accepting(queue)
+    job_dir = tempfile.mkdtemp(prefix="bulk-", dir=settings.ingest_job_dir)
+    manifest = []
+    size = 0
     try:
-        raw_text = extract_text(file_bytes, file.filename)
-    except HTTPException:
+        for file in files:
+            # What is left of the upload's budget; 0 keeps spool_upload unlimited
+            max_bytes = max(1, settings.bulk_max_mb * 2**20 - size) if settings.bulk_max_mb else 0
+            path, file_size = await spool_upload(file, job_dir, max_bytes)
+            size += file_size
+            manifest.append({"filename": os.path.basename(file.filename), "path": path})
+        with open(os.path.join(job_dir, "manifest.json"), "w") as f:
+            json.dump(manifest, f)
+    except DocumentTooLarge:
+        remove_spool(job_dir)
+        raise HTTPException(status_code=413, detail=f"Upload exceeds the {settings.bulk_max_mb} MB limit.")
+    except BaseException:
+        remove_spool(job_dir)
         raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Text extraction failed: {str(e)}")
 
-    if not raw_text.strip():
-        raise HTTPException(status_code=400, detail="Could not extract any text from the file.")
+    names = ", ".join(entry["filename"] for entry in manifest)
+    job = await queue.submit("bulk", session_id, names, job_dir, size)
+    return JobResponse.from_job(job)
 
-    # 3. Split into chunks
-    chunks = split_into_chunks(raw_text, chunk_size=500, overlap=50)
-    if not chunks:
-        raise HTTPException(status_code=400, detail="Document produced no text chunks.")
 
-    # 4. Embed chunks
-    try:
-        embeddings = get_embeddings()
-        vectors = embeddings.embed_documents(chunks)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Embedding failed: {str(e)}")
+# ── Job status ────────────────────────────────────────────────────────────────
+@router.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str):
+    """Status, per-stage progress and (once finished) result or error of an upload."""
+    job = await get_ingest_queue().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    return JobResponse.from_job(job)
 
-    # 5. Upsert into Pinecone with metadata
-    try:
-        vector_adapter = get_vector_adapter()
-        records = [
-            {
-                "id": f"{session_id}_{file.filename}_chunk{i}",
-                "values": vector,
-                "metadata": {
-                    "text": chunk,
-                    "source": file.filename,
-                    "session_id": session_id,
-                    "chunk_index": i,
-                }
-            }
-            for i, (vector, chunk) in enumerate(zip(vectors, chunks))
-        ]
-        vector_adapter.upsert(records)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Pinecone upsert failed: {str(e)}")
 
-    return UploadResponse(
-        filename=file.filename,
-        chunks=len(chunks),
-        session_id=session_id,
-        message=f"Successfully ingested {len(chunks)} chunks from {file.filename}",
-    )
\ No newline at end of file
+@router.get("/jobs", response_model=List[JobResponse])
+async def list_jobs(session_id: str = Query(..., description="Session whose uploads to list")):
+    return [JobResponse.from_job(job) for job in await get_ingest_queue().list_session(session_id)]
@@ -0,0 +1,75 @@
+import numpy as np
+from dataclasses import dataclass
+from typing import Optional
+
+
+@dataclass
+class IVFCentroids:
+    """Coarse quantizer of an IVF index: one unit-norm centroid per list."""
+    version: int
+    centroids: np.ndarray
+    trained_rows: int
+
+    @property
+    def nlist(self) -> int:
+        return self.centroids.shape[0]
+
+    @property
+    def dim(self) -> int:
+        return self.centroids.shape[1]
+
+
+def default_nlist(n_rows: int) -> int:
+    """Roughly sqrt(n) lists, the usual IVF sizing rule."""
+    return int(max(1, min(4096, round(np.sqrt(n_rows)))))
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def train_centroids(sample: np.ndarray, nlist: int, iterations: int = 10,
+                    seed: Optional[int] = 0) -> np.ndarray:
+    """
+    Spherical k-means over unit-norm vectors.
+
+    Vectors in the store are already normalized, so maximizing the dot product
+    to a unit centroid is the same as minimizing cosine distance.
+    """
+    rng = np.random.default_rng(seed)
+    n = sample.shape[0]
+    nlist = min(nlist, n)
+    centroids = sample[rng.choice(n, size=nlist, replace=False)].copy()
+
+    for _ in range(iterations):
+        assignments = assign_lists(centroids, sample)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, sample)
+        counts = np.bincount(assignments, minlength=nlist)
+
+        # Reseed empty lists from random points so every list stays useful
+        empty = np.flatnonzero(counts == 0)
+        if empty.size:
+            sums[empty] = sample[rng.choice(n, size=empty.size, replace=False)]
+        centroids = _normalize_rows(sums)
+
+    return centroids.astype(np.float32)
+
+
+def assign_lists(centroids: np.ndarray, matrix: np.ndarray, batch_size: int = 8192) -> np.ndarray:
+    """Nearest-centroid list id for every row of matrix."""
+    out = np.empty(matrix.shape[0], dtype=np.int64)
+    for start in range(0, matrix.shape[0], batch_size):
+        block = matrix[start:start + batch_size]
+        out[start:start + block.shape[0]] = np.argmax(block @ centroids.T, axis=1)
+    return out
+
+
+def probe_order(centroids: np.ndarray, queries: np.ndarray) -> np.ndarray:
+    """
+    For each query row, list ids sorted from the closest centroid to the
+    farthest. Accepts a single vector or a (b, dim) batch; always 2-D out.
+    """
+    return np.argsort(-(np.atleast_2d(queries) @ centroids.T), axis=1, kind="stable")
@@ -0,0 +1,78 @@
+import os
+import posixpath
+import tarfile
+import zipfile
+from typing import IO, Iterator, List, Tuple
+
+from app.core.extract import DocumentTooLarge
+
+ARCHIVE_SUFFIXES = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tar.xz")
+COPY_BLOCK_SIZE = 1024 * 1024
+
+
+def is_archive(filename: str) -> bool:
+    return filename.lower().endswith(ARCHIVE_SUFFIXES)
+
+
+def _safe_member_name(name: str) -> str:
+    """Normalized relative path of an archive member, or "" if it points outside the archive."""
+    name = posixpath.normpath(name.replace("\\", "/")).lstrip("/")
+    if name in ("", ".") or name.startswith("../") or name == "..":
+        return ""
+    return name
+
+
+def _members(path: str) -> Iterator[Tuple[str, int, IO[bytes]]]:
+    """(name, declared size, open stream) of each regular file in the archive."""
+    if path.lower().endswith(".zip"):
+        with zipfile.ZipFile(path) as archive:
+            for info in archive.infolist():
+                if not info.is_dir():
+                    with archive.open(info) as stream:
+                        yield info.filename, info.file_size, stream
+    else:
+        with tarfile.open(path, "r:*") as archive:
+            for info in archive:
+                # Links, devices and fifos are skipped, not followed
+                if info.isfile():
+                    stream = archive.extractfile(info)
+                    with stream:
+                        yield info.name, info.size, stream
+
+
+def expand_archive(path: str, dest_dir: str, accept, max_files: int = 0,
+                   max_bytes: int = 0) -> Tuple[List[Tuple[str, str]], List[str]]:
+    """
+    Copy the archive's regular files for which accept(name) is true into
+    dest_dir; returns ([(member name, extracted path)], [skipped names]).
+
+    Member names are never trusted as paths: absolute names and names
+    climbing out with ".." are skipped. Raises DocumentTooLarge past
+    max_files accepted members or max_bytes of uncompressed data (0: no
+    limit), counting the bytes actually read rather than the declared sizes.
+    """
+    extracted: List[Tuple[str, str]] = []
+    skipped: List[str] = []
+    total = 0
+    for raw_name, declared, stream in _members(path):
+        name = _safe_member_name(raw_name)
+        if not name or not accept(name):
+            skipped.append(raw_name)
+            continue
+        if max_files and len(extracted) >= max_files:
+            raise DocumentTooLarge(f"Archive has more than {max_files} documents.")
+        if max_bytes and total + declared > max_bytes:
+            raise DocumentTooLarge(f"Archive expands past the {max_bytes / 2**20:.0f} MB limit.")
+        target = os.path.join(dest_dir, f"{len(extracted):05d}{os.path.splitext(name)[1].lower()}")
+        with open(target, "wb") as out:
+            while True:
+                block = stream.read(COPY_BLOCK_SIZE)
+                if not block:
+                    break
+                total += len(block)
+                if max_bytes and total > max_bytes:
+                    raise DocumentTooLarge(f"Archive expands past the {max_bytes / 2**20:.0f} MB limit.")
+                out.write(block)
+        extracted.append((name, target))
+    return extracted, skipped
+
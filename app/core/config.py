@@ -16,11 +16,94 @@ class Settings(BaseSettings):
     pinecone_cloud: Optional[str] = None
     pinecone_region: Optional[str] = None
     embedding_dimension: int = 768
+    pinecone_host: Optional[str] = None  # index host, or a local stand-in URL
+    pinecone_namespace: Optional[str] = None
+    pinecone_upsert_batch_size: int = 100
+    pinecone_max_concurrency: int = 8
+
+    # Vector backend: "local" (the SQLite store below) or "pinecone"
+    vector_backend: str = "local"
+
+    # Embeddings (loaded once per process, warmed up at startup)
+    embedding_model: str = "all-MiniLM-L6-v2"
+    embedding_cache_path: Optional[str] = "app/core/embedding_cache.db"  # empty disables the cache
+    embedding_cache_max_mb: int = 512
+    # Micro-batching: texts from all callers are coalesced into one encode per batch
+    embedding_max_batch_size: int = 64
+    embedding_max_wait_ms: float = 5.0
+    embedding_bucket_size: int = 16  # texts per forward pass after sorting by length
+    # Dedicated encode pool: "thread" shares one model, "process" loads one per worker
+    embedding_executor: str = "thread"
+    embedding_workers: int = 1
+    embedding_torch_threads: int = 0  # 0: cores / embedding_workers
+    # Queued document texts before callers are delayed; rejected after the timeout
+    embedding_max_queue: int = 20000
+    embedding_queue_timeout: float = 30.0
+    # In-process LRU of query embeddings in the MCP server (0 entries disables it)
+    query_cache_size: int = 1024
+    query_cache_ttl_seconds: float = 600.0
+    # "torch" (sentence-transformers) or "onnx" (ONNX Runtime, exported on first use)
+    embedding_backend: str = "torch"
+    onnx_model_dir: str = "app/core/onnx_models"
+    onnx_quantize: bool = False  # dynamic int8 weights
+    onnx_intra_op_threads: int = 0  # 0 lets ONNX Runtime pick
+
+    # Upload ingestion: uploads are spooled to disk, queued as jobs and streamed
+    # through extract -> chunk -> embed -> upsert, batch by batch
+    ingest_batch_size: int = 256  # chunks per embed / upsert
+    ingest_queue_depth: int = 4  # items buffered between two stages
+    upload_max_mb: int = 200  # 0: no limit
+    ingest_job_dir: str = "app/core/ingest_jobs"  # job table and spooled uploads
+    ingest_workers: int = 2  # jobs run at once by each API process
+    ingest_max_running: int = 0  # jobs run at once over all processes; 0: no limit
+    ingest_max_queued: int = 100  # uploads are refused beyond this; 0: no limit
+    ingest_job_lease_seconds: float = 60.0  # a job not heard from for this long is re-run
+    ingest_job_ttl_seconds: float = 24 * 3600  # finished jobs are kept this long
+    # Bulk uploads (many files / zip / tar): chunks of all documents share embed batches
+    bulk_batch_size: int = 1024  # chunks per embed / upsert
+    bulk_extract_concurrency: int = 4  # documents extracted at once
+    bulk_max_files: int = 500
+    bulk_max_mb: int = 1024  # whole upload, and archive contents once expanded; 0: no limit
+    # Re-uploading a document only embeds and stores the chunks it gained and
+    # deletes the ones it lost; versions are kept in the Documents table, so
+    # this needs database_url
+    incremental_ingest: bool = True
+    # Near-duplicate chunks (headers, footers, disclaimers) are found with
+    # MinHash / LSH before embedding. "skip" drops them; "link" stores them
+    # but embeds the matched chunk's text, which the embedding cache serves.
+    # Skipped text is only as durable as the chunk it matched: editing away or
+    # deleting that chunk loses it.
+    chunk_dedup: Optional[str] = None  # "skip", "link" or None (off)
+    dedup_scope: str = "session"  # "session" or "global" (global needs "link")
+    dedup_threshold: float = 0.9  # estimated Jaccard similarity of 3-word shingles
+    dedup_num_perm: int = 128
+    dedup_index_path: str = "app/core/dedup_index.db"
+    # PDF pages are extracted over a process pool (0 workers: in the request's thread)
+    pdf_workers: int = 2
+    pdf_pages_per_task: int = 8
+    pdf_max_pages: int = 5000  # 0: no limit
+
+    # Local vector store
+    vector_cache_max_mb: int = 256
+    ann_min_rows: int = 20000
+    ann_nprobe: int = 8
+    ann_auto_train: bool = True  # False: only an explicit build_ann_index() trains
+    vector_quantization: Optional[str] = None  # "int8" or "pq"
+    pq_subspaces: int = 48
+    rerank_factor: int = 4
+    vector_storage: str = "sqlite"  # "sqlite" or "segments"
+    segment_compact_interval: float = 300.0
+    vector_shards: int = 1  # >1 spreads the store over one process per shard
+    shard_partition: str = "session"  # "session" or "chunk"
+
+    # Session lifecycle: idle sessions lose their chunks and chat history
+    session_ttl_seconds: int = 7 * 24 * 3600  # 0 disables expiry
+    session_reap_interval: float = 600.0
 
     # Redis
     redis_url: str = "redis://localhost:6379"
 
-    # Database (optional legacy)
+    # Database (optional): document versions for incremental_ingest
     database_url: Optional[str] = None
 
     class Config:
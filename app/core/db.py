@@ -1,14 +1,15 @@
-from sqlalchemy import Column, Integer, String, JSON, DateTime
+from sqlalchemy import Column, Index, Integer, String, JSON, DateTime, inspect, text
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, declarative_base
 from app.core.config import settings
 import datetime
 
-engine = create_async_engine(settings.database_url, echo=False)
+# No database_url: no engine; document versioning (app.core.document_versions) is off
+engine = create_async_engine(settings.database_url, echo=False) if settings.database_url else None
 AsyncSessionLocal = sessionmaker(
     engine, class_=AsyncSession, expire_on_commit=False
-)
+) if engine is not None else None
 Base = declarative_base()
 
 class Documents(Base):
@@ -17,6 +18,13 @@ class Documents(Base):
     source = Column(String, index=True)
     meta = Column("metadata", JSON)
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    # One row per ingested version of a session's document
+    session_id = Column(String, index=True)
+    version = Column(Integer)
+    content_hash = Column(String)  # sha256 of the uploaded file
+    chunk_ids = Column(JSON)  # content-hash chunk ids, in document order
+
+    __table_args__ = (Index("ux_documents_version", "session_id", "source", "version", unique=True),)
 
 class Booking(Base):
     __tablename__ = "bookings"
@@ -28,6 +36,25 @@ class Booking(Base):
     meta = Column("metadata",JSON, nullable=True)
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
 
+def _add_missing_columns(conn):
+    """create_all() leaves existing tables alone: add columns and indexes added to the models since."""
+    inspector = inspect(conn)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing:
+                column_type = column.type.compile(dialect=conn.dialect)
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN "{column.name}" {column_type}'))
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+
 async def init_db():
     async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
\ No newline at end of file
+        await conn.run_sync(_add_missing_columns)
+        await conn.run_sync(Base.metadata.create_all)
+
+async def close_db():
+    if engine is not None:
+        await engine.dispose()
\ No newline at end of file
@@ -0,0 +1,99 @@
+import asyncio
+import hashlib
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError
+
+from app.core import db
+from app.core.config import settings
+from app.core.db import Documents
+
+HASH_BLOCK_SIZE = 1024 * 1024
+# Attempts at taking the next version number when another writer got it first
+RECORD_ATTEMPTS = 5
+
+
+@dataclass
+class DocumentVersion:
+    version: int
+    content_hash: str
+    chunk_ids: List[str] = field(default_factory=list)
+
+
+def versioning_enabled() -> bool:
+    """Re-ingest by diff needs somewhere to keep versions: the Documents table."""
+    return settings.incremental_ingest and db.engine is not None
+
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(HASH_BLOCK_SIZE)
+            if not block:
+                break
+            digest.update(block)
+    return digest.hexdigest()
+
+
+async def file_sha256(path: str) -> str:
+    return await asyncio.get_running_loop().run_in_executor(None, _file_sha256, path)
+
+
+def _latest_query(session_id: str, source: str):
+    return (select(Documents)
+            .where(Documents.session_id == session_id, Documents.source == source)
+            .order_by(Documents.version.desc())
+            .limit(1))
+
+
+def _to_version(row: Optional[Documents]) -> Optional[DocumentVersion]:
+    if row is None:
+        return None
+    return DocumentVersion(row.version, row.content_hash, list(row.chunk_ids or []))
+
+
+async def latest_version(session_id: str, source: str) -> Optional[DocumentVersion]:
+    async with db.AsyncSessionLocal() as session:
+        row = (await session.execute(_latest_query(session_id, source))).scalar_one_or_none()
+    return _to_version(row)
+
+
+async def record_version(session_id: str, source: str, content_hash: str, chunk_ids: List[str],
+                         meta: Optional[Dict[str, Any]] = None) -> Tuple[int, Optional[DocumentVersion]]:
+    """
+    Store a new version of the document. Returns its version number and
+    the version it superseded: the latest one when it was written, which
+    is not necessarily the one the caller diffed against.
+    """
+    attempt = 0
+    while True:
+        try:
+            async with db.AsyncSessionLocal() as session:
+                async with session.begin():
+                    replaced = _to_version(
+                        (await session.execute(_latest_query(session_id, source))).scalar_one_or_none()
+                    )
+                    version = (replaced.version if replaced else 0) + 1
+                    session.add(Documents(
+                        source=source, meta=meta or {}, session_id=session_id, version=version,
+                        content_hash=content_hash, chunk_ids=chunk_ids,
+                    ))
+            return version, replaced
+        except IntegrityError:
+            # (session_id, source, version) is unique: another writer took this number
+            attempt += 1
+            if attempt >= RECORD_ATTEMPTS:
+                raise
+
+
+async def delete_session_versions(session_ids: Iterable[str]) -> int:
+    session_ids = list(session_ids)
+    if not session_ids:
+        return 0
+    async with db.AsyncSessionLocal() as session:
+        async with session.begin():
+            result = await session.execute(delete(Documents).where(Documents.session_id.in_(session_ids)))
+    return result.rowcount or 0
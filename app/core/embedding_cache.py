@@ -0,0 +1,172 @@
+import hashlib
+import re
+import threading
+import time
+import unicodedata
+from dataclasses import dataclass
+from typing import Dict, Sequence
+
+import numpy as np
+
+from app.core.sqlite_util import batched, connect_sqlite, release_free_pages
+
+EMBEDDING_DTYPE = np.float32
+
+DEFAULT_CACHE_PATH = "app/core/embedding_cache.db"
+DEFAULT_CACHE_MAX_BYTES = 512 * 1024 * 1024
+# Eviction trims down to this fraction of max_bytes, so it runs in bursts
+# rather than on every insert
+EVICT_LOW_WATER = 0.9
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Unicode NFC with whitespace runs collapsed: re-extracted text keys the same."""
+    return _WHITESPACE_RE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+def cache_key(model_name: str, text: str) -> bytes:
+    return hashlib.sha256(f"{model_name}\0{normalize_text(text)}".encode("utf-8")).digest()
+
+
+@dataclass
+class EmbeddingCacheStats:
+    """What one embed call got from the cache."""
+    hits: int = 0
+    misses: int = 0
+    # Distinct texts actually run through the model (misses minus repeats)
+    embedded: int = 0
+    bytes_saved: int = 0
+
+    def add(self, other: "EmbeddingCacheStats"):
+        """Accumulate another call's counts, e.g. over the batches of one document."""
+        self.hits += other.hits
+        self.misses += other.misses
+        self.embedded += other.embedded
+        self.bytes_saved += other.bytes_saved
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def to_dict(self) -> Dict[str, float]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "embedded": self.embedded,
+            "hit_rate": round(self.hit_rate, 4),
+            "bytes_saved": self.bytes_saved,
+        }
+
+
+class EmbeddingCache:
+    """
+    Disk cache of float32 embeddings keyed by sha256(model name, normalized text).
+
+    Identical chunks re-uploaded in any session, by any process sharing the
+    file, are embedded once. Rows carry a last_used time; when the stored
+    vectors exceed max_bytes the least recently used are evicted and the
+    freed pages handed back through incremental vacuum.
+    """
+    def __init__(self, db_path: str = DEFAULT_CACHE_PATH, max_bytes: int = DEFAULT_CACHE_MAX_BYTES):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = connect_sqlite(db_path, incremental_vacuum=True)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key BLOB PRIMARY KEY,
+                model TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL
+            ) WITHOUT ROWID
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used)")
+        self._bytes = self._stored_bytes()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _stored_bytes(self) -> int:
+        return self._conn.execute("SELECT COALESCE(SUM(length(vector)), 0) FROM embeddings").fetchone()[0]
+
+    def get_many(self, keys: Sequence[bytes]) -> Dict[bytes, np.ndarray]:
+        """Cached vectors for the keys present; marks them as recently used."""
+        found: Dict[bytes, np.ndarray] = {}
+        unique = list(dict.fromkeys(keys))
+        with self._lock:
+            for batch in batched(unique):
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=EMBEDDING_DTYPE)
+            if found:
+                now = time.time()
+                self._conn.execute("BEGIN")
+                try:
+                    self._conn.executemany(
+                        "UPDATE embeddings SET last_used = ? WHERE key = ?", [(now, key) for key in found]
+                    )
+                    self._conn.execute("COMMIT")
+                except BaseException:
+                    self._conn.execute("ROLLBACK")
+                    raise
+        return found
+
+    def put_many(self, model_name: str, keys: Sequence[bytes], vectors: Sequence[Sequence[float]]):
+        now = time.time()
+        blobs = dict(zip(keys, (np.asarray(v, dtype=EMBEDDING_DTYPE).tobytes() for v in vectors)))
+        unique = list(blobs)
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                # A replaced key frees its old vector: only the difference is new
+                replaced = 0
+                for batch in batched(unique):
+                    replaced += self._conn.execute(
+                        f"SELECT COALESCE(SUM(length(vector)), 0) FROM embeddings "
+                        f"WHERE key IN ({','.join('?' * len(batch))})", batch
+                    ).fetchone()[0]
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, model, vector, last_used) VALUES (?, ?, ?, ?)",
+                    [(key, model_name, blob, now) for key, blob in blobs.items()],
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._bytes += sum(len(b) for b in blobs.values()) - replaced
+            if self._bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        # Other processes write to the same file, so recount before deleting
+        self._bytes = self._stored_bytes()
+        target = int(self.max_bytes * EVICT_LOW_WATER)
+        while self._bytes > target:
+            row = self._conn.execute("SELECT length(vector) FROM embeddings LIMIT 1").fetchone()
+            if row is None:
+                break
+            count = max(1, (self._bytes - target) // max(1, row[0]))
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("""
+                    DELETE FROM embeddings WHERE key IN (
+                        SELECT key FROM embeddings ORDER BY last_used LIMIT ?
+                    )
+                """, (count,))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._bytes = self._stored_bytes()
+        release_free_pages(self._conn)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            return {"entries": entries, "bytes": self._bytes, "max_bytes": self.max_bytes}
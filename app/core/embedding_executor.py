@@ -0,0 +1,135 @@
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Optional
+
+import numpy as np
+
+from app.core.process_pool import _spawn_context
+
+EXECUTOR_KINDS = ("thread", "process")
+
+# Recent samples kept for the latency percentiles
+LATENCY_WINDOW = 1024
+
+# The model instance of a process-pool worker
+_worker_provider = None
+_worker_load_seconds = 0.0
+
+
+def threads_per_worker(workers: int) -> int:
+    """Intra-op threads that let workers run side by side without oversubscribing the cores."""
+    return max(1, (os.cpu_count() or 1) // max(1, workers))
+
+
+def pin_torch_threads(num_threads: int):
+    if num_threads > 0:
+        import torch
+        torch.set_num_threads(num_threads)
+
+
+def latency_summary(samples) -> Dict[str, float]:
+    """p50 / p99 / max of millisecond samples."""
+    if not samples:
+        return {"p50_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
+    values = np.fromiter(samples, dtype=np.float64, count=len(samples))
+    p50, p99 = np.percentile(values, [50, 99])
+    return {"p50_ms": round(float(p50), 2), "p99_ms": round(float(p99), 2), "max_ms": round(float(values.max()), 2)}
+
+
+def _init_worker(provider_class, model_name: str, options: Dict[str, Any]):
+    """Process-pool initializer: load this worker's own copy of the model."""
+    global _worker_provider, _worker_load_seconds
+    start = time.perf_counter()
+    # workers=0: the worker encodes inline, it has no pool of its own
+    _worker_provider = provider_class(model_name, workers=0, **options)
+    _worker_load_seconds = time.perf_counter() - start
+
+
+def _worker_encode(texts):
+    return _worker_provider._embed_sync(texts)
+
+
+def _worker_ready() -> float:
+    return _worker_load_seconds
+
+
+class EmbeddingExecutor:
+    """
+    Dedicated pool that runs encode batches, kept apart from the asyncio
+    default executor so SQLite and other blocking calls never queue behind
+    a model forward pass.
+
+    kind="thread" shares the parent's model between worker threads;
+    kind="process" gives every worker process its own model (loaded by the
+    initializer), sidestepping the GIL for tokenization and pooling at the
+    cost of one model copy per worker. Callers take a worker with
+    acquire() before submit(), so batches never pile up inside the pool,
+    where they could no longer be reordered.
+    """
+    def __init__(self, workers: int = 1, kind: str = "thread",
+                 initializer: Optional[Callable] = None, initargs: tuple = ()):
+        if kind not in EXECUTOR_KINDS:
+            raise ValueError(f"Unknown embedding executor: {kind!r}. Supported: {', '.join(EXECUTOR_KINDS)}")
+        self.workers = max(1, workers)
+        self.kind = kind
+        if kind == "process":
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=_spawn_context(),
+                initializer=initializer, initargs=initargs,
+            )
+        else:
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="embedding",
+                initializer=initializer, initargs=initargs,
+            )
+        self._free = threading.Semaphore(self.workers)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self._run_ms: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """Wait for an idle worker; each acquire is released when its submitted call finishes."""
+        return self._free.acquire(timeout=timeout)
+
+    def release(self):
+        """Hand back a worker taken with acquire() that was not used."""
+        self._free.release()
+
+    def submit(self, fn: Callable, *args) -> Future:
+        started = time.monotonic()
+        with self._lock:
+            self.in_flight += 1
+        try:
+            future = self._pool.submit(fn, *args)
+        except Exception:
+            self._done(started, failed=True)
+            raise
+        future.add_done_callback(lambda f: self._done(started, failed=f.cancelled() or f.exception() is not None))
+        return future
+
+    def _done(self, started: float, failed: bool):
+        with self._lock:
+            self.in_flight -= 1
+            self.completed += 1
+            self.failed += failed
+            self._run_ms.append((time.monotonic() - started) * 1000)
+        self._free.release()
+
+    def shutdown(self, wait: bool = True):
+        self._pool.shutdown(wait=wait)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "kind": self.kind,
+                "workers": self.workers,
+                "busy": self.in_flight,
+                "completed": self.completed,
+                "failed": self.failed,
+                "run": latency_summary(self._run_ms),
+            }
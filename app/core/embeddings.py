@@ -1,14 +1,512 @@
-from sentence_transformers import SentenceTransformer
 import asyncio
+import os
+import resource
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.embedding_cache import EMBEDDING_DTYPE, EmbeddingCache, EmbeddingCacheStats, cache_key
+from app.core.embedding_executor import (
+    LATENCY_WINDOW,
+    EmbeddingExecutor,
+    _init_worker,
+    _worker_encode,
+    _worker_ready,
+    latency_summary,
+    pin_torch_threads,
+    threads_per_worker,
+)
+
+DEFAULT_EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+EMBEDDING_BACKENDS = ("torch", "onnx")
+
+DEFAULT_MAX_BATCH_SIZE = 64
+DEFAULT_MAX_WAIT_MS = 5.0
+# Texts per forward pass; inputs are sorted by length first, so each pass
+# pads only to the longest of similar-length texts
+DEFAULT_BUCKET_SIZE = 16
+# Document texts queued before new callers are delayed, and for how long
+DEFAULT_MAX_QUEUE = 20000
+DEFAULT_QUEUE_TIMEOUT = 30.0
+
+
+def _rss_bytes() -> int:
+    """Current resident set size of this process."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        # No procfs (macOS): fall back to the peak RSS, reported in bytes there
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _empty_vectors() -> np.ndarray:
+    return np.empty((0, 0), dtype=EMBEDDING_DTYPE)
+
+
+class _PendingRequest:
+    """One caller's texts; its future resolves with their (n, dim) matrix once every row is filled."""
+    __slots__ = ("future", "results", "size", "remaining", "enqueued")
+
+    def __init__(self, size: int):
+        self.future: Future = Future()
+        self.results: Optional[np.ndarray] = None
+        self.size = size
+        self.remaining = size
+        self.enqueued = time.monotonic()
+
+
+@dataclass
+class _CacheLookup:
+    """One embed call between the cache lookup and the stitching of its result."""
+    keys: Optional[List[bytes]]  # None without a cache
+    found: Dict[bytes, np.ndarray]
+    pending: Dict[bytes, str]  # misses, deduplicated
+    future: Optional[Future]
+    vectors: Optional[np.ndarray] = None
+
+
+class EmbeddingQueueFull(RuntimeError):
+    """The document lane stayed full for the whole queue timeout."""
+
+
+class EmbeddingScheduler:
+    """
+    Coalesces texts from all concurrent callers into batched encode calls.
+
+    Callers enqueue texts and get a concurrent.futures.Future (awaitable via
+    asyncio.wrap_future). A batch is flushed when it holds max_batch_size
+    texts or its oldest text has waited max_wait_ms. Queries go into a
+    priority lane that is drained before each document batch. A batch is
+    only formed once an executor worker is idle, so a query waits for at
+    most the batches already running even behind a large ingest, whose
+    texts are spread across many batches. Without an executor, batches are
+    encoded on the scheduler thread itself.
+
+    The document lane holds at most max_queue texts. A caller that would
+    overflow it is delayed until there is room, and gets EmbeddingQueueFull
+    after queue_timeout seconds. A request larger than max_queue is still
+    admitted once the lane is empty.
+    """
+    def __init__(self, encode: Callable[[List[str]], np.ndarray],
+                 max_batch_size: int = DEFAULT_MAX_BATCH_SIZE, max_wait_ms: float = DEFAULT_MAX_WAIT_MS,
+                 executor: Optional[EmbeddingExecutor] = None,
+                 max_queue: int = DEFAULT_MAX_QUEUE, queue_timeout: float = DEFAULT_QUEUE_TIMEOUT):
+        self._encode = encode
+        self.executor = executor
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_queue = max(1, max_queue)
+        self.queue_timeout = queue_timeout
+        self._queries: Deque[Tuple[str, _PendingRequest, int]] = deque()
+        self._documents: Deque[Tuple[str, _PendingRequest, int]] = deque()
+        # Submitters waiting for room and the dispatcher waiting for work share
+        # this condition, hence notify_all throughout
+        self._cond = threading.Condition()
+        self._results_lock = threading.Lock()
+        self._stopped = False
+        self._thread: Optional[threading.Thread] = None
+        self.batches = 0
+        self.texts = 0
+        self.delayed = 0
+        self.rejected = 0
+        self._wait_ms: Dict[str, Deque[float]] = {
+            "query": deque(maxlen=LATENCY_WINDOW), "document": deque(maxlen=LATENCY_WINDOW),
+        }
+
+    def submit(self, texts: List[str], priority: bool = False) -> Future:
+        request = _PendingRequest(len(texts))
+        if not texts:
+            request.future.set_result(_empty_vectors())
+            return request.future
+        lane = self._queries if priority else self._documents
+        with self._cond:
+            if not priority and self._documents and len(self._documents) + len(texts) > self.max_queue:
+                self.delayed += 1
+
+                def has_room():
+                    return self._stopped or not self._documents or \
+                        len(self._documents) + len(texts) <= self.max_queue
+
+                if not self._cond.wait_for(has_room, timeout=self.queue_timeout):
+                    self.rejected += 1
+                    raise EmbeddingQueueFull(
+                        f"Embedding queue full ({len(self._documents)} texts waiting); try again later"
+                    )
+            if self._stopped:
+                raise RuntimeError("Embedding scheduler is stopped")
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="embedding-scheduler", daemon=True)
+                self._thread.start()
+            # The max_wait deadline and the reported waits count from admission
+            request.enqueued = time.monotonic()
+            lane.extend((text, request, i) for i, text in enumerate(texts))
+            self._cond.notify_all()
+        return request.future
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "batches": self.batches,
+                "texts": self.texts,
+                "mean_batch_size": round(self.texts / self.batches, 1) if self.batches else 0.0,
+                "queued_queries": len(self._queries),
+                "queued_documents": len(self._documents),
+                "max_queue": self.max_queue,
+                "delayed": self.delayed,
+                "rejected": self.rejected,
+                # Time from admission until the text's batch started encoding
+                "query_wait": latency_summary(self._wait_ms["query"]),
+                "document_wait": latency_summary(self._wait_ms["document"]),
+                "executor": self.executor.stats() if self.executor is not None else None,
+            }
+
+    def _next_batch(self) -> Optional[List[Tuple[str, _PendingRequest, int]]]:
+        with self._cond:
+            while True:
+                if self._stopped:
+                    return None
+                lane = self._queries or self._documents
+                if not lane:
+                    self._cond.wait()
+                    continue
+                wait = lane[0][1].enqueued + self.max_wait - time.monotonic()
+                if len(lane) >= self.max_batch_size or wait <= 0:
+                    batch = [lane.popleft() for _ in range(min(self.max_batch_size, len(lane)))]
+                    self._record_waits(batch, "query" if lane is self._queries else "document")
+                    self._cond.notify_all()
+                    return batch
+                # Not full yet: give other callers until the deadline to join,
+                # re-picking the lane in case a query arrives meanwhile
+                self._cond.wait(wait)
+
+    def _record_waits(self, batch, lane: str):
+        now = time.monotonic()
+        seen = set()
+        for _, request, _ in batch:
+            if id(request) not in seen:
+                seen.add(id(request))
+                self._wait_ms[lane].append((now - request.enqueued) * 1000)
+
+    def _run(self):
+        while True:
+            # Take a worker first, so the lane is picked when the batch can
+            # actually start rather than when it would merely queue
+            if self.executor is not None:
+                self.executor.acquire()
+            batch = self._next_batch()
+            if batch is None:
+                if self.executor is not None:
+                    self.executor.release()
+                return
+            texts = [text for text, _, _ in batch]
+            if self.executor is None:
+                try:
+                    self._complete(batch, self._encode(texts), None)
+                except Exception as e:
+                    self._complete(batch, None, e)
+                continue
+            try:
+                future = self.executor.submit(self._encode, texts)
+            except Exception as e:
+                self._complete(batch, None, e)
+                continue
+            future.add_done_callback(lambda f, batch=batch: self._on_done(batch, f))
+
+    def _on_done(self, batch, future: Future):
+        try:
+            vectors = future.result()
+        except BaseException as e:
+            self._complete(batch, None, e)
+            return
+        self._complete(batch, vectors, None)
+
+    def _complete(self, batch, vectors, error: Optional[BaseException]):
+        """Scatter a finished batch into its callers' result matrices (or fail them)."""
+        if error is not None:
+            for _, request, _ in batch:
+                if not request.future.done():
+                    request.future.set_exception(error)
+            return
+        vectors = np.asarray(vectors, dtype=EMBEDDING_DTYPE)
+        with self._cond:
+            self.batches += 1
+            self.texts += len(batch)
+
+        # Each caller's rows go into its matrix in one copy
+        groups: Dict[int, Tuple[_PendingRequest, List[int], List[int]]] = {}
+        for position, (_, request, index) in enumerate(batch):
+            group = groups.setdefault(id(request), (request, [], []))
+            group[1].append(index)
+            group[2].append(position)
+        for request, indices, positions in groups.values():
+            # Batches of one request can finish on different workers at once
+            with self._results_lock:
+                if request.future.done():
+                    continue
+                if request.results is None:
+                    request.results = np.empty((request.size, vectors.shape[1]), dtype=EMBEDDING_DTYPE)
+                request.results[indices] = vectors[positions]
+                request.remaining -= len(indices)
+                finished = request.remaining == 0
+            if finished:
+                request.future.set_result(request.results)
+
 
 class HFEmbeddingProvider:
-    def __init__(self, model_name="all-MiniLM-L6-v2"):
-        self.model = SentenceTransformer(model_name, device="cpu")
+    """
+    Sentence-transformers embedder shared by every caller in the process.
+
+    Texts go through the disk cache, then the micro-batching scheduler,
+    whose batches run on a dedicated EmbeddingExecutor of `workers`
+    threads or processes (workers=0 encodes on the scheduler thread). torch
+    intra-op threads are pinned to torch_threads so the workers don't
+    oversubscribe the cores.
+    """
+    backend = "torch"
+
+    def __init__(self, model_name=DEFAULT_EMBEDDING_MODEL, cache: Optional[EmbeddingCache] = None,
+                 max_batch_size: int = DEFAULT_MAX_BATCH_SIZE, max_wait_ms: float = DEFAULT_MAX_WAIT_MS,
+                 bucket_size: int = DEFAULT_BUCKET_SIZE, workers: int = 1, executor_kind: str = "thread",
+                 torch_threads: int = 0, max_queue: int = DEFAULT_MAX_QUEUE,
+                 queue_timeout: float = DEFAULT_QUEUE_TIMEOUT):
+        self.model_name = model_name
+        self.cache = cache
+        self.bucket_size = max(1, bucket_size)
+        self.torch_threads = torch_threads
+        # Backends whose vectors drift from the torch output key the cache separately
+        self.cache_namespace = _registry_key(model_name)
+        rss_before = _rss_bytes()
+        start = time.perf_counter()
+        if workers > 0 and executor_kind == "process":
+            # The workers load their own copies; the parent never holds the
+            # model, but builds whatever they would otherwise all build at once
+            self.model = None
+            self._prepare_model()
+            executor = EmbeddingExecutor(
+                workers, "process", initializer=_init_worker,
+                initargs=(type(self), model_name, self._worker_options()),
+            )
+            executor.acquire()
+            executor.submit(_worker_ready).result()
+            encode = _worker_encode
+        else:
+            self.model = self._load_model()
+            executor = EmbeddingExecutor(workers, "thread") if workers > 0 else None
+            encode = self._embed_sync
+        self.load_seconds = time.perf_counter() - start
+        self.load_rss_bytes = _rss_bytes() - rss_before
+        self.warmup_seconds = None
+        self.scheduler = EmbeddingScheduler(
+            encode, max_batch_size, max_wait_ms, executor=executor, max_queue=max_queue, queue_timeout=queue_timeout,
+        )
+
+    def _worker_options(self) -> Dict[str, Any]:
+        """Constructor options a process-pool worker needs to build the same encoder."""
+        return {"bucket_size": self.bucket_size, "torch_threads": self.torch_threads}
+
+    def _prepare_model(self):
+        """Create anything on disk the model needs; runs before process-pool workers load it."""
+
+    def _load_model(self):
+        # Imported here so the ONNX backend never pays for torch
+        from sentence_transformers import SentenceTransformer
+        pin_torch_threads(self.torch_threads)
+        return SentenceTransformer(self.model_name, device="cpu")
 
     async def embed(self, texts):
-        loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(None, self._embed_sync, texts)
+        return (await self.embed_with_stats(texts))[0]
+
+    async def embed_with_stats(self, texts) -> Tuple[np.ndarray, EmbeddingCacheStats]:
+        """Contiguous float32 (n, dim) embeddings in input order plus how many came from the cache."""
+        loop = asyncio.get_running_loop()
+        # Only the cache lookups and writes use the default executor; no
+        # thread is held while the batch waits for or runs on the model
+        lookup = await loop.run_in_executor(None, self._lookup, texts)
+        if lookup.future is not None:
+            vectors = await asyncio.wrap_future(lookup.future)
+            await loop.run_in_executor(None, self._store, lookup, vectors)
+        return self._stitch(lookup)
+
+    def _embed_sync(self, texts) -> np.ndarray:
+        # sentence-transformers sorts the inputs by length before batching and
+        # restores their order; numpy output skips the tensor -> list round trip
+        embeddings = self.model.encode(list(texts), batch_size=self.bucket_size, convert_to_numpy=True)
+        return np.ascontiguousarray(embeddings, dtype=EMBEDDING_DTYPE)
+
+    def _embed_scheduled(self, texts, priority: bool = False):
+        """Embed through the shared micro-batching scheduler; blocks until done."""
+        return self.scheduler.submit(list(texts), priority=priority).result()
+
+    def _lookup(self, texts, priority: bool = False) -> _CacheLookup:
+        """Cache hits for texts, with the misses already submitted to the scheduler."""
+        if self.cache is None:
+            return _CacheLookup(None, {}, {}, self.scheduler.submit(list(texts), priority=priority))
+
+        keys = [cache_key(self.cache_namespace, text) for text in texts]
+        found = self.cache.get_many(keys)
+        # Repeated chunks within one upload are embedded once
+        pending: Dict[bytes, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in pending:
+                pending[key] = text
+        future = self.scheduler.submit(list(pending.values()), priority=priority) if pending else None
+        return _CacheLookup(keys, found, pending, future)
+
+    def _store(self, lookup: _CacheLookup, vectors: np.ndarray):
+        lookup.vectors = vectors
+        if self.cache is not None:
+            self.cache.put_many(self.cache_namespace, list(lookup.pending), vectors)
+            lookup.found.update(zip(lookup.pending, vectors))
+
+    def _stitch(self, lookup: _CacheLookup) -> Tuple[np.ndarray, EmbeddingCacheStats]:
+        """Embeddings in input order from the cache hits and the new vectors."""
+        keys, found, pending = lookup.keys, lookup.found, lookup.pending
+        if keys is None:
+            n = len(lookup.vectors)
+            return lookup.vectors, EmbeddingCacheStats(misses=n, embedded=n)
+
+        stats = EmbeddingCacheStats(embedded=len(pending))
+        if not keys:
+            return _empty_vectors(), stats
+        out = np.empty((len(keys), len(found[keys[0]])), dtype=EMBEDDING_DTYPE)
+        for i, key in enumerate(keys):
+            vector = found[key]
+            out[i] = vector
+            if key in pending:
+                stats.misses += 1
+            else:
+                stats.hits += 1
+                stats.bytes_saved += vector.nbytes
+        return out, stats
+
+    def _embed_cached(self, texts, priority: bool = False) -> Tuple[np.ndarray, EmbeddingCacheStats]:
+        """Embed only the texts the cache has never seen and stitch the rest back in order."""
+        lookup = self._lookup(texts, priority)
+        if lookup.future is not None:
+            self._store(lookup, lookup.future.result())
+        return self._stitch(lookup)
+
+    # Sync face for callers outside the event loop (MCP tools)
+    def embed_documents(self, texts):
+        return self._embed_cached(texts)[0]
+
+    def embed_query(self, text):
+        return self._embed_scheduled([text], priority=True)[0]
+
+    def embed_queries(self, texts, cached: bool = False):
+        """
+        Several queries in one priority-lane submission. cached=True also
+        reads and fills the disk cache, for queries likely to be asked again
+        from another process.
+        """
+        if cached:
+            return self._embed_cached(texts, priority=True)[0]
+        return self._embed_scheduled(texts, priority=True)
+
+    def close(self):
+        self.scheduler.stop()
+        if self.scheduler.executor is not None:
+            self.scheduler.executor.shutdown(wait=False)
+
+    def warm_up(self):
+        """One throwaway encode so the first real request skips lazy init and allocator growth."""
+        start = time.perf_counter()
+        self._embed_scheduled(["warm-up"], priority=True)
+        self.warmup_seconds = time.perf_counter() - start
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "model": self.model_name,
+            "backend": self.backend,
+            "torch_threads": self.torch_threads,
+            "load_seconds": round(self.load_seconds, 3),
+            "load_rss_mb": round(self.load_rss_bytes / (1024 * 1024), 1),
+            "warmup_seconds": round(self.warmup_seconds, 3) if self.warmup_seconds is not None else None,
+            "scheduler": self.scheduler.stats(),
+        }
+
+
+# ── Process-wide model registry ───────────────────────────────────────────────
+_providers: Dict[str, HFEmbeddingProvider] = {}
+_providers_lock = threading.Lock()
+_embedding_cache: Optional[EmbeddingCache] = None
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """The process's disk embedding cache, or None when settings disable it."""
+    global _embedding_cache
+    if _embedding_cache is None and settings.embedding_cache_path:
+        _embedding_cache = EmbeddingCache(
+            settings.embedding_cache_path, max_bytes=settings.embedding_cache_max_mb * 1024 * 1024
+        )
+    return _embedding_cache
+
+
+def _registry_key(model_name: str) -> str:
+    # "sentence-transformers/all-MiniLM-L6-v2" and "all-MiniLM-L6-v2" are the same model
+    return model_name.split("/", 1)[1] if model_name.startswith("sentence-transformers/") else model_name
+
+
+def _create_provider(model_name: str, backend: str) -> HFEmbeddingProvider:
+    workers = settings.embedding_workers
+    # Each worker gets an even share of the cores for its intra-op threads
+    intra_op_threads = threads_per_worker(workers) if workers > 1 else 0
+    options = dict(
+        cache=get_embedding_cache(),
+        max_batch_size=settings.embedding_max_batch_size,
+        max_wait_ms=settings.embedding_max_wait_ms,
+        bucket_size=settings.embedding_bucket_size,
+        workers=workers,
+        executor_kind=settings.embedding_executor,
+        max_queue=settings.embedding_max_queue,
+        queue_timeout=settings.embedding_queue_timeout,
+    )
+    if backend == "onnx":
+        from app.core.onnx_embeddings import OnnxEmbeddingProvider
+        return OnnxEmbeddingProvider(
+            model_name,
+            model_dir=settings.onnx_model_dir,
+            quantize=settings.onnx_quantize,
+            intra_op_threads=settings.onnx_intra_op_threads or intra_op_threads,
+            **options,
+        )
+    if backend != "torch":
+        raise ValueError(f"Unknown embedding backend {backend!r}; expected one of {EMBEDDING_BACKENDS}")
+    return HFEmbeddingProvider(
+        model_name, torch_threads=settings.embedding_torch_threads or threads_per_worker(workers), **options
+    )
+
+
+def get_embedding_provider(model_name: str = DEFAULT_EMBEDDING_MODEL,
+                           backend: Optional[str] = None) -> HFEmbeddingProvider:
+    """The process's provider for model_name, loading the model on first use only."""
+    backend = backend or settings.embedding_backend
+    key = f"{backend}:{_registry_key(model_name)}"
+    provider = _providers.get(key)
+    if provider is None:
+        with _providers_lock:
+            provider = _providers.get(key)
+            if provider is None:
+                provider = _providers[key] = _create_provider(model_name, backend)
+    return provider
+
 
-    def _embed_sync(self, texts):
-        embeddings = self.model.encode(texts, convert_to_tensor=True)
-        return embeddings.cpu().tolist()
+def embedding_registry_stats() -> Dict[str, Any]:
+    """Load / warm-up timings of every loaded model plus the process's resident memory."""
+    return {
+        "models": [provider.stats() for provider in list(_providers.values())],
+        "rss_mb": round(_rss_bytes() / (1024 * 1024), 1),
+        "cache": _embedding_cache.stats() if _embedding_cache is not None else None,
+    }
@@ -1,14 +1,37 @@
-from typing import Tuple
+import codecs
+from typing import Iterator
 from io import BytesIO
 from PyPDF2 import PdfReader
 
+TEXT_BLOCK_SIZE = 1024 * 1024
+
+class DocumentTooLarge(ValueError):
+    """The document exceeds the configured size or page limit."""
+
 def extract_text_from_pdf(upload_file: BytesIO) -> str:
     upload_file.seek(0)
     pdf = PdfReader(upload_file)
-    text = ""
-    for page in pdf.pages:
-        text += page.extract_text()
-    return text
+    return "".join(page.extract_text() or "" for page in pdf.pages)
 
 def extract_text_from_txt(data: bytes, encoding: str = "utf-8") -> str:
-    return data.decode(encoding, errors="ignore")
\ No newline at end of file
+    return data.decode(encoding, errors="ignore")
+
+def iter_pdf_pages(path: str) -> Iterator[str]:
+    """Text of each page in order. Given a file object rather than a path,
+    PdfReader reads objects from disk on demand instead of loading the whole file."""
+    with open(path, "rb") as f:
+        for page in PdfReader(f).pages:
+            yield page.extract_text() or ""
+
+def iter_text_file(path: str, encoding: str = "utf-8", block_size: int = TEXT_BLOCK_SIZE) -> Iterator[str]:
+    """Decoded text in blocks of about block_size bytes; multi-byte characters never split."""
+    decoder = codecs.getincrementaldecoder(encoding)(errors="ignore")
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(block_size)
+            if not block:
+                break
+            yield decoder.decode(block)
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
@@ -0,0 +1,325 @@
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from app.core.ingest_pipeline import IngestProgress, remove_spool
+from app.core.sqlite_util import connect_sqlite
+
+JOB_STATUSES = ("queued", "running", "succeeded", "failed")
+DEFAULT_LEASE_SECONDS = 60.0
+DEFAULT_MAX_ATTEMPTS = 3
+
+
+class JobRetry(Exception):
+    """Raised by a job handler to put the job back in the queue instead of failing it."""
+
+
+@dataclass
+class IngestJob:
+    id: str
+    kind: str  # which handler runs it
+    session_id: str
+    filename: str
+    path: str
+    size: int
+    status: str
+    attempts: int
+    progress: Dict[str, Any]
+    result: Optional[Dict[str, Any]]
+    error: Optional[str]
+    created_at: float
+    started_at: Optional[float]
+    finished_at: Optional[float]
+
+    @classmethod
+    def from_row(cls, row: sqlite3.Row) -> "IngestJob":
+        return cls(
+            id=row["id"],
+            kind=row["kind"],
+            session_id=row["session_id"],
+            filename=row["filename"],
+            path=row["path"],
+            size=row["size"],
+            status=row["status"],
+            attempts=row["attempts"],
+            progress=json.loads(row["progress"]) if row["progress"] else {},
+            result=json.loads(row["result"]) if row["result"] else None,
+            error=row["error"],
+            created_at=row["created_at"],
+            started_at=row["started_at"],
+            finished_at=row["finished_at"],
+        )
+
+
+class JobStore:
+    """
+    SQLite table of ingestion jobs, shared by every API process using the file.
+
+    A running job holds a lease that its worker renews with each progress
+    update. claim() hands out queued jobs, plus running jobs whose lease ran
+    out because their process died; a job abandoned max_attempts times is
+    failed instead. At most max_running jobs (0: no limit) run at once over
+    all processes, and never two for the same document: a job waits while
+    another one for its session and filename runs (for a bulk job, another
+    one for its session), since each would read the same latest version.
+    """
+    def __init__(self, db_path: str, lease_seconds: float = DEFAULT_LEASE_SECONDS,
+                 max_attempts: int = DEFAULT_MAX_ATTEMPTS, max_running: int = 0):
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.max_running = max_running
+        self._lock = threading.Lock()
+        self._conn = connect_sqlite(db_path)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS ingest_jobs (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL DEFAULT 'upload',
+                session_id TEXT NOT NULL,
+                filename TEXT NOT NULL,
+                path TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                progress TEXT,
+                result TEXT,
+                error TEXT,
+                created_at REAL NOT NULL,
+                run_after REAL NOT NULL,
+                started_at REAL,
+                heartbeat_at REAL,
+                finished_at REAL
+            )
+        """)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(ingest_jobs)")}
+        if "kind" not in columns:
+            self._conn.execute("ALTER TABLE ingest_jobs ADD COLUMN kind TEXT NOT NULL DEFAULT 'upload'")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_ingest_jobs_status ON ingest_jobs (status, run_after)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_ingest_jobs_session ON ingest_jobs (session_id)")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def create(self, kind: str, session_id: str, filename: str, path: str, size: int) -> IngestJob:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO ingest_jobs (id, kind, session_id, filename, path, size, status, created_at, run_after) "
+                "VALUES (?, ?, ?, ?, ?, ?, 'queued', ?, ?)",
+                (job_id, kind, session_id, filename, path, size, now, now),
+            )
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[IngestJob]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM ingest_jobs WHERE id = ?", (job_id,)).fetchone()
+        return IngestJob.from_row(row) if row else None
+
+    def list_session(self, session_id: str) -> List[IngestJob]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM ingest_jobs WHERE session_id = ? ORDER BY created_at", (session_id,)
+            ).fetchall()
+        return [IngestJob.from_row(row) for row in rows]
+
+    def claim(self) -> Optional[IngestJob]:
+        """Take the oldest runnable job and start its lease, or None if none can run now."""
+        now = time.time()
+        stale = now - self.lease_seconds
+        with self._lock:
+            # IMMEDIATE: the count and the claim must not interleave with another process's claim
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "UPDATE ingest_jobs SET status = 'failed', finished_at = ?, "
+                    "error = 'Abandoned by its worker ' || attempts || ' times' "
+                    "WHERE status = 'running' AND heartbeat_at < ? AND attempts >= ?",
+                    (now, stale, self.max_attempts),
+                )
+                if self.max_running:
+                    running = self._conn.execute(
+                        "SELECT COUNT(*) FROM ingest_jobs WHERE status = 'running' AND heartbeat_at >= ?", (stale,)
+                    ).fetchone()[0]
+                    if running >= self.max_running:
+                        self._conn.execute("COMMIT")
+                        return None
+                row = self._conn.execute(
+                    "SELECT id FROM ingest_jobs j "
+                    "WHERE ((status = 'queued' AND run_after <= ?) OR (status = 'running' AND heartbeat_at < ?)) "
+                    "AND NOT EXISTS (SELECT 1 FROM ingest_jobs r WHERE r.status = 'running' "
+                    "AND r.heartbeat_at >= ? AND r.id != j.id AND r.session_id = j.session_id "
+                    "AND (r.filename = j.filename OR r.kind = 'bulk' OR j.kind = 'bulk')) "
+                    "ORDER BY run_after LIMIT 1",
+                    (now, stale, stale),
+                ).fetchone()
+                if row is None:
+                    self._conn.execute("COMMIT")
+                    return None
+                job = IngestJob.from_row(self._conn.execute(
+                    "UPDATE ingest_jobs SET status = 'running', attempts = attempts + 1, "
+                    "started_at = ?, heartbeat_at = ?, error = NULL WHERE id = ? RETURNING *",
+                    (now, now, row["id"]),
+                ).fetchone())
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return job
+
+    def heartbeat(self, job_id: str, progress: Dict[str, Any]):
+        """Record progress and renew the lease."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE ingest_jobs SET progress = ?, heartbeat_at = ? WHERE id = ? AND status = 'running'",
+                (json.dumps(progress), time.time(), job_id),
+            )
+
+    def finish(self, job_id: str, progress: Dict[str, Any],
+               result: Optional[Dict[str, Any]] = None, error: Optional[str] = None):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE ingest_jobs SET status = ?, progress = ?, result = ?, error = ?, finished_at = ? "
+                "WHERE id = ?",
+                ("failed" if error is not None else "succeeded", json.dumps(progress),
+                 json.dumps(result) if result is not None else None, error, time.time(), job_id),
+            )
+
+    def requeue(self, job_id: str, delay: float = 0.0, error: Optional[str] = None):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE ingest_jobs SET status = 'queued', run_after = ?, error = ? WHERE id = ?",
+                (time.time() + delay, error, job_id),
+            )
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM ingest_jobs GROUP BY status").fetchall()
+        counts = dict.fromkeys(JOB_STATUSES, 0)
+        counts.update({status: count for status, count in rows})
+        return counts
+
+    def prune(self, older_than_seconds: float) -> int:
+        """Delete finished jobs older than the cutoff, and any upload an abandoned job left behind."""
+        with self._lock:
+            rows = self._conn.execute(
+                "DELETE FROM ingest_jobs WHERE status IN ('succeeded', 'failed') AND finished_at < ? RETURNING path",
+                (time.time() - older_than_seconds,),
+            ).fetchall()
+        for row in rows:
+            remove_spool(row["path"])
+        return len(rows)
+
+
+JobHandler = Callable[[IngestJob, IngestProgress], Awaitable[Dict[str, Any]]]
+
+
+class IngestJobQueue:
+    """
+    Runs ingestion jobs from a JobStore on `workers` asyncio tasks.
+
+    Uploads are spooled and recorded with submit(), which returns at once;
+    a worker then claims the job and awaits handlers[job.kind](job, progress),
+    whose return value becomes the job's result. While it runs, the progress
+    counters are written back every progress_interval seconds, which also
+    renews the lease. A handler raising JobRetry puts the job back after
+    retry_delay seconds; any other exception fails it. The spooled file (or
+    directory, for jobs over several files) is removed when the job succeeds
+    or fails.
+    """
+    def __init__(self, store: JobStore, handlers: Dict[str, JobHandler], workers: int = 2, max_queued: int = 0,
+                 poll_interval: float = 2.0, progress_interval: float = 0.5, retry_delay: float = 5.0,
+                 ttl_seconds: float = 24 * 3600):
+        self.store = store
+        self.handlers = handlers
+        self.workers = max(1, workers)
+        self.max_queued = max_queued
+        self.poll_interval = poll_interval
+        self.progress_interval = progress_interval
+        self.retry_delay = retry_delay
+        self.ttl_seconds = ttl_seconds
+        self._tasks: List[asyncio.Task] = []
+        self._wake: Optional[asyncio.Event] = None
+
+    def start(self):
+        if self._tasks:
+            return
+        self._wake = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        self._tasks = [loop.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, kind: str, session_id: str, filename: str, path: str, size: int) -> IngestJob:
+        if kind not in self.handlers:
+            raise ValueError(f"No handler for {kind!r} jobs")
+        loop = asyncio.get_running_loop()
+        job = await loop.run_in_executor(None, self.store.create, kind, session_id, filename, path, size)
+        if self._wake is not None:
+            self._wake.set()
+        return job
+
+    def is_full(self) -> bool:
+        return bool(self.max_queued) and self.store.counts()["queued"] >= self.max_queued
+
+    async def get(self, job_id: str) -> Optional[IngestJob]:
+        return await asyncio.get_running_loop().run_in_executor(None, self.store.get, job_id)
+
+    async def list_session(self, session_id: str) -> List[IngestJob]:
+        return await asyncio.get_running_loop().run_in_executor(None, self.store.list_session, session_id)
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        last_prune = 0.0
+        while True:
+            if self.ttl_seconds > 0 and time.monotonic() - last_prune > self.ttl_seconds / 24:
+                last_prune = time.monotonic()
+                await loop.run_in_executor(None, self.store.prune, self.ttl_seconds)
+            job = await loop.run_in_executor(None, self.store.claim)
+            if job is None:
+                # Woken by submit(), or polling for jobs other processes queued or freed
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wake.clear()
+                continue
+            await self._run(job)
+
+    async def _run(self, job: IngestJob):
+        loop = asyncio.get_running_loop()
+        progress = IngestProgress()
+        task = loop.create_task(self.handlers[job.kind](job, progress))
+        try:
+            while not task.done():
+                await asyncio.wait({task}, timeout=self.progress_interval)
+                if not task.done():
+                    await loop.run_in_executor(None, self.store.heartbeat, job.id, progress.to_dict())
+        except asyncio.CancelledError:
+            # Shutting down: hand the job back rather than wait out its lease
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            self.store.requeue(job.id)
+            raise
+
+        try:
+            result = task.result()
+        except JobRetry as e:
+            await loop.run_in_executor(None, self.store.requeue, job.id, self.retry_delay, str(e))
+            return
+        except Exception as e:
+            await loop.run_in_executor(None, self.store.finish, job.id, progress.to_dict(), None, str(e) or repr(e))
+        else:
+            await loop.run_in_executor(None, self.store.finish, job.id, progress.to_dict(), result)
+        remove_spool(job.path)
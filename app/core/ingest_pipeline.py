@@ -0,0 +1,454 @@
+"""
+Streaming ingestion: upload -> temp file -> pages -> chunks -> embedded
+batches -> upserts.
+
+Stages run concurrently and hand work on through bounded asyncio queues, so
+at most queue_depth pages and queue_depth batches wait between any two
+stages. Peak memory depends on batch_size and queue_depth, not on the size
+of the document.
+"""
+import asyncio
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import zlib
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from app.core.embedding_cache import EmbeddingCacheStats, normalize_text
+from app.core.extract import DocumentTooLarge, iter_pdf_pages, iter_text_file
+
+SUPPORTED_EXTENSIONS = ("pdf", "txt", "md")
+SPOOL_BLOCK_SIZE = 1024 * 1024
+
+DEFAULT_CHUNK_SIZE = 500  # words
+DEFAULT_OVERLAP = 50
+DEFAULT_BATCH_SIZE = 256  # chunks embedded and upserted together
+DEFAULT_QUEUE_DEPTH = 4
+
+# End of stream marker between stages
+_DONE = object()
+
+
+class IngestError(RuntimeError):
+    """A pipeline stage failed; the original exception is the __cause__."""
+    def __init__(self, stage: str, cause: BaseException):
+        super().__init__(f"{stage} failed: {cause}")
+        self.stage = stage
+
+
+def file_extension(filename: str) -> str:
+    return filename.lower().rsplit(".", 1)[-1] if "." in filename else ""
+
+
+async def spool_upload(upload, spool_dir: Optional[str] = None, max_bytes: int = 0,
+                       block_size: int = SPOOL_BLOCK_SIZE) -> Tuple[str, int]:
+    """
+    Copy an UploadFile to a temp file block by block; returns (path, bytes).
+    The caller removes the file. Raises DocumentTooLarge as soon as more than
+    max_bytes (if set) have arrived.
+    """
+    loop = asyncio.get_running_loop()
+    fd, path = tempfile.mkstemp(prefix="upload-", suffix=f".{file_extension(upload.filename)}", dir=spool_dir)
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                block = await upload.read(block_size)
+                if not block:
+                    break
+                size += len(block)
+                if max_bytes and size > max_bytes:
+                    raise DocumentTooLarge(f"Upload exceeds the {max_bytes / 2**20:.0f} MB limit.")
+                await loop.run_in_executor(None, out.write, block)
+    except BaseException:
+        os.unlink(path)
+        raise
+    return path, size
+
+
+def remove_spool(path: str):
+    """Delete a spooled upload, a file or a directory of them."""
+    if os.path.isdir(path):
+        shutil.rmtree(path, ignore_errors=True)
+    else:
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+
+def iter_document_text(path: str, extension: str, pdf_extractor=None) -> Iterator[str]:
+    """
+    Text of a spooled document piece by piece: PDF pages, or blocks of a
+    text file. PDFs go through pdf_extractor (a PdfExtractor) when given.
+    """
+    if extension == "pdf":
+        pages = pdf_extractor.iter_pages(path) if pdf_extractor is not None else iter_pdf_pages(path)
+        for page in pages:
+            # Pages are joined by newlines, so a word never runs across two pages
+            yield page + "\n"
+    elif extension in ("txt", "md"):
+        yield from iter_text_file(path)
+    else:
+        raise ValueError(f"Unsupported file type: .{extension}. Supported: {', '.join(SUPPORTED_EXTENSIONS)}")
+
+
+class WordChunker:
+    """
+    Overlapping word windows over text fed in pieces: chunk_size words per
+    chunk, each starting chunk_size - overlap words after the previous one.
+    Gives the same chunks as splitting the concatenated text in one go.
+    """
+    def __init__(self, chunk_size: int = DEFAULT_CHUNK_SIZE, overlap: int = DEFAULT_OVERLAP):
+        if not 0 <= overlap < chunk_size:
+            raise ValueError("overlap must be at least 0 and smaller than chunk_size")
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+        self.step = chunk_size - overlap
+        self._words: List[str] = []
+        # A word cut off at the end of the last piece
+        self._partial = ""
+
+    def feed(self, text: str) -> List[str]:
+        if not text:
+            return []
+        text = self._partial + text
+        words = text.split()
+        if words and not text[-1].isspace():
+            self._partial = words.pop()
+        else:
+            self._partial = ""
+        self._words.extend(words)
+        return self._cut(final=False)
+
+    def finish(self) -> List[str]:
+        if self._partial:
+            self._words.append(self._partial)
+            self._partial = ""
+        return self._cut(final=True)
+
+    def _cut(self, final: bool) -> List[str]:
+        chunks = []
+        while len(self._words) >= self.chunk_size or (final and self._words):
+            chunks.append(" ".join(self._words[:self.chunk_size]))
+            del self._words[:self.step]
+        return chunks
+
+
+class ContentDefinedChunker(WordChunker):
+    """
+    Chunks whose boundaries are picked by the text itself: a chunk ends
+    after a word where a hash of the last BOUNDARY_WINDOW words hits a
+    fixed pattern, once it has at least a quarter of chunk_size - overlap
+    new words, and at the latest when it reaches chunk_size words. Each
+    chunk starts with the last `overlap` words of the previous one.
+
+    Inserting or deleting text only moves the boundaries next to the edit;
+    further on the hash finds the same boundaries as before, so the same
+    chunks come out. Fixed windows would shift every chunk after the edit.
+    """
+    BOUNDARY_WINDOW = 3
+
+    def __init__(self, chunk_size: int = DEFAULT_CHUNK_SIZE, overlap: int = DEFAULT_OVERLAP):
+        super().__init__(chunk_size, overlap)
+        self.min_new = max(1, self.step // 4)
+        # One boundary every ~step / 2 words past min_new: chunks average ~2/3 of the maximum
+        self.divisor = max(1, self.step // 2)
+        # Words carried over from the previous chunk, and words already checked for a boundary
+        self._prefix = 0
+        self._scanned = 0
+
+    def _is_boundary(self, end: int) -> bool:
+        window = " ".join(self._words[max(0, end - self.BOUNDARY_WINDOW):end])
+        return zlib.crc32(window.encode("utf-8")) % self.divisor == 0
+
+    def _cut(self, final: bool) -> List[str]:
+        chunks = []
+        while True:
+            end = None
+            for i in range(max(self._scanned, self._prefix + self.min_new), len(self._words) + 1):
+                if i - self._prefix >= self.step or self._is_boundary(i):
+                    end = i
+                    break
+            if end is None:
+                self._scanned = max(self._scanned, len(self._words) + 1)
+                break
+            chunks.append(" ".join(self._words[:end]))
+            keep = min(self.overlap, end)
+            del self._words[:end - keep]
+            self._prefix = keep
+            self._scanned = 0
+        if final and len(self._words) > self._prefix:
+            chunks.append(" ".join(self._words))
+        if final:
+            self._words, self._prefix, self._scanned = [], 0, 0
+        return chunks
+
+
+CHUNK_BOUNDARIES = {"fixed": WordChunker, "content": ContentDefinedChunker}
+
+
+def chunk_hash(text: str) -> str:
+    """Stable id part of a chunk's content; whitespace-only differences hash the same."""
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()[:16]
+
+
+def content_chunk_ids(prefix: str) -> Callable[[int, str], str]:
+    """
+    chunk_id for IngestSource naming chunks by content, prefix_<hash>; the
+    k-th repeat of the same text within the document gets a -k suffix.
+    """
+    seen: Dict[str, int] = {}
+
+    def chunk_id(i: int, text: str) -> str:
+        digest = chunk_hash(text)
+        repeat = seen.get(digest, 0)
+        seen[digest] = repeat + 1
+        return f"{prefix}_{digest}" + (f"-{repeat}" if repeat else "")
+
+    return chunk_id
+
+
+@dataclass
+class IngestProgress:
+    """Per-stage counters of one ingestion run, updated as the pipeline runs.
+    For text files, pages counts the blocks read."""
+    documents: int = 0  # documents fully extracted and chunked
+    pages: int = 0
+    chunks: int = 0
+    chunks_embedded: int = 0
+    chunks_upserted: int = 0
+    chunks_reused: int = 0  # already stored (IngestSource.known_ids), not embedded again
+    chunks_duplicate: int = 0  # near-duplicates found by the run's dedup
+    batches: int = 0
+    cache: EmbeddingCacheStats = field(default_factory=EmbeddingCacheStats)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "documents": self.documents,
+            "pages": self.pages,
+            "chunks": self.chunks,
+            "chunks_embedded": self.chunks_embedded,
+            "chunks_upserted": self.chunks_upserted,
+            "chunks_reused": self.chunks_reused,
+            "chunks_duplicate": self.chunks_duplicate,
+            "batches": self.batches,
+            "embedding_cache": self.cache.to_dict(),
+        }
+
+
+@dataclass
+class IngestSource:
+    """
+    One document of a pipeline run. chunk_id(i, text) and
+    chunk_metadata(i, text) name and describe its i-th chunk; chunk_id is
+    called once per chunk, in order, and the ids are kept in chunk_ids.
+    Chunks whose id is in known_ids are already stored and are skipped.
+    duplicate_of maps the near-duplicates a dedup run found to the chunks
+    they matched; skipped_ids are those it dropped. If extracting the
+    document fails, error is set and the rest of the run carries on.
+    """
+    path: str
+    extension: str
+    chunk_id: Callable[[int, str], str]
+    chunk_metadata: Callable[[int, str], Dict[str, Any]]
+    known_ids: Set[str] = field(default_factory=set)
+    chunk_ids: List[str] = field(default_factory=list)
+    duplicate_of: Dict[str, str] = field(default_factory=dict)
+    skipped_ids: Set[str] = field(default_factory=set)
+    progress: IngestProgress = field(default_factory=IngestProgress)
+    error: Optional[Exception] = None
+
+    def new_ids(self) -> List[str]:
+        """Ids of the chunks this run embeds and stores (some may not be stored yet)."""
+        return [vid for vid in self.chunk_ids if vid not in self.known_ids and vid not in self.skipped_ids]
+
+
+async def _stage(name: str, coro):
+    try:
+        await coro
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        raise IngestError(name, e) from e
+
+
+async def _run_stages(**stages):
+    """Run the named stages together; if one fails, cancel the rest and re-raise."""
+    tasks = [asyncio.create_task(_stage(name, coro)) for name, coro in stages.items()]
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+
+async def ingest_documents(
+        sources: List[IngestSource],
+        embeddings,
+        vector_backend,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        overlap: int = DEFAULT_OVERLAP,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        queue_depth: int = DEFAULT_QUEUE_DEPTH,
+        boundaries: str = "fixed",
+        extract_concurrency: int = 1,
+        progress: Optional[IngestProgress] = None,
+        pdf_extractor=None,
+        dedup=None,
+) -> IngestProgress:
+    """
+    Extract, chunk, embed and upsert spooled documents as a stream.
+
+    Up to extract_concurrency documents are extracted and chunked at once
+    (with fixed or content-defined chunk boundaries, see CHUNK_BOUNDARIES);
+    their chunks are pooled into batches of batch_size, whatever document
+    they come from, and each batch is upserted in one call as soon as it is
+    embedded. Returns the run's totals (progress, if given); each source
+    keeps its own counters.
+
+    With a dedup run (app.core.near_dedup.DedupRun), new chunks are checked
+    for near-duplicates between chunking and embedding: a match is dropped,
+    or with dedup.link stored under its own id with "duplicate_of" in its
+    metadata and the matched chunk's text embedded in its place.
+
+    A failing document only sets its source's error, and any of its
+    source.new_ids() may already be stored. A failing embed or upsert
+    raises IngestError, and then the same holds for every source.
+    """
+    if boundaries not in CHUNK_BOUNDARIES:
+        raise ValueError(f"Unknown chunk boundaries: {boundaries!r}. Supported: {', '.join(CHUNK_BOUNDARIES)}")
+    loop = asyncio.get_running_loop()
+    total = progress or IngestProgress()
+    # Items: (source index, [(chunk id, chunk index, text, text to embed)]) from one piece of text
+    chunked: asyncio.Queue = asyncio.Queue(maxsize=queue_depth * max(1, extract_concurrency))
+    batches: asyncio.Queue = asyncio.Queue(maxsize=queue_depth)
+    embedded: asyncio.Queue = asyncio.Queue(maxsize=queue_depth)
+    slots = asyncio.Semaphore(max(1, extract_concurrency))
+
+    async def extract_one(n: int, source: IngestSource):
+        async with slots:
+            chunker = CHUNK_BOUNDARIES[boundaries](chunk_size, overlap)
+            pieces = iter_document_text(source.path, source.extension, pdf_extractor)
+            # A cancelled await leaves next() running in its executor thread;
+            # closing behind the same lock waits for that step to return
+            stepping = threading.Lock()
+
+            def step():
+                with stepping:
+                    return next(pieces, _DONE)
+
+            def close():
+                with stepping:
+                    pieces.close()
+
+            try:
+                while True:
+                    # Page parsing is blocking; each step runs off the event loop
+                    piece = await loop.run_in_executor(None, step)
+                    final = piece is _DONE
+                    chunks = chunker.finish() if final else chunker.feed(piece)
+                    if not final:
+                        source.progress.pages += 1
+                        total.pages += 1
+                    if chunks:
+                        items, reused = [], []
+                        for text in chunks:
+                            vid = source.chunk_id(len(source.chunk_ids), text)
+                            if vid in source.known_ids:
+                                reused.append(vid)
+                            else:
+                                items.append((vid, len(source.chunk_ids), text, text))
+                            source.chunk_ids.append(vid)
+                        source.progress.chunks += len(chunks)
+                        total.chunks += len(chunks)
+                        source.progress.chunks_reused += len(reused)
+                        total.chunks_reused += len(reused)
+                        if reused and dedup is not None:
+                            dedup.keep(reused)
+                        if items and dedup is not None:
+                            items = await deduplicate(source, items)
+                        if items:
+                            await chunked.put((n, items))
+                    if final:
+                        break
+                source.progress.documents = 1
+                total.documents += 1
+            except Exception as e:
+                source.error = e
+            finally:
+                await asyncio.shield(loop.run_in_executor(None, close))
+
+    async def deduplicate(source: IngestSource, items):
+        matches = await loop.run_in_executor(None, dedup.match, [(vid, text) for vid, _, text, _ in items])
+        kept = []
+        for item, match in zip(items, matches):
+            if match is None:
+                kept.append(item)
+                continue
+            vid, i, text, _ = item
+            source.duplicate_of[vid] = match[0]
+            source.progress.chunks_duplicate += 1
+            total.chunks_duplicate += 1
+            if dedup.link:
+                kept.append((vid, i, text, match[1]))
+            else:
+                source.skipped_ids.add(vid)
+        return kept
+
+    async def extract():
+        await asyncio.gather(*(extract_one(n, source) for n, source in enumerate(sources)))
+        await chunked.put(_DONE)
+
+    async def batch():
+        items: List[Tuple[int, str, int, str, str]] = []
+        while True:
+            item = await chunked.get()
+            if item is not _DONE:
+                n, chunks = item
+                items.extend((n, *chunk) for chunk in chunks)
+            while len(items) >= batch_size or (item is _DONE and items):
+                await batches.put(items[:batch_size])
+                items = items[batch_size:]
+            if item is _DONE:
+                break
+        await batches.put(_DONE)
+
+    async def embed():
+        while True:
+            items = await batches.get()
+            if items is _DONE:
+                break
+            vectors, cache_stats = await embeddings.embed_with_stats([embed_text for *_, embed_text in items])
+            total.cache.add(cache_stats)
+            for n, *_ in items:
+                sources[n].progress.chunks_embedded += 1
+            total.chunks_embedded += len(items)
+            await embedded.put((items, vectors))
+        await embedded.put(_DONE)
+
+    async def upsert():
+        while True:
+            item = await embedded.get()
+            if item is _DONE:
+                break
+            items, vectors = item
+            metadatas = []
+            for n, vid, i, text, _ in items:
+                metadata = sources[n].chunk_metadata(i, text)
+                if vid in sources[n].duplicate_of:
+                    metadata = {**metadata, "duplicate_of": sources[n].duplicate_of[vid]}
+                metadatas.append(metadata)
+            await vector_backend.upsert(ids=[vid for _, vid, *_ in items], vectors=vectors, metadatas=metadatas)
+            for n, *_ in items:
+                sources[n].progress.chunks_upserted += 1
+            total.chunks_upserted += len(items)
+            total.batches += 1
+
+    await _run_stages(extraction=extract(), batching=batch(), embedding=embed(), upsert=upsert())
+    return total
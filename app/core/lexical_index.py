@@ -0,0 +1,90 @@
+import re
+import sqlite3
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# External-content FTS5 index over document_chunks.text_preview. The chunk
+# text is stored once, in document_chunks; the index only holds postings
+# keyed by the chunk's rowid.
+FTS_TABLE = "chunk_fts"
+
+# Constant of reciprocal rank fusion; 60 is the value from the original paper
+# and keeps a single list's top hit from drowning out agreement between lists
+RRF_K = 60
+
+# Terms kept from a query; long pasted questions add little past this
+_MAX_QUERY_TERMS = 32
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def init_schema(cursor: sqlite3.Cursor):
+    cursor.execute(f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+            text_preview,
+            content='document_chunks',
+            content_rowid='rowid'
+        )
+    """)
+
+
+def rebuild(cursor: sqlite3.Cursor):
+    """Re-index every chunk from document_chunks (also repairs drifted rowids)."""
+    cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def unindex_ids(cursor: sqlite3.Cursor, ids: Sequence[str]):
+    """
+    Drop the postings of existing chunks. Must run while their rows are still
+    in document_chunks, since an external-content delete needs the old text.
+    """
+    cursor.execute(f"""
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text_preview)
+        SELECT 'delete', rowid, text_preview FROM document_chunks
+        WHERE id IN ({','.join('?' * len(ids))}) AND text_preview IS NOT NULL
+    """, list(ids))
+
+
+def index_ids(cursor: sqlite3.Cursor, ids: Sequence[str]):
+    cursor.execute(f"""
+        INSERT INTO {FTS_TABLE}(rowid, text_preview)
+        SELECT rowid, text_preview FROM document_chunks
+        WHERE id IN ({','.join('?' * len(ids))}) AND text_preview IS NOT NULL
+    """, list(ids))
+
+
+def match_expression(text: str) -> Optional[str]:
+    """
+    Turn free text into an FTS5 query: every word is quoted (so punctuation
+    and operators in user input are never parsed as syntax) and OR-ed, and
+    BM25 ranks chunks by how many rare terms they share with the query.
+    """
+    terms = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        if token not in terms:
+            terms.append(token)
+    if not terms:
+        return None
+    return " OR ".join(f'"{t}"' for t in terms[:_MAX_QUERY_TERMS])
+
+
+def search(cursor: sqlite3.Cursor, text: str, session_id: Optional[str], limit: int) -> List[str]:
+    """Chunk ids matching text, best BM25 first."""
+    expression = match_expression(text)
+    if expression is None or limit <= 0:
+        return []
+    session_clause = " AND c.session_id = ?" if session_id else ""
+    cursor.execute(f"""
+        SELECT c.id FROM {FTS_TABLE} f JOIN document_chunks c ON c.rowid = f.rowid
+        WHERE {FTS_TABLE} MATCH ?{session_clause}
+        ORDER BY f.rank LIMIT ?
+    """, (expression, *((session_id,) if session_id else ()), limit))
+    return [row[0] for row in cursor.fetchall()]
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], top_k: int,
+                           k: int = RRF_K) -> List[Tuple[str, float]]:
+    """Fuse ranked id lists by summing 1 / (k + rank); returns (id, score) best first."""
+    fused: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, vid in enumerate(ranking, start=1):
+            fused[vid] = fused.get(vid, 0.0) + 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda item: -item[1])[:top_k]
@@ -0,0 +1,313 @@
+import hashlib
+import threading
+import time
+import uuid
+import zlib
+from typing import Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.embedding_cache import normalize_text
+from app.core.sqlite_util import batched, connect_sqlite
+
+DEDUP_MODES = ("skip", "link")
+DEDUP_SCOPES = ("session", "global")
+DEFAULT_INDEX_PATH = "app/core/dedup_index.db"
+DEFAULT_NUM_PERM = 128
+DEFAULT_SHINGLE_WORDS = 3
+DEFAULT_THRESHOLD = 0.9
+# Entries of runs that never committed or discarded (their process died)
+# are dropped once this old
+ABANDONED_RUN_SECONDS = 24 * 3600
+
+_MERSENNE_PRIME = np.uint64((1 << 31) - 1)
+_MERSENNE_BITS = np.uint64(31)
+_SHINGLE_MIX = np.uint64(1099511628211)
+
+Match = Tuple[str, str]  # (chunk id, text) of the chunk a near-duplicate matched
+
+
+class MinHasher:
+    """
+    MinHash signatures of word shingles: the share of positions at which two
+    signatures agree estimates the Jaccard similarity of the texts' sets of
+    shingle_words-word shingles.
+    """
+    def __init__(self, num_perm: int = DEFAULT_NUM_PERM, shingle_words: int = DEFAULT_SHINGLE_WORDS, seed: int = 1):
+        self.num_perm = num_perm
+        self.shingle_words = shingle_words
+        rng = np.random.default_rng(seed)
+        # h(x) = (a * x + b) mod p; a, x < 2**31 keeps a * x + b inside uint64
+        self._a = rng.integers(1, int(_MERSENNE_PRIME), size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, int(_MERSENNE_PRIME), size=num_perm, dtype=np.uint64)
+
+    def shingles(self, text: str) -> np.ndarray:
+        """Distinct hashes (< 2**31) of the text's shingles."""
+        words = normalize_text(text).lower().split(" ")
+        hashes = np.fromiter((zlib.crc32(word.encode("utf-8")) for word in words), dtype=np.uint64, count=len(words))
+        k = min(self.shingle_words, len(words))
+        shingles = np.zeros(len(words) - k + 1, dtype=np.uint64)
+        for j in range(k):
+            # Wraps around in uint64: a hash of the k word hashes in order
+            shingles = shingles * _SHINGLE_MIX + hashes[j:j + len(shingles)]
+        return np.unique(shingles % _MERSENNE_PRIME)
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        """uint32 signature of num_perm values, or None for text without words."""
+        if not text.strip():
+            return None
+        x = self.shingles(text)
+        hashed = self._a[:, None] * x[None, :] + self._b[:, None]
+        # mod 2**31 - 1 by folding the high bits onto the low ones, twice as fast as %
+        hashed = (hashed & _MERSENNE_PRIME) + (hashed >> _MERSENNE_BITS)
+        hashed = (hashed & _MERSENNE_PRIME) + (hashed >> _MERSENNE_BITS)
+        return hashed.min(axis=1).astype(np.uint32)
+
+
+def lsh_params(num_perm: int, threshold: float, false_negative_weight: float = 0.9) -> Tuple[int, int]:
+    """
+    (bands, rows per band) minimizing the weighted area of false positives
+    (pairs below the threshold sharing a band) and false negatives (pairs
+    above it sharing none). Candidates are checked against their full
+    signatures, so a false positive only costs a comparison: misses weigh more.
+    """
+    similarities = np.linspace(0.0, 1.0, 201)
+    below = similarities < threshold
+    best, best_error = (num_perm, 1), float("inf")
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        collide = 1.0 - (1.0 - similarities ** rows) ** bands
+        error = float(np.mean(np.where(below, (1.0 - false_negative_weight) * collide,
+                                       false_negative_weight * (1.0 - collide))))
+        if error < best_error:
+            best, best_error = (bands, rows), error
+    return best
+
+
+class NearDuplicateIndex:
+    """
+    LSH index of chunk MinHash signatures in SQLite, shared by every API
+    process using the file.
+
+    Chunks are indexed per scope (a session ID, or one scope for the whole
+    corpus). Each ingestion run works through a DedupRun: the chunks it
+    indexes are only visible to that run until it commits them, so a run
+    that fails or is rolled back leaves nothing behind. Near-duplicates
+    themselves are not indexed; the chunk they matched stands for them.
+    """
+    def __init__(self, db_path: str = DEFAULT_INDEX_PATH, num_perm: int = DEFAULT_NUM_PERM,
+                 threshold: float = DEFAULT_THRESHOLD, shingle_words: int = DEFAULT_SHINGLE_WORDS):
+        if not 0.0 < threshold <= 1.0:
+            raise ValueError("threshold must be in (0, 1]")
+        self.db_path = db_path
+        self.threshold = threshold
+        self.hasher = MinHasher(num_perm, shingle_words)
+        self.bands, self.rows = lsh_params(num_perm, threshold)
+        self._lock = threading.Lock()
+        self._conn = connect_sqlite(db_path)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS dedup_chunks (
+                chunk_id TEXT PRIMARY KEY,
+                scope TEXT NOT NULL,
+                session_id TEXT NOT NULL,
+                signature BLOB NOT NULL,
+                text TEXT NOT NULL,
+                run_id TEXT,
+                created_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS dedup_bands (
+                bucket INTEGER NOT NULL,
+                chunk_id TEXT NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_dedup_bands_bucket ON dedup_bands (bucket)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_dedup_bands_chunk ON dedup_bands (chunk_id)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_dedup_chunks_session ON dedup_chunks (session_id)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_dedup_chunks_run ON dedup_chunks (run_id)")
+        with self._lock:
+            self._delete_where("run_id IS NOT NULL AND created_at < ?", (time.time() - ABANDONED_RUN_SECONDS,))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def run(self, session_id: str, scope: str = "session", mode: str = "skip",
+            exclude: Iterable[str] = (), overwrite_prefixes: Iterable[str] = ()) -> "DedupRun":
+        if scope not in DEDUP_SCOPES:
+            raise ValueError(f"Unknown dedup scope: {scope!r}. Supported: {', '.join(DEDUP_SCOPES)}")
+        if mode not in DEDUP_MODES:
+            raise ValueError(f"Unknown dedup mode: {mode!r}. Supported: {', '.join(DEDUP_MODES)}")
+        if scope == "global" and mode == "skip":
+            # A skipped chunk would only exist in another session, where this
+            # session's queries never look
+            raise ValueError("Dedup scope 'global' needs mode 'link'; 'skip' only works per session")
+        return DedupRun(self, session_id, session_id if scope == "session" else "*", mode, set(exclude),
+                        tuple(overwrite_prefixes))
+
+    def _buckets(self, scope: str, signature: np.ndarray) -> List[int]:
+        buckets = []
+        for band in range(self.bands):
+            digest = hashlib.blake2b(signature[band * self.rows:(band + 1) * self.rows].tobytes(), digest_size=8,
+                                     person=band.to_bytes(2, "little"), key=scope.encode("utf-8")[:64])
+            buckets.append(int.from_bytes(digest.digest(), "little", signed=True))
+        return buckets
+
+    def _match_insert(self, run: "DedupRun", chunks: Sequence[Tuple[str, str]]) -> List[Optional[Match]]:
+        """Best match at or above the threshold for each chunk; unmatched chunks join the run's entries."""
+        matches: List[Optional[Match]] = []
+        signatures = [self.hasher.signature(text) for _, text in chunks]
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for (chunk_id, text), signature in zip(chunks, signatures):
+                    if signature is None:
+                        matches.append(None)
+                        continue
+                    buckets = self._buckets(run.scope, signature)
+                    match = self._best_match(run, chunk_id, signature, buckets)
+                    matches.append(match)
+                    if match is None:
+                        self._delete_ids([chunk_id])
+                        self._conn.execute(
+                            "INSERT INTO dedup_chunks (chunk_id, scope, session_id, signature, text, run_id, "
+                            "created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                            (chunk_id, run.scope, run.session_id, signature.tobytes(), text, run.run_id, now),
+                        )
+                        self._conn.executemany("INSERT INTO dedup_bands (bucket, chunk_id) VALUES (?, ?)",
+                                               [(bucket, chunk_id) for bucket in buckets])
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return matches
+
+    def _best_match(self, run: "DedupRun", chunk_id: str, signature: np.ndarray,
+                    buckets: List[int]) -> Optional[Match]:
+        placeholders = ",".join("?" * len(buckets))
+        rows = self._conn.execute(
+            f"SELECT c.chunk_id, c.signature, c.run_id FROM dedup_chunks c WHERE c.chunk_id IN "
+            f"(SELECT chunk_id FROM dedup_bands WHERE bucket IN ({placeholders})) "
+            f"AND c.scope = ? AND (c.run_id IS NULL OR c.run_id = ?)",
+            (*buckets, run.scope, run.run_id),
+        ).fetchall()
+        best_id, best = None, self.threshold
+        for candidate, blob, run_id in rows:
+            # A chunk never matches itself (a positional id uploaded again), a
+            # chunk its own upload may be removing, or an earlier upload's
+            # positional chunk this one is about to overwrite
+            if candidate == chunk_id or candidate in run.exclude:
+                continue
+            if run_id is None and run.overwrite_prefixes and candidate.startswith(run.overwrite_prefixes):
+                continue
+            similarity = float(np.mean(np.frombuffer(blob, dtype=np.uint32) == signature))
+            if similarity >= best:
+                best_id, best = candidate, similarity
+        if best_id is None:
+            return None
+        text = self._conn.execute("SELECT text FROM dedup_chunks WHERE chunk_id = ?", (best_id,)).fetchone()[0]
+        return best_id, text
+
+    def _delete_ids(self, chunk_ids: Sequence[str]):
+        for batch in batched(chunk_ids):
+            placeholders = ",".join("?" * len(batch))
+            self._conn.execute(f"DELETE FROM dedup_bands WHERE chunk_id IN ({placeholders})", batch)
+            self._conn.execute(f"DELETE FROM dedup_chunks WHERE chunk_id IN ({placeholders})", batch)
+
+    def _delete_where(self, condition: str, params: tuple) -> int:
+        ids = [row[0] for row in self._conn.execute(f"SELECT chunk_id FROM dedup_chunks WHERE {condition}", params)]
+        self._delete_ids(ids)
+        return len(ids)
+
+    def _commit_run(self, run_id: str, chunk_ids: Sequence[str]):
+        with self._lock:
+            for batch in batched(chunk_ids):
+                self._conn.execute(
+                    f"UPDATE dedup_chunks SET run_id = NULL WHERE run_id = ? "
+                    f"AND chunk_id IN ({','.join('?' * len(batch))})",
+                    (run_id, *batch),
+                )
+            self._delete_where("run_id = ?", (run_id,))
+
+    def delete(self, chunk_ids: Sequence[str]):
+        """Forget deleted chunks, so nothing is matched against them any more."""
+        with self._lock:
+            self._delete_ids(chunk_ids)
+
+    def delete_sessions(self, session_ids: Iterable[str]) -> int:
+        deleted = 0
+        with self._lock:
+            for session_id in session_ids:
+                deleted += self._delete_where("session_id = ?", (session_id,))
+        return deleted
+
+    def stats(self) -> dict:
+        with self._lock:
+            chunks = self._conn.execute("SELECT COUNT(*) FROM dedup_chunks WHERE run_id IS NULL").fetchone()[0]
+        return {"chunks": chunks, "bands": self.bands, "rows": self.rows, "threshold": self.threshold}
+
+
+class DedupRun:
+    """
+    Near-duplicate detection for one ingestion run (see ingest_documents).
+
+    match() returns, for each chunk, the indexed chunk it nearly duplicates,
+    or None. A skip run drops near-duplicates; a link run stores them with
+    their own ID and metadata but embeds the matched chunk's text in their
+    place, which the embedding cache (or the batch it shares) already has.
+    Chunks without a match are indexed for the rest of the run, and for
+    later runs once commit() is called with their IDs. Chunks in exclude
+    (those of the versions being replaced) match nothing until keep() reports
+    that a new version still has them; indexed chunks whose id starts with
+    one of overwrite_prefixes (the positional ids a re-upload reuses) match
+    nothing at all.
+    """
+    def __init__(self, index: NearDuplicateIndex, session_id: str, scope: str, mode: str, exclude: Set[str],
+                 overwrite_prefixes: Tuple[str, ...] = ()):
+        self.index = index
+        self.session_id = session_id
+        self.scope = scope
+        self.exclude = exclude
+        self.overwrite_prefixes = overwrite_prefixes
+        self.link = mode == "link"
+        self.run_id = uuid.uuid4().hex
+
+    def match(self, chunks: Sequence[Tuple[str, str]]) -> List[Optional[Match]]:
+        return self.index._match_insert(self, chunks)
+
+    def keep(self, chunk_ids: Iterable[str]):
+        self.exclude.difference_update(chunk_ids)
+
+    def commit(self, chunk_ids: Sequence[str]):
+        """Keep the run's entries for chunk_ids (the documents that were stored); drop the rest."""
+        self.index._commit_run(self.run_id, chunk_ids)
+
+    def discard(self):
+        self.index._commit_run(self.run_id, [])
+
+
+_dedup_index: Optional[NearDuplicateIndex] = None
+
+
+def get_dedup_index() -> Optional[NearDuplicateIndex]:
+    """Process-wide index, or None when settings.chunk_dedup is off."""
+    global _dedup_index
+    if not settings.chunk_dedup:
+        return None
+    if _dedup_index is None:
+        _dedup_index = NearDuplicateIndex(
+            settings.dedup_index_path,
+            num_perm=settings.dedup_num_perm,
+            threshold=settings.dedup_threshold,
+        )
+    return _dedup_index
+
+
+def close_dedup_index():
+    global _dedup_index
+    if _dedup_index is not None:
+        _dedup_index.close()
+        _dedup_index = None
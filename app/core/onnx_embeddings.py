@@ -0,0 +1,239 @@
+"""
+ONNX Runtime backend for the sentence-transformers embedders.
+
+The model is exported once per model directory (this step needs torch,
+sentence-transformers and onnx), optionally with dynamic int8 weight
+quantization.
+After that, serving only needs onnxruntime and tokenizers:
+
+    python -m app.core.onnx_embeddings all-MiniLM-L6-v2 --quantize
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from filelock import FileLock
+
+from app.core.embedding_cache import EMBEDDING_DTYPE
+from app.core.embeddings import HFEmbeddingProvider, _registry_key
+
+ONNX_OPSET = 17
+FP32_FILE = "model.onnx"
+INT8_FILE = "model.int8.onnx"
+TOKENIZER_FILE = "tokenizer.json"
+EXPORT_CONFIG_FILE = "export_config.json"
+
+
+def model_path(model_dir: str, model_name: str) -> str:
+    return os.path.join(model_dir, _registry_key(model_name).replace("/", "__"))
+
+
+def export_model(model_name: str, out_dir: str, quantize: bool = False) -> Dict[str, Any]:
+    """Export the transformer of a sentence-transformers model to ONNX plus its tokenizer."""
+    try:
+        import onnx  # torch.onnx.export serializes through it
+        import torch
+        from sentence_transformers import SentenceTransformer
+        from sentence_transformers.models import Normalize, Pooling
+    except ImportError:
+        raise RuntimeError("Exporting to ONNX needs torch, sentence-transformers and onnx installed")
+
+    st = SentenceTransformer(model_name, device="cpu")
+    pooling = next((m for m in st if isinstance(m, Pooling)), None)
+    if pooling is None or pooling.get_pooling_mode_str() != "mean":
+        raise ValueError(f"{model_name} does not use mean pooling; only mean pooling is exported")
+
+    os.makedirs(out_dir, exist_ok=True)
+    transformer = st[0]
+    tokenizer = transformer.tokenizer
+    tokenizer.backend_tokenizer.save(os.path.join(out_dir, TOKENIZER_FILE))
+
+    sample = tokenizer(["warm-up export"], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+    with torch.no_grad():
+        torch.onnx.export(
+            transformer.auto_model,
+            tuple(sample[name] for name in input_names),
+            os.path.join(out_dir, FP32_FILE),
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=ONNX_OPSET,
+            dynamo=False,
+        )
+
+    config = {
+        "model_name": model_name,
+        "max_seq_length": st.max_seq_length,
+        "normalize": any(isinstance(m, Normalize) for m in st),
+        "pad_token": tokenizer.pad_token,
+        "pad_token_id": tokenizer.pad_token_id,
+    }
+    with open(os.path.join(out_dir, EXPORT_CONFIG_FILE), "w") as f:
+        json.dump(config, f, indent=2)
+    if quantize:
+        quantize_model(out_dir)
+    return config
+
+
+def quantize_model(out_dir: str):
+    """Dynamic int8 quantization of the exported weights; activations stay float."""
+    try:
+        # onnxruntime.quantization imports the onnx package, which onnxruntime does not install
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+    except ImportError:
+        raise RuntimeError("Quantizing the ONNX model (onnx_quantize) needs the onnx package installed")
+    # Written aside and renamed, so a reader never opens a half-written model
+    partial = os.path.join(out_dir, f"{INT8_FILE}.partial")
+    quantize_dynamic(os.path.join(out_dir, FP32_FILE), partial, weight_type=QuantType.QInt8)
+    os.replace(partial, os.path.join(out_dir, INT8_FILE))
+
+
+def ensure_model(model_name: str, model_dir: str, quantize: bool = False):
+    """
+    Export (and quantize) the model into model_dir unless it is already
+    there. Safe to call from several processes at once: the first one
+    exports into a temporary directory under a file lock and renames it into
+    place, the others wait for the lock and find it done.
+    """
+    exported = os.path.exists(os.path.join(model_dir, EXPORT_CONFIG_FILE))
+    if exported and (not quantize or os.path.exists(os.path.join(model_dir, INT8_FILE))):
+        return
+    parent = os.path.dirname(os.path.abspath(model_dir))
+    os.makedirs(parent, exist_ok=True)
+    with FileLock(f"{model_dir}.lock"):
+        if not os.path.exists(os.path.join(model_dir, EXPORT_CONFIG_FILE)):
+            staging = tempfile.mkdtemp(prefix=".export-", dir=parent)
+            try:
+                export_model(model_name, staging, quantize=quantize)
+                # Left over from an export that died before writing its config
+                shutil.rmtree(model_dir, ignore_errors=True)
+                os.replace(staging, model_dir)
+            except BaseException:
+                shutil.rmtree(staging, ignore_errors=True)
+                raise
+        elif quantize and not os.path.exists(os.path.join(model_dir, INT8_FILE)):
+            quantize_model(model_dir)
+
+
+class OnnxEmbeddingProvider(HFEmbeddingProvider):
+    """
+    Same caching and batching as HFEmbeddingProvider, with encode running
+    the exported transformer in ONNX Runtime and mean pooling in numpy.
+    Texts are tokenized once, sorted by token count and run bucket_size at
+    a time, each bucket padded only to its own longest text.
+
+    The export is made on first use if model_dir has none (by the parent,
+    before any process-pool worker loads it; see ensure_model). Quantized
+    vectors differ slightly from the torch ones, so they get their own
+    embedding-cache namespace; fp32 ONNX output matches torch and shares it.
+    """
+    backend = "onnx"
+
+    def __init__(self, model_name: str, model_dir: str = "app/core/onnx_models", quantize: bool = False,
+                 intra_op_threads: int = 0, **options):
+        self.model_root = model_dir
+        self.model_dir = model_path(model_dir, model_name)
+        self.quantize = quantize
+        self.intra_op_threads = intra_op_threads
+        super().__init__(model_name, **options)
+        if quantize:
+            self.cache_namespace = f"{self.cache_namespace}@int8"
+
+    def _prepare_model(self):
+        ensure_model(self.model_name, self.model_dir, self.quantize)
+
+    def _worker_options(self) -> Dict[str, Any]:
+        return {
+            **super()._worker_options(),
+            "model_dir": self.model_root,
+            "quantize": self.quantize,
+            "intra_op_threads": self.intra_op_threads,
+        }
+
+    def _load_model(self):
+        try:
+            import onnxruntime as ort
+            from tokenizers import Tokenizer
+        except ImportError:
+            raise RuntimeError("The onnx embedding backend needs onnxruntime and tokenizers installed")
+
+        self._prepare_model()
+        onnx_file = os.path.join(self.model_dir, INT8_FILE if self.quantize else FP32_FILE)
+        with open(os.path.join(self.model_dir, EXPORT_CONFIG_FILE)) as f:
+            self.export_config = json.load(f)
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(self.model_dir, TOKENIZER_FILE))
+        # Padding is done per length bucket in _embed_sync
+        self.tokenizer.enable_truncation(max_length=self.export_config["max_seq_length"])
+        self.tokenizer.no_padding()
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        if self.intra_op_threads > 0:
+            options.intra_op_num_threads = self.intra_op_threads
+        options.inter_op_num_threads = 1
+        session = ort.InferenceSession(onnx_file, options, providers=["CPUExecutionProvider"])
+        self._input_names = [i.name for i in session.get_inputs()]
+        return session
+
+    def _run_bucket(self, encodings, width: int) -> np.ndarray:
+        """Mean-pooled embeddings of encodings padded to width tokens."""
+        input_ids = np.full((len(encodings), width), self.export_config["pad_token_id"], dtype=np.int64)
+        token_type_ids = np.zeros_like(input_ids)
+        mask = np.zeros_like(input_ids)
+        for row, encoding in enumerate(encodings):
+            n = len(encoding.ids)
+            input_ids[row, :n] = encoding.ids
+            token_type_ids[row, :n] = encoding.type_ids
+            mask[row, :n] = 1
+        feeds = {"input_ids": input_ids, "attention_mask": mask, "token_type_ids": token_type_ids}
+        hidden = self.model.run(None, {name: feeds[name] for name in self._input_names})[0]
+
+        weights = mask[:, :, None].astype(EMBEDDING_DTYPE)
+        return (hidden * weights).sum(axis=1) / np.clip(weights.sum(axis=1), 1e-9, None)
+
+    def _embed_sync(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(list(texts))
+        lengths = np.fromiter((len(e.ids) for e in encodings), dtype=np.int64, count=len(encodings))
+        order = np.argsort(lengths, kind="stable")
+
+        out = None
+        for start in range(0, len(order), self.bucket_size):
+            rows = order[start:start + self.bucket_size]
+            pooled = self._run_bucket([encodings[i] for i in rows], int(lengths[rows].max()))
+            if out is None:
+                out = np.empty((len(encodings), pooled.shape[1]), dtype=EMBEDDING_DTYPE)
+            out[rows] = pooled
+        if out is None:
+            return np.empty((0, 0), dtype=EMBEDDING_DTYPE)
+        if self.export_config["normalize"]:
+            out /= np.clip(np.linalg.norm(out, axis=1, keepdims=True), 1e-12, None)
+        return out
+
+    def stats(self) -> Dict[str, Any]:
+        stats = super().stats()
+        stats["quantized"] = self.quantize
+        return stats
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Export a sentence-transformers model to ONNX")
+    parser.add_argument("model_name", nargs="?", default="all-MiniLM-L6-v2")
+    parser.add_argument("--model-dir", default="app/core/onnx_models")
+    parser.add_argument("--quantize", action="store_true", help="also write a dynamic int8 model")
+    args = parser.parse_args(argv)
+    out_dir = model_path(args.model_dir, args.model_name)
+    config = export_model(args.model_name, out_dir, quantize=args.quantize)
+    print(f"Exported {args.model_name} to {out_dir}: {config}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+import os
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Deque, Iterator, List, Optional, Tuple
+
+from PyPDF2 import PdfReader
+
+from app.core.config import settings
+from app.core.extract import DocumentTooLarge
+from app.core.process_pool import _spawn_context
+
+DEFAULT_PAGES_PER_TASK = 8
+# Below this many pages the pool round trips cost more than they save
+DEFAULT_PARALLEL_MIN_PAGES = 16
+
+# The document a pool worker has open: ((path, inode, mtime), file, reader)
+_worker_document: Optional[Tuple[Tuple[str, int, int], object, PdfReader]] = None
+
+
+def _worker_reader(path: str) -> PdfReader:
+    """Runs in a pool worker: reuse its reader while the ranges of one document keep coming."""
+    global _worker_document
+    st = os.stat(path)
+    key = (path, st.st_ino, st.st_mtime_ns)
+    if _worker_document is None or _worker_document[0] != key:
+        if _worker_document is not None:
+            _worker_document[1].close()
+        f = open(path, "rb")
+        _worker_document = (key, f, PdfReader(f))
+    return _worker_document[2]
+
+
+def _extract_range(path: str, start: int, stop: int) -> List[str]:
+    pages = _worker_reader(path).pages
+    return [pages[i].extract_text() or "" for i in range(start, stop)]
+
+
+class PdfExtractor:
+    """
+    Page-level PDF text extraction over a process pool.
+
+    The document is split into ranges of pages_per_task pages; up to two
+    ranges per worker are in flight at a time and their pages are yielded
+    in document order as each range completes, so extraction runs ahead of
+    the consumer without ever holding the whole document's text. Each
+    worker opens the file itself, so only paths and page text cross the
+    process boundary.
+
+    iter_pages() blocks; call it from a worker thread, never the event loop.
+    Documents over max_pages pages or max_bytes bytes raise DocumentTooLarge
+    before any page is extracted. workers=0 extracts in the calling thread.
+    """
+    def __init__(self, workers: int = 2, pages_per_task: int = DEFAULT_PAGES_PER_TASK,
+                 max_pages: int = 0, max_bytes: int = 0,
+                 parallel_min_pages: int = DEFAULT_PARALLEL_MIN_PAGES):
+        self.workers = max(0, workers)
+        self.pages_per_task = max(1, pages_per_task)
+        self.max_pages = max_pages
+        self.max_bytes = max_bytes
+        self.parallel_min_pages = parallel_min_pages
+        self._pool: Optional[ProcessPoolExecutor] = None
+        if self.workers:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=_spawn_context(),
+            )
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+
+    def _check_size(self, path: str):
+        size = os.path.getsize(path)
+        if self.max_bytes and size > self.max_bytes:
+            raise DocumentTooLarge(f"Document is {size / 2**20:.1f} MB; the limit is {self.max_bytes / 2**20:.0f} MB.")
+
+    def _check_pages(self, pages: int):
+        if self.max_pages and pages > self.max_pages:
+            raise DocumentTooLarge(f"Document has {pages} pages; the limit is {self.max_pages}.")
+
+    def iter_pages(self, path: str) -> Iterator[str]:
+        """Text of each page, in order."""
+        self._check_size(path)
+        with open(path, "rb") as f:
+            # Only the xref table and page tree are parsed here
+            pages = PdfReader(f).pages
+            self._check_pages(len(pages))
+            if self._pool is None or len(pages) < self.parallel_min_pages:
+                for page in pages:
+                    yield page.extract_text() or ""
+                return
+            count = len(pages)
+
+        in_flight: Deque[Future] = deque()
+        try:
+            for start in range(0, count, self.pages_per_task):
+                in_flight.append(self._pool.submit(
+                    _extract_range, path, start, min(start + self.pages_per_task, count),
+                ))
+                if len(in_flight) >= 2 * self.workers:
+                    yield from in_flight.popleft().result()
+            while in_flight:
+                yield from in_flight.popleft().result()
+        finally:
+            # The consumer stopped early (error or cancellation)
+            for future in in_flight:
+                future.cancel()
+
+
+_pdf_extractor: Optional[PdfExtractor] = None
+
+
+def get_pdf_extractor() -> PdfExtractor:
+    """Process-wide extractor, so pool workers are spawned once."""
+    global _pdf_extractor
+    if _pdf_extractor is None:
+        _pdf_extractor = PdfExtractor(
+            workers=settings.pdf_workers,
+            pages_per_task=settings.pdf_pages_per_task,
+            max_pages=settings.pdf_max_pages,
+            max_bytes=settings.upload_max_mb * 2**20,
+        )
+    return _pdf_extractor
+
+
+def close_pdf_extractor():
+    global _pdf_extractor
+    if _pdf_extractor is not None:
+        _pdf_extractor.close()
+        _pdf_extractor = None
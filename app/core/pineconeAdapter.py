@@ -1,21 +1,247 @@
+import os
 import sqlite3
 import json
+import threading
+import time
 import numpy as np
 import asyncio
-from typing import List, Dict, Any
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional
+
+from app.core import lexical_index
+from app.core.vector_cache import CachedMatrix, SessionMatrixCache
+from app.core.ann_index import IVFCentroids, assign_lists, default_nlist, probe_order, train_centroids
+from app.core.quantization import QUANTIZATION_KINDS, fit_quantizer, quantizer_from_bytes, quantizer_to_bytes
+from app.core.segment_store import BackgroundCompactor, DEFAULT_SEGMENT_MAX_ROWS, SegmentStore
+from app.core.sqlite_util import batched, release_free_pages
+
+# Bump whenever the on-disk layout of document_chunks changes; _init_db
+# migrates older databases forward on startup.
+SCHEMA_VERSION = 7
+
+EMBEDDING_DTYPE = np.float32
+
+DEFAULT_DB_PATH = "app/core/local_vector_db.db"
+
+# "sqlite" keeps vectors inline as BLOBs; "segments" appends them to
+# memory-mapped .f32 files next to the database
+STORAGE_MODES = ("sqlite", "segments")
+DEFAULT_COMPACT_INTERVAL = 300.0
+
+# Every vector read selects these; a row's vector is either the inline BLOB
+# or a (segment_id, segment_row) pointer, whichever storage wrote it
+_VECTOR_COLUMNS = "embedding, segment_id, segment_row"
+
+# Generation scope bumped by every write; guards the unfiltered (global) view
+GLOBAL_SCOPE = "__all__"
+
+DEFAULT_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# Scopes smaller than this are always searched exactly; larger ones go
+# through the IVF index once it has been trained
+DEFAULT_ANN_MIN_ROWS = 20000
+DEFAULT_ANN_NPROBE = 8
+# Retrain the coarse quantizer once the table has grown this much. Training
+# runs on a background thread started by the write that crosses the
+# threshold (ann_auto_train=False leaves it to build_ann_index()).
+ANN_RETRAIN_GROWTH = 4
+ANN_TRAIN_SAMPLE = 50000
+_ANN_ASSIGN_BATCH = 10000
+
+# Quantized search keeps top_k * rerank_factor candidates for exact re-ranking
+DEFAULT_RERANK_FACTOR = 4
+DEFAULT_PQ_SUBSPACES = 48
+QUANTIZER_TRAIN_SAMPLE = 50000
+
+# "vector": cosine only. "keyword": BM25 hits pre-filter the scope and only
+# their vectors are scored. "hybrid": reciprocal rank fusion of the vector
+# and BM25 rankings, each taken top_k * rerank_factor deep.
+QUERY_MODES = ("vector", "keyword", "hybrid")
+
+# Applied to every connection the adapter opens. WAL lets readers keep
+# querying while an ingest holds the write lock; NORMAL sync is durable
+# across application crashes in WAL mode.
+DEFAULT_SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 30000,
+    "mmap_size": 256 * 1024 * 1024,
+    "cache_size": -64 * 1024,  # negative = KiB
+    "temp_store": "MEMORY",
+}
+
+# Sessions are deleted this many chunks per write transaction, so queries
+# and ingests are never locked out for the whole delete
+SESSION_DELETE_BATCH = 5000
+# A query refreshes its session's last_used at most this often
+SESSION_TOUCH_INTERVAL = 60.0
+
+
+def _encode_vector(vector) -> bytes:
+    """L2-normalize a vector and pack it as a raw float32 BLOB."""
+    arr = np.asarray(vector, dtype=EMBEDDING_DTYPE).ravel()
+    norm = np.linalg.norm(arr)
+    if norm > 0:
+        arr = arr / norm
+    return arr.astype(EMBEDDING_DTYPE, copy=False).tobytes()
+
+
+def _encode_vectors(vectors) -> List[bytes]:
+    """_encode_vector over a batch, normalizing an (n, dim) matrix in one pass."""
+    try:
+        matrix = np.asarray(vectors, dtype=EMBEDDING_DTYPE)
+    except ValueError:
+        # Rows of different lengths
+        return [_encode_vector(v) for v in vectors]
+    if matrix.ndim != 2:
+        return [_encode_vector(v) for v in vectors]
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    matrix = np.ascontiguousarray(matrix / np.where(norms > 0, norms, 1), dtype=EMBEDDING_DTYPE)
+    return [row.tobytes() for row in matrix]
+
+
+def _top_k_indices(scores: np.ndarray, top_k: int) -> np.ndarray:
+    """Indices of the top_k highest scores, best first."""
+    if top_k >= scores.shape[0]:
+        return np.argsort(-scores, kind="stable")
+    idx = np.argpartition(-scores, top_k - 1)[:top_k]
+    return idx[np.argsort(-scores[idx], kind="stable")]
+
 
 class PineconeVectorAdapter:
     """
     Local Vector Adapter that implements the exact same interface as PineconeVectorAdapter
     but uses a fully local SQLite database and numpy cosine similarity computations.
+
+    Embeddings are stored L2-normalized as raw float32 BLOBs, so scoring a
+    session is a single matrix-vector product. Loaded session matrices are
+    kept in an LRU cache; every write bumps a per-session generation counter
+    in SQLite so that writes from other processes invalidate stale entries.
+
+    Large scopes are searched through an IVF index: centroids live in the
+    ann_centroids table and each chunk row records its inverted list in
+    ivf_list, so inserts and retrains are transactional with the data.
+    The table's row count is kept in vector_row_count, so deciding whether
+    to (re)train never scans the table.
+
+    With quantization set to "int8" or "pq", each row also carries compact
+    codes (embedding_int8 / embedding_pq). The cache then holds only codes,
+    candidates are scored asymmetrically against them and the best
+    top_k * rerank_factor are re-ranked with the exact float vectors.
+
+    Chunk text is indexed by an FTS5 table (see lexical_index) maintained
+    in the same transaction as every upsert, so queries can also run in
+    "keyword" or "hybrid" mode (see QUERY_MODES).
+
+    With storage="segments", new vectors are appended to memory-mapped
+    segment files (see SegmentStore) instead of the embedding column, and a
+    background thread compacts segments left sparse by overwrites. Reads
+    handle both layouts, so a database can switch modes at any time.
+
+    Every session's last write or query time is kept in vector_sessions.
+    delete_session() and expire_sessions() remove a session's chunks in
+    small batches and vacuum() hands the freed pages back to the OS (the
+    file uses incremental auto_vacuum).
+
+    Implements the VectorBackend protocol (see vector_backend): the async
+    methods run the _sync_* ones on the default executor, and the *_sync
+    aliases expose those directly.
+
+    Each thread that touches the adapter gets its own long-lived SQLite
+    connection, opened in autocommit mode with DEFAULT_SQLITE_PRAGMAS;
+    transactions are explicit through _transaction().
     """
-    def __init__(self):
+    def __init__(self,
+                 cache_max_bytes: int = DEFAULT_CACHE_MAX_BYTES,
+                 ann_min_rows: int = DEFAULT_ANN_MIN_ROWS,
+                 ann_nprobe: int = DEFAULT_ANN_NPROBE,
+                 ann_auto_train: bool = True,
+                 quantization: Optional[str] = None,
+                 pq_subspaces: int = DEFAULT_PQ_SUBSPACES,
+                 rerank_factor: int = DEFAULT_RERANK_FACTOR,
+                 db_path: str = DEFAULT_DB_PATH,
+                 storage: str = "sqlite",
+                 segment_max_rows: int = DEFAULT_SEGMENT_MAX_ROWS,
+                 compact_interval: float = DEFAULT_COMPACT_INTERVAL,
+                 sqlite_pragmas: Optional[Dict[str, Any]] = None):
+        if quantization is not None and quantization not in QUANTIZATION_KINDS:
+            raise ValueError(f"Unknown vector quantization: {quantization!r}. Supported: {', '.join(QUANTIZATION_KINDS)}")
+        if storage not in STORAGE_MODES:
+            raise ValueError(f"Unknown vector storage: {storage!r}. Supported: {', '.join(STORAGE_MODES)}")
         # Store index db locally in the app/core folder
-        self.db_path = "app/core/local_vector_db.db"
+        self.db_path = db_path
+        self.sqlite_pragmas = {**DEFAULT_SQLITE_PRAGMAS, **(sqlite_pragmas or {})}
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        self._cache = SessionMatrixCache(cache_max_bytes)
+        self.ann_min_rows = ann_min_rows
+        self.ann_nprobe = ann_nprobe
+        self.ann_auto_train = ann_auto_train
+        self.ann_last_error: Optional[str] = None
+        self._ann_trainer: Optional[threading.Thread] = None
+        self._ann_trainer_lock = threading.Lock()
+        self.quantization = quantization
+        self.pq_subspaces = pq_subspaces
+        self.rerank_factor = max(1, rerank_factor)
+        self._ivf: Optional[IVFCentroids] = None
+        self._quantizers: Dict[str, Any] = {}
+        self._touched: Dict[str, float] = {}
+        self.storage = storage
+        self._segments = SegmentStore(os.path.splitext(db_path)[0] + "_segments", segment_max_rows)
         self._init_db()
 
+        self._compactor = None
+        if storage == "segments" and compact_interval > 0:
+            self._compactor = BackgroundCompactor(self._segments, self.db_path, compact_interval)
+            self._compactor.start()
+
+    def close(self):
+        """Stop background work and close every connection owned by the adapter."""
+        if self._compactor is not None:
+            self._compactor.stop()
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        """This thread's persistent connection, opened on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # check_same_thread=False only so close() can run from any thread
+            conn = sqlite3.connect(self.db_path, isolation_level=None, check_same_thread=False)
+            for name, value in self.sqlite_pragmas.items():
+                conn.execute(f"PRAGMA {name} = {value}")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    @contextmanager
+    def _transaction(self, immediate: bool = False):
+        """
+        Explicit transaction on this thread's connection. immediate=True takes
+        the write lock up front; a deferred transaction is a consistent read
+        snapshot under WAL.
+        """
+        conn = self._connection()
+        cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+        try:
+            yield cursor
+        except BaseException:
+            conn.rollback()
+            raise
+        cursor.execute("COMMIT")
+
     def _init_db(self):
         conn = sqlite3.connect(self.db_path)
+        # Only takes effect on a new file; older files are converted below
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        # journal_mode=WAL is persistent, so set it once when creating the file
+        conn.execute(f"PRAGMA journal_mode = {self.sqlite_pragmas['journal_mode']}")
         cursor = conn.cursor()
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS document_chunks (
@@ -23,15 +249,122 @@ class PineconeVectorAdapter:
                 session_id TEXT,
                 source TEXT,
                 text_preview TEXT,
-                embedding TEXT,
-                metadata TEXT
+                embedding BLOB,
+                metadata TEXT,
+                ivf_list INTEGER,
+                embedding_int8 BLOB,
+                embedding_pq BLOB,
+                segment_id INTEGER,
+                segment_row INTEGER
             )
         """)
         # Index on session_id for lightning-fast lookups
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_session_id ON document_chunks (session_id)")
+        # Single-row table holding the trained IVF coarse quantizer
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS ann_centroids (
+                id INTEGER PRIMARY KEY CHECK (id = 0),
+                version INTEGER NOT NULL,
+                trained_rows INTEGER NOT NULL,
+                nlist INTEGER NOT NULL,
+                dim INTEGER NOT NULL,
+                centroids BLOB NOT NULL
+            )
+        """)
+        # Single-row count of document_chunks, maintained by every write
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS vector_row_count (
+                id INTEGER PRIMARY KEY CHECK (id = 0),
+                rows INTEGER NOT NULL
+            )
+        """)
+        # Trained quantizer parameters, one row per kind
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS vector_quantizers (
+                kind TEXT PRIMARY KEY,
+                version INTEGER NOT NULL,
+                params BLOB NOT NULL
+            )
+        """)
+        SegmentStore.init_schema(cursor)
+        lexical_index.init_schema(cursor)
+        # Last write or query per session, for TTL expiry
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS vector_sessions (
+                session_id TEXT PRIMARY KEY,
+                last_used REAL NOT NULL
+            )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_sessions_last_used ON vector_sessions (last_used)")
+        # Write counter per session (plus GLOBAL_SCOPE) for cache validation
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS vector_generations (
+                scope TEXT PRIMARY KEY,
+                generation INTEGER NOT NULL
+            )
+        """)
         conn.commit()
+
+        version = cursor.execute("PRAGMA user_version").fetchone()[0]
+        if version < 1:
+            self._migrate_json_embeddings(conn)
+        columns = {row[1] for row in cursor.execute("PRAGMA table_info(document_chunks)")}
+        if version < 2 and "ivf_list" not in columns:
+            cursor.execute("ALTER TABLE document_chunks ADD COLUMN ivf_list INTEGER")
+        if version < 3:
+            for kind in QUANTIZATION_KINDS:
+                if f"embedding_{kind}" not in columns:
+                    cursor.execute(f"ALTER TABLE document_chunks ADD COLUMN embedding_{kind} BLOB")
+        if version < 4:
+            for column in ("segment_id", "segment_row"):
+                if column not in columns:
+                    cursor.execute(f"ALTER TABLE document_chunks ADD COLUMN {column} INTEGER")
+        if version < 5:
+            # Index the text of chunks written before the FTS table existed
+            lexical_index.rebuild(cursor)
+        if version < 6:
+            # Existing sessions start their TTL now rather than expiring at once
+            cursor.execute("""
+                INSERT OR IGNORE INTO vector_sessions (session_id, last_used)
+                SELECT DISTINCT session_id, ? FROM document_chunks WHERE session_id IS NOT NULL
+            """, (time.time(),))
+        if version < 7:
+            cursor.execute(
+                "INSERT OR REPLACE INTO vector_row_count (id, rows) SELECT 0, COUNT(*) FROM document_chunks"
+            )
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_ivf_list ON document_chunks (ivf_list)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_segment_id ON document_chunks (segment_id)")
+        cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        conn.commit()
+
+        if cursor.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            # One-off rewrite of a file created before incremental vacuum.
+            # VACUUM may renumber rowids, which the FTS index is keyed by.
+            conn.execute("VACUUM")
+            lexical_index.rebuild(cursor)
+            conn.commit()
         conn.close()
 
+    def _migrate_json_embeddings(self, conn: sqlite3.Connection, batch_size: int = 1000):
+        """Rewrite legacy JSON-text embeddings as normalized float32 BLOBs."""
+        read_cursor = conn.cursor()
+        read_cursor.execute(
+            "SELECT id, embedding FROM document_chunks WHERE typeof(embedding) = 'text'"
+        )
+        while True:
+            rows = read_cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            updates = []
+            for vid, emb_str in rows:
+                try:
+                    updates.append((_encode_vector(json.loads(emb_str)), vid))
+                except (ValueError, TypeError):
+                    # Unparseable rows were already skipped at query time
+                    continue
+            conn.executemany("UPDATE document_chunks SET embedding = ? WHERE id = ?", updates)
+        conn.commit()
+
     async def upsert(self,
                   ids: List[str],
                   vectors: List[List[float]],
@@ -44,84 +377,796 @@ class PineconeVectorAdapter:
         )
 
     def _sync_upsert(self, ids: List[str], vectors: List[List[float]], metadatas: List[Dict[str, Any]]):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        for i, vid in enumerate(ids):
-            meta = metadatas[i]
-            session_id = meta.get("session_id")
-            source = meta.get("source", "Uploaded Document")
-            text_preview = meta.get("text_preview", "")
-            
+        blobs = _encode_vectors(vectors)
+        # The chunk text already has its own column; keeping a second copy
+        # inside the metadata JSON would double the bytes read per winner
+        meta_json = [
+            json.dumps({k: v for k, v in meta.items() if k != "text_preview"})
+            for meta in metadatas
+        ]
+
+        # Take the write lock up front so the generations read below are the
+        # ones this write is bumping
+        with self._transaction(immediate=True) as cursor:
+            # New rows go straight into their inverted list when an index exists
+            ivf_lists = [None] * len(ids)
+            ivf = self._current_ivf(cursor)
+            if ivf is not None:
+                row_bytes = ivf.dim * np.dtype(EMBEDDING_DTYPE).itemsize
+                fits = [i for i, b in enumerate(blobs) if len(b) == row_bytes]
+                if fits:
+                    matrix = np.frombuffer(b"".join(blobs[i] for i in fits), dtype=EMBEDDING_DTYPE)
+                    for i, list_id in zip(fits, assign_lists(ivf.centroids, matrix.reshape(len(fits), ivf.dim))):
+                        ivf_lists[i] = int(list_id)
+
+            # Keep codes of every trained quantizer current, whichever one this
+            # adapter searches with
+            codes = {}
+            for kind in QUANTIZATION_KINDS:
+                quantizer = self._current_quantizer(cursor, kind)
+                if quantizer is not None:
+                    codes[kind] = self._encode_blobs(quantizer, blobs)
+
+            # Chunks being moved out of another session make that session stale
+            # too; overwritten segment rows become tombstones
+            new_sessions = {vid: meta.get("session_id") for vid, meta in zip(ids, metadatas)}
+            displaced = set()
+            dead_segment_rows = []
+            unique_ids = list(dict.fromkeys(ids))
+            replaced_rows = 0
+            for batch in batched(unique_ids):
+                cursor.execute(
+                    f"SELECT id, session_id, segment_id FROM document_chunks WHERE id IN ({','.join('?' * len(batch))})",
+                    batch,
+                )
+                for vid, old_session, old_segment in cursor.fetchall():
+                    replaced_rows += 1
+                    if old_session != new_sessions[vid]:
+                        displaced.add(old_session)
+                    dead_segment_rows.append(old_segment)
+                # Replaced rows get new rowids, so their postings go too
+                lexical_index.unindex_ids(cursor, batch)
+
+            pointers = [(None, None)] * len(ids)
+            if self.storage == "segments":
+                pointers = self._append_to_segments(cursor, blobs)
+                # A chunk id repeated within the batch overwrites its earlier row
+                seen = set()
+                for vid, (segment_id, _) in zip(reversed(ids), reversed(pointers)):
+                    if vid in seen:
+                        dead_segment_rows.append(segment_id)
+                    seen.add(vid)
+            self._segments.add_tombstones(cursor, dead_segment_rows)
+
+            cursor.executemany("""
+                INSERT OR REPLACE INTO document_chunks
+                    (id, session_id, source, text_preview, embedding, metadata, ivf_list,
+                     embedding_int8, embedding_pq, segment_id, segment_row)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, [
+                (
+                    vid,
+                    meta.get("session_id"),
+                    meta.get("source", "Uploaded Document"),
+                    meta.get("text_preview"),
+                    blobs[i] if pointers[i][0] is None else None,
+                    meta_json[i],
+                    ivf_lists[i],
+                    codes["int8"][i] if "int8" in codes else None,
+                    codes["pq"][i] if "pq" in codes else None,
+                    pointers[i][0],
+                    pointers[i][1],
+                )
+                for i, (vid, meta) in enumerate(zip(ids, metadatas))
+            ])
+            for batch in batched(unique_ids):
+                lexical_index.index_ids(cursor, batch)
+            total_rows = self._adjust_row_count(cursor, len(unique_ids) - replaced_rows)
+
+            written = {m.get("session_id") for m in metadatas}
+            self._touch_sessions(cursor, [s for s in written if s is not None])
+            scopes = [s for s in (written | displaced) if s is not None] + [GLOBAL_SCOPE]
+            old_generations = self._bump_generations(cursor, scopes)
+
+        self._apply_to_cache(ids, blobs, metadatas, old_generations, displaced)
+        self._maybe_train_ivf(total_rows)
+
+    def _append_to_segments(self, cursor: sqlite3.Cursor, blobs: List[bytes]) -> List[tuple]:
+        """Append vectors to segment files, grouped by dimension; returns per-row pointers."""
+        by_size: Dict[int, List[int]] = {}
+        for i, blob in enumerate(blobs):
+            by_size.setdefault(len(blob), []).append(i)
+        pointers: List[tuple] = [(None, None)] * len(blobs)
+        for size, rows in by_size.items():
+            dim = size // np.dtype(EMBEDDING_DTYPE).itemsize
+            matrix = np.frombuffer(b"".join(blobs[i] for i in rows), dtype=EMBEDDING_DTYPE).reshape(len(rows), dim)
+            for i, pointer in zip(rows, self._segments.append(cursor, matrix)):
+                pointers[i] = pointer
+        return pointers
+
+    def compact_segments(self) -> Dict[str, int]:
+        """Run one segment compaction pass now instead of waiting for the background thread."""
+        return self._segments.compact(self._connection())
+
+    def segment_stats(self) -> Dict[str, int]:
+        return self._segments.stats(self._connection().cursor())
+
+    # ── Session lifecycle ─────────────────────────────────────────────────────
+    @staticmethod
+    def _touch_sessions(cursor: sqlite3.Cursor, session_ids: List[str]):
+        now = time.time()
+        cursor.executemany("""
+            INSERT INTO vector_sessions (session_id, last_used) VALUES (?, ?)
+            ON CONFLICT(session_id) DO UPDATE SET last_used = excluded.last_used
+        """, [(session_id, now) for session_id in session_ids])
+
+    def _touch_session_on_read(self, session_id: str):
+        """
+        Keep a session that is only being queried from expiring. Throttled,
+        and skipped rather than waited for when another writer holds the lock.
+        """
+        now = time.time()
+        if now - self._touched.get(session_id, 0.0) < SESSION_TOUCH_INTERVAL:
+            return
+        self._touched[session_id] = now
+        conn = self._connection()
+        conn.execute("PRAGMA busy_timeout = 0")
+        try:
+            conn.execute(
+                "UPDATE vector_sessions SET last_used = ? WHERE session_id = ? AND last_used < ?",
+                (now, session_id, now),
+            )
+        except sqlite3.OperationalError:
+            # Database busy; the next query retries
+            self._touched.pop(session_id, None)
+        finally:
+            conn.execute(f"PRAGMA busy_timeout = {self.sqlite_pragmas['busy_timeout']}")
+
+    def _delete_chunks(self, cursor: sqlite3.Cursor, ids: List[str]):
+        """Remove chunks with their FTS postings; segment rows become tombstones."""
+        for batch in batched(ids):
+            placeholders = ",".join("?" * len(batch))
+            segment_ids = [row[0] for row in cursor.execute(
+                f"SELECT segment_id FROM document_chunks WHERE id IN ({placeholders})", batch
+            ).fetchall()]
+            self._segments.add_tombstones(cursor, segment_ids)
+            lexical_index.unindex_ids(cursor, batch)
+            cursor.execute(f"DELETE FROM document_chunks WHERE id IN ({placeholders})", batch)
+            self._adjust_row_count(cursor, -cursor.rowcount)
+
+    async def delete(self, ids: List[str]) -> int:
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, self._sync_delete, ids)
+
+    def _sync_delete(self, ids: List[str]) -> int:
+        """Delete chunks by id; returns how many existed."""
+        with self._transaction(immediate=True) as cursor:
+            existing, sessions = [], set()
+            for batch in batched(list(dict.fromkeys(ids))):
+                for vid, session_id in cursor.execute(
+                    f"SELECT id, session_id FROM document_chunks WHERE id IN ({','.join('?' * len(batch))})", batch
+                ).fetchall():
+                    existing.append(vid)
+                    sessions.add(session_id)
+            if not existing:
+                return 0
+            self._delete_chunks(cursor, existing)
+            self._bump_generations(cursor, [s for s in sessions if s is not None] + [GLOBAL_SCOPE])
+
+        for session_id in sessions:
+            self._cache.invalidate(session_id)
+        self._cache.invalidate(None)
+        return len(existing)
+
+    async def delete_session(self, session_id: str) -> int:
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, self._sync_delete_session, session_id)
+
+    def _sync_delete_session(self, session_id: str, idle_before: Optional[float] = None) -> int:
+        """
+        Delete every chunk of a session; returns how many were removed.
+
+        With idle_before set, the session is only deleted if it has not been
+        used since then, so a session touched after the reaper picked it is
+        left alone.
+        """
+        deleted = 0
+        while True:
+            with self._transaction(immediate=True) as cursor:
+                if idle_before is not None:
+                    row = cursor.execute(
+                        "SELECT last_used FROM vector_sessions WHERE session_id = ?", (session_id,)
+                    ).fetchone()
+                    if row is not None and row[0] >= idle_before:
+                        break
+                ids = [row[0] for row in cursor.execute(
+                    "SELECT id FROM document_chunks WHERE session_id = ? LIMIT ?",
+                    (session_id, SESSION_DELETE_BATCH),
+                ).fetchall()]
+                if ids:
+                    self._delete_chunks(cursor, ids)
+                    deleted += len(ids)
+                else:
+                    cursor.execute("DELETE FROM vector_sessions WHERE session_id = ?", (session_id,))
+                # Readers between batches must not serve the cached rows
+                self._bump_generations(cursor, [session_id, GLOBAL_SCOPE])
+            if not ids:
+                break
+
+        self._cache.invalidate(session_id)
+        self._cache.invalidate(None)
+        self._touched.pop(session_id, None)
+        return deleted
+
+    def expire_sessions(self, ttl_seconds: float) -> Dict[str, Any]:
+        """Delete sessions unused for ttl_seconds, then vacuum the freed pages."""
+        cutoff = time.time() - ttl_seconds
+        expired = [row[0] for row in self._connection().execute(
+            "SELECT session_id FROM vector_sessions WHERE last_used < ?", (cutoff,)
+        ).fetchall()]
+        chunks = sum(self._sync_delete_session(session_id, idle_before=cutoff) for session_id in expired)
+        return {"sessions": expired, "chunks_deleted": chunks, "pages_freed": self.vacuum()}
+
+    def vacuum(self) -> int:
+        """Return free pages to the filesystem; returns how many were released."""
+        conn = self._connection()
+        before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        if before:
+            release_free_pages(conn)
+        return before - conn.execute("PRAGMA freelist_count").fetchone()[0]
+
+    def rebuild_lexical_index(self):
+        """Re-index all chunk text, e.g. after a full VACUUM renumbered rowids."""
+        with self._transaction(immediate=True) as cursor:
+            lexical_index.rebuild(cursor)
+
+    def _rows_to_matrix(self, cursor: sqlite3.Cursor, rows, dim: int):
+        """
+        Resolve (key, blob, segment_id, segment_row) rows into keys and an
+        (n, dim) matrix. Rows whose dimension does not match are skipped.
+        """
+        row_bytes = dim * np.dtype(EMBEDDING_DTYPE).itemsize
+        keys, blobs = [], []
+        seg_keys, seg_ids, seg_rows = [], [], []
+        for key, blob, segment_id, segment_row in rows:
+            if isinstance(blob, bytes):
+                if len(blob) == row_bytes:
+                    keys.append(key)
+                    blobs.append(blob)
+            elif segment_id is not None and self._segments.dim_of(cursor, segment_id) == dim:
+                seg_keys.append(key)
+                seg_ids.append(segment_id)
+                seg_rows.append(segment_row)
+
+        inline = np.frombuffer(b"".join(blobs), dtype=EMBEDDING_DTYPE).reshape(len(keys), dim)
+        if not seg_keys:
+            # Common case: wrap the joined bytes rather than copying them again
+            return keys, inline
+
+        matrix = np.empty((len(keys) + len(seg_keys), dim), dtype=EMBEDDING_DTYPE)
+        matrix[:len(keys)] = inline
+        seg_ids = np.asarray(seg_ids)
+        seg_rows = np.asarray(seg_rows)
+        out = matrix[len(keys):]
+        for segment_id in np.unique(seg_ids):
+            mask = seg_ids == segment_id
+            out[mask] = self._segments.gather(int(segment_id), dim, seg_rows[mask])
+        return keys + seg_keys, matrix
+
+    def _dominant_dim(self, cursor: sqlite3.Cursor, rows) -> Optional[int]:
+        """Most common vector dimension among sampled rows."""
+        dims = []
+        for _, blob, segment_id, _ in rows:
+            if isinstance(blob, bytes):
+                dims.append(len(blob) // np.dtype(EMBEDDING_DTYPE).itemsize)
+            elif segment_id is not None:
+                dims.append(self._segments.dim_of(cursor, segment_id))
+        dims = [d for d in dims if d]
+        return max(set(dims), key=dims.count) if dims else None
+
+    def _apply_to_cache(self, ids, blobs, metadatas, old_generations, displaced):
+        """Extend cached matrices with the rows just written."""
+        if not ids:
+            return
+        dim = len(blobs[0]) // np.dtype(EMBEDDING_DTYPE).itemsize
+        if any(len(b) != len(blobs[0]) for b in blobs):
+            # Mixed dimensions cannot be appended to a single matrix
+            self._cache.clear()
+            return
+        matrix = np.frombuffer(b"".join(blobs), dtype=EMBEDDING_DTYPE).reshape(len(ids), dim)
+
+        for session_id in displaced:
+            self._cache.invalidate(session_id)
+
+        by_session: Dict[Any, List[int]] = {}
+        for i, meta in enumerate(metadatas):
+            by_session.setdefault(meta.get("session_id"), []).append(i)
+        for session_id, rows in by_session.items():
+            if session_id is None or session_id in displaced:
+                continue
+            old = old_generations[session_id]
+            self._cache.extend(session_id, old, old + 1, [ids[i] for i in rows], matrix[rows])
+
+        old = old_generations[GLOBAL_SCOPE]
+        self._cache.extend(None, old, old + 1, list(ids), matrix)
+
+    def _bump_generations(self, cursor: sqlite3.Cursor, scopes: List[str]) -> Dict[str, int]:
+        """Increment the generation of each scope; returns the values before the bump."""
+        old_generations = {scope: self._generation(cursor, scope) for scope in scopes}
+        cursor.executemany("""
+            INSERT INTO vector_generations (scope, generation) VALUES (?, 1)
+            ON CONFLICT(scope) DO UPDATE SET generation = generation + 1
+        """, [(scope,) for scope in scopes])
+        return old_generations
+
+    @staticmethod
+    def _generation(cursor: sqlite3.Cursor, scope: str) -> int:
+        row = cursor.execute(
+            "SELECT generation FROM vector_generations WHERE scope = ?", (scope,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def cache_stats(self) -> Dict[str, int]:
+        """Hit/miss/eviction counters and memory use of the matrix cache."""
+        return self._cache.stats()
+
+    @staticmethod
+    def _row_count(cursor: sqlite3.Cursor) -> int:
+        row = cursor.execute("SELECT rows FROM vector_row_count WHERE id = 0").fetchone()
+        return row[0] if row else 0
+
+    @classmethod
+    def _adjust_row_count(cls, cursor: sqlite3.Cursor, delta: int) -> int:
+        """Apply a write's net change in rows; returns the new count."""
+        if delta:
             cursor.execute("""
-                INSERT OR REPLACE INTO document_chunks (id, session_id, source, text_preview, embedding, metadata)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, (
-                vid,
-                session_id,
-                source,
-                text_preview,
-                json.dumps(vectors[i]),
-                json.dumps(meta)
-            ))
-        conn.commit()
-        conn.close()
+                INSERT INTO vector_row_count (id, rows) VALUES (0, ?)
+                ON CONFLICT(id) DO UPDATE SET rows = rows + excluded.rows
+            """, (delta,))
+        return cls._row_count(cursor)
+
+    def _current_ivf(self, cursor: sqlite3.Cursor) -> Optional[IVFCentroids]:
+        """Return the trained centroids, reloading them if another process retrained."""
+        row = cursor.execute("SELECT version FROM ann_centroids WHERE id = 0").fetchone()
+        if row is None:
+            self._ivf = None
+        elif self._ivf is None or self._ivf.version != row[0]:
+            version, trained_rows, nlist, dim, blob = cursor.execute(
+                "SELECT version, trained_rows, nlist, dim, centroids FROM ann_centroids WHERE id = 0"
+            ).fetchone()
+            centroids = np.frombuffer(blob, dtype=EMBEDDING_DTYPE).reshape(nlist, dim)
+            self._ivf = IVFCentroids(version=version, centroids=centroids, trained_rows=trained_rows)
+        return self._ivf
+
+    def _ann_due(self, ivf: Optional[IVFCentroids], total: int) -> bool:
+        if self.ann_min_rows <= 0:
+            return False
+        if ivf is None:
+            return total >= self.ann_min_rows
+        return total >= ivf.trained_rows * ANN_RETRAIN_GROWTH
+
+    def _maybe_train_ivf(self, total: int):
+        """
+        Start a background (re)train once the table has grown enough. The
+        writer only compares counters; at most one trainer runs per adapter.
+        """
+        if not self.ann_auto_train or not self._ann_due(self._ivf, total):
+            return
+        with self._ann_trainer_lock:
+            if self._ann_trainer is not None and self._ann_trainer.is_alive():
+                return
+            self._ann_trainer = threading.Thread(target=self._train_ivf, name="ivf-trainer", daemon=True)
+            self._ann_trainer.start()
+
+    def _train_ivf(self):
+        try:
+            cursor = self._connection().cursor()
+            ivf = self._current_ivf(cursor)
+            if self._ann_due(ivf, self._row_count(cursor)):
+                self.build_ann_index(expected_version=ivf.version if ivf else 0)
+            self.ann_last_error = None
+        except Exception as e:
+            self.ann_last_error = str(e)
+
+    def build_ann_index(self, nlist: Optional[int] = None, sample_size: int = ANN_TRAIN_SAMPLE,
+                        expected_version: Optional[int] = None) -> bool:
+        """
+        (Re)train the IVF centroids and reassign every row to its list.
+
+        Training runs on a random sample outside the write lock; the
+        reassignment pass and the new centroids are committed together.
+        With expected_version set, the result is dropped if another trainer
+        (in this or another process) committed centroids in the meantime.
+        Returns whether new centroids were written.
+        """
+        cursor = self._connection().cursor()
+        sample_rows = cursor.execute(
+            f"SELECT id, {_VECTOR_COLUMNS} FROM document_chunks ORDER BY RANDOM() LIMIT ?", (sample_size,)
+        ).fetchall()
+        # Train on the dominant dimension; rows of other sizes stay unassigned
+        dim = self._dominant_dim(cursor, sample_rows)
+        if dim is None:
+            return False
+        _, sample = self._rows_to_matrix(cursor, sample_rows, dim)
+        total = self._row_count(cursor)
+        centroids = train_centroids(sample, nlist or default_nlist(total))
+
+        with self._transaction(immediate=True) as cursor:
+            current = self._current_ivf(cursor)
+            if expected_version is not None and (current.version if current else 0) != expected_version:
+                return False
+            last_rowid = 0
+            while True:
+                rows = cursor.execute(
+                    f"SELECT rowid, {_VECTOR_COLUMNS} FROM document_chunks WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                    (last_rowid, _ANN_ASSIGN_BATCH),
+                ).fetchall()
+                if not rows:
+                    break
+                rowids, matrix = self._rows_to_matrix(cursor, rows, dim)
+                cursor.execute(
+                    "UPDATE document_chunks SET ivf_list = NULL WHERE rowid > ? AND rowid <= ?",
+                    (last_rowid, rows[-1][0]),
+                )
+                last_rowid = rows[-1][0]
+                cursor.executemany(
+                    "UPDATE document_chunks SET ivf_list = ? WHERE rowid = ?",
+                    zip(assign_lists(centroids, matrix).tolist(), rowids),
+                )
+
+            version = current.version + 1 if current else 1
+            cursor.execute("""
+                INSERT OR REPLACE INTO ann_centroids (id, version, trained_rows, nlist, dim, centroids)
+                VALUES (0, ?, ?, ?, ?, ?)
+            """, (version, total, centroids.shape[0], dim, centroids.tobytes()))
+        self._current_ivf(self._connection().cursor())
+        return True
+
+    @staticmethod
+    def _encode_blobs(quantizer, blobs: List[bytes]) -> List[Optional[bytes]]:
+        """Quantize float32 blobs; rows of another dimension get no codes."""
+        row_bytes = quantizer.dim * np.dtype(EMBEDDING_DTYPE).itemsize
+        fits = [i for i, b in enumerate(blobs) if len(b) == row_bytes]
+        out: List[Optional[bytes]] = [None] * len(blobs)
+        if fits:
+            matrix = np.frombuffer(b"".join(blobs[i] for i in fits), dtype=EMBEDDING_DTYPE)
+            encoded = quantizer.encode(matrix.reshape(len(fits), quantizer.dim))
+            for i, row in zip(fits, encoded):
+                out[i] = row.tobytes()
+        return out
+
+    def _current_quantizer(self, cursor: sqlite3.Cursor, kind: str):
+        """Return the trained quantizer of this kind, reloading it after a retrain."""
+        row = cursor.execute("SELECT version FROM vector_quantizers WHERE kind = ?", (kind,)).fetchone()
+        if row is None:
+            self._quantizers.pop(kind, None)
+            return None
+        cached = self._quantizers.get(kind)
+        if cached is None or cached[0] != row[0]:
+            version, params = cursor.execute(
+                "SELECT version, params FROM vector_quantizers WHERE kind = ?", (kind,)
+            ).fetchone()
+            cached = self._quantizers[kind] = (version, quantizer_from_bytes(kind, params))
+        return cached[1]
+
+    def _ensure_quantizer(self):
+        quantizer = self._current_quantizer(self._connection().cursor(), self.quantization)
+        if quantizer is None:
+            self.build_quantizer(self.quantization)
+
+    def build_quantizer(self, kind: Optional[str] = None, sample_size: int = QUANTIZER_TRAIN_SAMPLE):
+        """
+        (Re)train a quantizer on a sample of stored vectors and backfill the
+        codes of every row. All cached matrices are invalidated since their
+        codes came from the previous parameters.
+        """
+        kind = kind or self.quantization
+        cursor = self._connection().cursor()
+        sample_rows = cursor.execute(
+            f"SELECT id, {_VECTOR_COLUMNS} FROM document_chunks ORDER BY RANDOM() LIMIT ?", (sample_size,)
+        ).fetchall()
+        dim = self._dominant_dim(cursor, sample_rows)
+        if dim is None:
+            return None
+        _, sample = self._rows_to_matrix(cursor, sample_rows, dim)
+        quantizer = fit_quantizer(kind, sample, self.pq_subspaces)
+
+        with self._transaction(immediate=True) as cursor:
+            last_rowid = 0
+            while True:
+                rows = cursor.execute(
+                    f"SELECT rowid, {_VECTOR_COLUMNS} FROM document_chunks WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                    (last_rowid, _ANN_ASSIGN_BATCH),
+                ).fetchall()
+                if not rows:
+                    break
+                cursor.execute(
+                    f"UPDATE document_chunks SET embedding_{kind} = NULL WHERE rowid > ? AND rowid <= ?",
+                    (last_rowid, rows[-1][0]),
+                )
+                last_rowid = rows[-1][0]
+                rowids, matrix = self._rows_to_matrix(cursor, rows, dim)
+                cursor.executemany(
+                    f"UPDATE document_chunks SET embedding_{kind} = ? WHERE rowid = ?",
+                    zip((row.tobytes() for row in quantizer.encode(matrix)), rowids),
+                )
+
+            cursor.execute("""
+                INSERT INTO vector_quantizers (kind, version, params) VALUES (?, 1, ?)
+                ON CONFLICT(kind) DO UPDATE SET version = version + 1, params = excluded.params
+            """, (kind, quantizer_to_bytes(quantizer)))
+            cursor.execute("UPDATE vector_generations SET generation = generation + 1")
+        self._cache.clear()
+        return self._current_quantizer(self._connection().cursor(), kind)
 
     async def query(
             self,
             vector: List[float],
             top_k: int,
-            session_id: str = None
+            session_id: str = None,
+            nprobe: Optional[int] = None,
+            mode: str = "vector",
+            query_text: Optional[str] = None
     ) -> List[Dict[str, Any]]:
         loop = asyncio.get_event_loop()
         return await loop.run_in_executor(
             None,
             self._sync_query,
-            vector, top_k, session_id
+            vector, top_k, session_id, nprobe, mode, query_text
         )
 
-    def _sync_query(self, query_vector: List[float], top_k: int, session_id: str = None) -> List[Dict[str, Any]]:
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Restrict querying to active session documents
+    async def query_many(
+            self,
+            vectors: List[List[float]],
+            top_k: int,
+            session_id: str = None,
+            nprobe: Optional[int] = None,
+            mode: str = "vector",
+            query_texts: Optional[List[str]] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """Score a batch of query vectors in one pass; one match list per vector."""
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(
+            None,
+            self._sync_query_many,
+            vectors, top_k, session_id, nprobe, mode, query_texts
+        )
+
+    def _load_matrix(self, cursor: sqlite3.Cursor, session_id: Optional[str], dim: int,
+                     generation: int) -> CachedMatrix:
+        if self.quantization:
+            quantizer = self._current_quantizer(cursor, self.quantization)
+            if quantizer is not None and quantizer.dim == dim:
+                return self._load_codes(cursor, session_id, quantizer, generation)
+
         if session_id:
-            cursor.execute("""
-                SELECT id, embedding, metadata FROM document_chunks 
-                WHERE session_id = ?
-            """, (session_id,))
+            cursor.execute(f"SELECT id, {_VECTOR_COLUMNS} FROM document_chunks WHERE session_id = ?", (session_id,))
         else:
-            cursor.execute("SELECT id, embedding, metadata FROM document_chunks")
-            
+            cursor.execute(f"SELECT id, {_VECTOR_COLUMNS} FROM document_chunks")
+
+        # One contiguous (n, dim) matrix of pre-normalized vectors -> cosine = dot.
+        # Rows whose dimension does not match the query cannot be scored.
+        ids, matrix = self._rows_to_matrix(cursor, cursor.fetchall(), dim)
+        return CachedMatrix(ids=ids, matrix=matrix, generation=generation)
+
+    def _load_codes(self, cursor: sqlite3.Cursor, session_id: Optional[str], quantizer,
+                    generation: int) -> CachedMatrix:
+        """Load only quantized codes; rows still missing codes are encoded on the fly."""
+        column = f"embedding_{self.quantization}"
+        if session_id:
+            cursor.execute(f"SELECT id, {column} FROM document_chunks WHERE session_id = ?", (session_id,))
+        else:
+            cursor.execute(f"SELECT id, {column} FROM document_chunks")
+
+        code_bytes = quantizer.code_width * np.dtype(quantizer.code_dtype).itemsize
+        ids, code_rows, missing = [], [], []
+        for vid, code in cursor.fetchall():
+            if isinstance(code, bytes) and len(code) == code_bytes:
+                ids.append(vid)
+                code_rows.append(code)
+            else:
+                missing.append(vid)
+
+        codes = np.frombuffer(b"".join(code_rows), dtype=quantizer.code_dtype).reshape(len(ids), quantizer.code_width)
+        if missing:
+            missing_ids, floats = self._rows_to_matrix(cursor, self._fetch_embeddings(cursor, missing), quantizer.dim)
+            ids.extend(missing_ids)
+            codes = np.vstack([codes, quantizer.encode(floats)])
+        return CachedMatrix(ids=ids, matrix=codes, generation=generation, quantizer=quantizer)
+
+    def _fetch_embeddings(self, cursor: sqlite3.Cursor, ids: List[str]) -> List[tuple]:
+        rows = []
+        for batch in batched(ids):
+            cursor.execute(
+                f"SELECT id, {_VECTOR_COLUMNS} FROM document_chunks WHERE id IN ({','.join('?' * len(batch))})",
+                batch,
+            )
+            rows.extend(cursor.fetchall())
+        return rows
+
+    def _load_ivf_candidates(self, cursor: sqlite3.Cursor, ivf: IVFCentroids, queries: np.ndarray,
+                             session_id: Optional[str], top_k: int, nprobe: int):
+        """
+        Read only the rows of the nprobe lists closest to each query; a batch
+        reads the union of its queries' lists once.
+
+        Rows not yet assigned to a list are always included. If the scope is
+        sparse in the probed lists, more lists are probed until top_k
+        candidates are found or the whole index has been visited.
+        """
+        session_clause = " AND session_id = ?" if session_id else ""
+        session_args = (session_id,) if session_id else ()
+
+        cursor.execute(
+            f"SELECT id, {_VECTOR_COLUMNS} FROM document_chunks WHERE ivf_list IS NULL{session_clause}",
+            session_args,
+        )
         rows = cursor.fetchall()
-        conn.close()
-        
-        if not rows:
-            return []
-            
-        # Perform highly optimized local numpy vector computations
-        query_np = np.array(query_vector)
-        query_norm = np.linalg.norm(query_np)
-        
-        matches = []
-        for vid, emb_str, meta_str in rows:
-            try:
-                emb = np.array(json.loads(emb_str))
+
+        order = probe_order(ivf.centroids, queries)
+        fetched = set()
+        probed = 0
+        step = max(1, nprobe)
+        while probed < ivf.nlist:
+            lists = sorted(set(order[:, probed:probed + step].ravel().tolist()) - fetched)
+            probed += step
+            fetched.update(lists)
+            if not lists:
+                continue
+            cursor.execute(
+                f"SELECT id, {_VECTOR_COLUMNS} FROM document_chunks "
+                f"WHERE ivf_list IN ({','.join('?' * len(lists))}){session_clause}",
+                (*lists, *session_args),
+            )
+            rows.extend(cursor.fetchall())
+            if len(rows) >= top_k:
+                break
+            step *= 2
+
+        return self._rows_to_matrix(cursor, rows, queries.shape[1])
+
+    def _scope_size(self, cursor: sqlite3.Cursor, session_id: Optional[str]) -> int:
+        if session_id:
+            return cursor.execute(
+                "SELECT COUNT(*) FROM document_chunks WHERE session_id = ?", (session_id,)
+            ).fetchone()[0]
+        return self._row_count(cursor)
+
+    def _fetch_metadata(self, cursor: sqlite3.Cursor, ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Second phase of a query: decode metadata for the winning ids only.
+
+        Scoring never touches metadata or chunk text, so a query reads and
+        parses top_k of them instead of one per row in the scope.
+        """
+        metadata = {}
+        for batch in batched(ids):
+            cursor.execute(
+                f"SELECT id, text_preview, metadata FROM document_chunks WHERE id IN ({','.join('?' * len(batch))})",
+                batch,
+            )
+            for vid, text_preview, meta_str in cursor.fetchall():
                 meta = json.loads(meta_str)
-                
-                emb_norm = np.linalg.norm(emb)
-                if query_norm > 0 and emb_norm > 0:
-                    score = float(np.dot(query_np, emb) / (query_norm * emb_norm))
+                # Rows written before the text was split out still carry it inline
+                if text_preview is not None:
+                    meta.setdefault("text_preview", text_preview)
+                metadata[vid] = meta
+        return metadata
+
+    def _vector_candidates(self, cursor: sqlite3.Cursor, queries: np.ndarray, session_id: Optional[str],
+                           depth: int, nprobe: Optional[int]):
+        """Ids and float vectors of the rows a vector search should score exactly."""
+        dim = queries.shape[1]
+        ivf = self._current_ivf(cursor)
+        use_ann = (
+            ivf is not None
+            and ivf.dim == dim
+            and self.ann_min_rows > 0
+            and self._scope_size(cursor, session_id) >= self.ann_min_rows
+        )
+        if use_ann:
+            return self._load_ivf_candidates(cursor, ivf, queries, session_id, depth, nprobe or self.ann_nprobe)
+
+        # Small scopes: exact search over the (cached) full matrix
+        cache_key = session_id or None
+        generation = self._generation(cursor, session_id or GLOBAL_SCOPE)
+        entry = self._cache.get(cache_key, generation, dim)
+        if entry is None:
+            # Restrict querying to active session documents
+            entry = self._load_matrix(cursor, session_id, dim, generation)
+            self._cache.put(cache_key, entry)
+        if entry.quantizer is None or not entry.ids:
+            return entry.ids, entry.matrix
+
+        # Approximate scores on codes, then exact floats for the union of
+        # every query's shortlist
+        shortlist = set()
+        for query in queries:
+            approx = entry.quantizer.scores(entry.matrix, query)
+            shortlist.update(_top_k_indices(approx, depth * self.rerank_factor).tolist())
+        return self._rows_to_matrix(
+            cursor, self._fetch_embeddings(cursor, [entry.ids[i] for i in sorted(shortlist)]), dim
+        )
+
+    def _sync_query(self, vector: List[float], top_k: int, session_id: str = None,
+                    nprobe: Optional[int] = None, mode: str = "vector",
+                    query_text: Optional[str] = None) -> List[Dict[str, Any]]:
+        query_texts = [query_text] if query_text is not None else None
+        return self._sync_query_many([vector], top_k, session_id, nprobe, mode, query_texts)[0]
+
+    def _sync_query_many(self, vectors: List[List[float]], top_k: int, session_id: str = None,
+                         nprobe: Optional[int] = None, mode: str = "vector",
+                         query_texts: Optional[List[str]] = None) -> List[List[Dict[str, Any]]]:
+        if mode not in QUERY_MODES:
+            raise ValueError(f"Unknown query mode: {mode!r}. Supported: {', '.join(QUERY_MODES)}")
+        if mode != "vector" and (query_texts is None or len(query_texts) != len(vectors)):
+            raise ValueError(f"Query mode {mode!r} needs one query text per query vector")
+
+        queries = np.atleast_2d(np.asarray(vectors, dtype=EMBEDDING_DTYPE))
+        if top_k <= 0 or queries.shape[0] == 0:
+            return [[] for _ in range(queries.shape[0])]
+
+        dim = queries.shape[1]
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        queries = queries / norms
+        # Fusion and pre-filtering look deeper than the final top_k
+        depth = top_k if mode == "vector" else top_k * self.rerank_factor
+
+        if mode != "keyword" and self.quantization and self.quantization not in self._quantizers:
+            # Train outside the read snapshot below, which would block the write
+            self._ensure_quantizer()
+
+        # Read the generation and the rows from one snapshot
+        with self._transaction() as cursor:
+            lexical = None
+            if mode != "vector":
+                lexical = [lexical_index.search(cursor, text, session_id, depth) for text in query_texts]
+
+            if mode == "keyword":
+                # Only the BM25 hits are scored, no scan of the scope
+                hit_ids = list(dict.fromkeys(vid for hits in lexical for vid in hits))
+                ids, matrix = self._rows_to_matrix(cursor, self._fetch_embeddings(cursor, hit_ids), dim)
+            else:
+                ids, matrix = self._vector_candidates(cursor, queries, session_id, depth, nprobe)
+
+            if not ids and not any(lexical or ()):
+                return [[] for _ in range(queries.shape[0])]
+
+            # One GEMM for the whole batch: (n, dim) x (dim, b)
+            scores = matrix @ queries.T
+            positions = {vid: i for i, vid in enumerate(ids)} if mode == "keyword" else None
+            ranked = []
+            for j in range(queries.shape[0]):
+                column = scores[:, j]
+                if mode == "vector":
+                    ranked.append([(ids[i], float(column[i])) for i in _top_k_indices(column, top_k)])
+                elif mode == "keyword":
+                    rows = sorted((positions[vid] for vid in lexical[j] if vid in positions),
+                                  key=lambda i: -column[i])
+                    ranked.append([(ids[i], float(column[i])) for i in rows[:top_k]])
                 else:
-                    score = 0.0
-                    
-                matches.append({
-                    "id": vid,
-                    "score": score,
-                    "metadata": meta
-                })
-            except Exception:
-                continue
-            
-        # Sort scores by descending order and return top K results
-        matches.sort(key=lambda x: x["score"], reverse=True)
-        return matches[:top_k]
+                    vector_ranking = [ids[i] for i in _top_k_indices(column, depth)]
+                    ranked.append(lexical_index.reciprocal_rank_fusion([vector_ranking, lexical[j]], top_k))
+
+            winner_ids = {vid for matches in ranked for vid, _ in matches}
+            metadata = self._fetch_metadata(cursor, list(winner_ids))
+
+        if session_id:
+            self._touch_session_on_read(session_id)
+
+        return [
+            [
+                {"id": vid, "score": score, "metadata": metadata[vid]}
+                for vid, score in matches
+                if vid in metadata
+            ]
+            for matches in ranked
+        ]
+
+    # Sync faces of the VectorBackend protocol
+    upsert_sync = _sync_upsert
+    query_sync = _sync_query
+    query_many_sync = _sync_query_many
+    delete_sync = _sync_delete
+    delete_session_sync = _sync_delete_session
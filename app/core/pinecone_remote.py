@@ -0,0 +1,289 @@
+import asyncio
+import json
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, List, Optional
+
+import httpx
+import numpy as np
+
+PINECONE_API_VERSION = "2024-07"
+
+# Pinecone data-plane limits for a single upsert request
+MAX_UPSERT_VECTORS = 1000
+MAX_REQUEST_BYTES = 2 * 1024 * 1024
+MAX_DELETE_IDS = 1000
+
+DEFAULT_UPSERT_BATCH = 100
+DEFAULT_MAX_CONCURRENCY = 8
+DEFAULT_TIMEOUT = 30.0
+
+# Throttling, transient server errors and dropped connections are retried
+# with jittered exponential backoff, or after the server's Retry-After
+_RETRY_STATUS = {429, 500, 502, 503, 504}
+_RETRY_BASE_DELAY = 0.25
+_RETRY_MAX_DELAY = 30.0
+
+
+def _clean_metadata(meta: Dict[str, Any]) -> Dict[str, Any]:
+    """Pinecone rejects null metadata values."""
+    return {k: v for k, v in meta.items() if v is not None}
+
+
+def _retry_after(response: httpx.Response) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)."""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _retry_delay(attempt: int, response: Optional[httpx.Response] = None) -> float:
+    delay = _retry_after(response) if response is not None else None
+    if delay is None:
+        delay = _RETRY_BASE_DELAY * 2 ** attempt * random.uniform(0.5, 1.0)
+    return min(delay, _RETRY_MAX_DELAY)
+
+
+def _session_filter(session_id: Optional[str]) -> Optional[Dict[str, Any]]:
+    return {"session_id": {"$eq": session_id}} if session_id else None
+
+
+class PineconeRemoteBackend:
+    """
+    VectorBackend over the Pinecone data-plane REST API (or anything that
+    speaks it, such as app/pinecone_standin.py).
+
+    Upserts are split into batches that respect both batch_size and
+    Pinecone's 1000-vector / 2 MB request limits. Each record is
+    JSON-encoded once while batching, and the batches are sent concurrently
+    (at most max_concurrency in flight) over a pooled keep-alive client:
+    httpx.AsyncClient for the async face, httpx.Client plus a thread pool
+    for the sync face. Every request is idempotent (upserts overwrite by
+    id), so throttled and 5xx responses and transport errors are retried up
+    to max_retries times with exponential backoff, honoring Retry-After.
+
+    Only vector queries are supported remotely; session scoping uses a
+    metadata filter on session_id.
+    """
+    def __init__(self,
+                 host: str,
+                 api_key: Optional[str] = None,
+                 namespace: Optional[str] = None,
+                 batch_size: int = DEFAULT_UPSERT_BATCH,
+                 max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                 timeout: float = DEFAULT_TIMEOUT,
+                 max_retries: int = 3):
+        if "://" not in host:
+            host = f"https://{host}"
+        self.host = host.rstrip("/")
+        self.namespace = namespace or ""
+        self.batch_size = max(1, min(batch_size, MAX_UPSERT_VECTORS))
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max_retries
+        self._headers = {
+            "Api-Key": api_key or "",
+            "X-Pinecone-API-Version": PINECONE_API_VERSION,
+            "Content-Type": "application/json",
+        }
+        self._timeout = timeout
+        self._limits = httpx.Limits(
+            max_connections=self.max_concurrency, max_keepalive_connections=self.max_concurrency
+        )
+        self._client: Optional[httpx.Client] = None
+        self._pool: Optional[ThreadPoolExecutor] = None
+        # An AsyncClient is bound to the loop it first ran on
+        self._async_client: Optional[httpx.AsyncClient] = None
+        self._async_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def close(self):
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+    async def aclose(self):
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+        self.close()
+
+    # ── Transport ─────────────────────────────────────────────────────────────
+    def _sync_client(self) -> httpx.Client:
+        if self._client is None:
+            self._client = httpx.Client(
+                base_url=self.host, headers=self._headers, limits=self._limits, timeout=self._timeout
+            )
+            self._pool = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="pinecone")
+        return self._client
+
+    def _aclient(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_loop is not loop:
+            self._async_client = httpx.AsyncClient(
+                base_url=self.host, headers=self._headers, limits=self._limits, timeout=self._timeout
+            )
+            self._async_loop = loop
+        return self._async_client
+
+    def _post(self, path: str, body: bytes) -> Dict[str, Any]:
+        client = self._sync_client()
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = client.post(path, content=body)
+            except httpx.TransportError:
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(_retry_delay(attempt))
+                continue
+            if response.status_code in _RETRY_STATUS and attempt < self.max_retries:
+                time.sleep(_retry_delay(attempt, response))
+                continue
+            response.raise_for_status()
+            return response.json() if response.content else {}
+
+    async def _apost(self, path: str, body: bytes, semaphore: Optional[asyncio.Semaphore] = None) -> Dict[str, Any]:
+        client = self._aclient()
+        for attempt in range(self.max_retries + 1):
+            try:
+                if semaphore is not None:
+                    async with semaphore:
+                        response = await client.post(path, content=body)
+                else:
+                    response = await client.post(path, content=body)
+            except httpx.TransportError:
+                if attempt == self.max_retries:
+                    raise
+                await asyncio.sleep(_retry_delay(attempt))
+                continue
+            if response.status_code in _RETRY_STATUS and attempt < self.max_retries:
+                await asyncio.sleep(_retry_delay(attempt, response))
+                continue
+            response.raise_for_status()
+            return response.json() if response.content else {}
+
+    def _post_all(self, path: str, bodies: List[bytes]) -> List[Dict[str, Any]]:
+        self._sync_client()
+        if len(bodies) == 1:
+            return [self._post(path, bodies[0])]
+        return list(self._pool.map(lambda body: self._post(path, body), bodies))
+
+    async def _apost_all(self, path: str, bodies: List[bytes]) -> List[Dict[str, Any]]:
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        return await asyncio.gather(*(self._apost(path, body, semaphore) for body in bodies))
+
+    # ── Request bodies ────────────────────────────────────────────────────────
+    def _upsert_bodies(self, ids: List[str], vectors: List[List[float]],
+                       metadatas: List[Dict[str, Any]]) -> List[bytes]:
+        """JSON request bodies of at most batch_size records and MAX_REQUEST_BYTES each."""
+        tail = json.dumps({"namespace": self.namespace})[1:].encode()  # '"namespace": ...}'
+        head = b'{"vectors":['
+        overhead = len(head) + len(tail) + 2
+        bodies, batch, size = [], [], overhead
+        for vid, vector, meta in zip(ids, vectors, metadatas):
+            record = json.dumps({
+                "id": vid,
+                "values": np.asarray(vector, dtype=np.float32).tolist(),
+                "metadata": _clean_metadata(meta),
+            }).encode()
+            if batch and (len(batch) >= self.batch_size or size + len(record) + 1 > MAX_REQUEST_BYTES):
+                bodies.append(head + b",".join(batch) + b"]," + tail)
+                batch, size = [], overhead
+            batch.append(record)
+            size += len(record) + 1
+        if batch:
+            bodies.append(head + b",".join(batch) + b"]," + tail)
+        return bodies
+
+    def _query_body(self, vector: List[float], top_k: int, session_id: Optional[str], mode: str) -> bytes:
+        if mode != "vector":
+            raise ValueError(f"Query mode {mode!r} is only supported by the local vector store")
+        body = {
+            "vector": np.asarray(vector, dtype=np.float32).tolist(),
+            "topK": top_k,
+            "includeMetadata": True,
+            "includeValues": False,
+            "namespace": self.namespace,
+        }
+        session_filter = _session_filter(session_id)
+        if session_filter:
+            body["filter"] = session_filter
+        return json.dumps(body).encode()
+
+    def _delete_bodies(self, ids: List[str]) -> List[bytes]:
+        return [
+            json.dumps({"ids": ids[start:start + MAX_DELETE_IDS], "namespace": self.namespace}).encode()
+            for start in range(0, len(ids), MAX_DELETE_IDS)
+        ]
+
+    def _delete_session_body(self, session_id: str) -> bytes:
+        return json.dumps({"filter": _session_filter(session_id), "namespace": self.namespace}).encode()
+
+    @staticmethod
+    def _matches(response: Dict[str, Any]) -> List[Dict[str, Any]]:
+        return [
+            {"id": m["id"], "score": float(m.get("score", 0.0)), "metadata": m.get("metadata") or {}}
+            for m in response.get("matches", [])
+        ]
+
+    # ── Async face ────────────────────────────────────────────────────────────
+    async def upsert(self, ids: List[str], vectors: List[List[float]], metadatas: List[Dict[str, Any]]) -> int:
+        responses = await self._apost_all("/vectors/upsert", self._upsert_bodies(ids, vectors, metadatas))
+        return sum(r.get("upsertedCount", 0) for r in responses)
+
+    async def query(self, vector: List[float], top_k: int, session_id: str = None, nprobe: Optional[int] = None,
+                    mode: str = "vector", query_text: Optional[str] = None) -> List[Dict[str, Any]]:
+        return self._matches(await self._apost("/query", self._query_body(vector, top_k, session_id, mode)))
+
+    async def query_many(self, vectors: List[List[float]], top_k: int, session_id: str = None,
+                         nprobe: Optional[int] = None, mode: str = "vector",
+                         query_texts: Optional[List[str]] = None) -> List[List[Dict[str, Any]]]:
+        bodies = [self._query_body(v, top_k, session_id, mode) for v in vectors]
+        return [self._matches(r) for r in await self._apost_all("/query", bodies)]
+
+    async def delete(self, ids: List[str]) -> int:
+        await self._apost_all("/vectors/delete", self._delete_bodies(list(ids)))
+        # Pinecone does not report how many ids existed
+        return len(ids)
+
+    async def delete_session(self, session_id: str) -> int:
+        response = await self._apost("/vectors/delete", self._delete_session_body(session_id))
+        # Pinecone itself returns {}; the stand-in reports a count
+        return response.get("deletedCount", 0)
+
+    # ── Sync face ─────────────────────────────────────────────────────────────
+    def upsert_sync(self, ids: List[str], vectors: List[List[float]], metadatas: List[Dict[str, Any]]) -> int:
+        responses = self._post_all("/vectors/upsert", self._upsert_bodies(ids, vectors, metadatas))
+        return sum(r.get("upsertedCount", 0) for r in responses)
+
+    def query_sync(self, vector: List[float], top_k: int, session_id: str = None, nprobe: Optional[int] = None,
+                   mode: str = "vector", query_text: Optional[str] = None) -> List[Dict[str, Any]]:
+        return self._matches(self._post("/query", self._query_body(vector, top_k, session_id, mode)))
+
+    def query_many_sync(self, vectors: List[List[float]], top_k: int, session_id: str = None,
+                        nprobe: Optional[int] = None, mode: str = "vector",
+                        query_texts: Optional[List[str]] = None) -> List[List[Dict[str, Any]]]:
+        bodies = [self._query_body(v, top_k, session_id, mode) for v in vectors]
+        return [self._matches(r) for r in self._post_all("/query", bodies)]
+
+    def delete_sync(self, ids: List[str]) -> int:
+        self._post_all("/vectors/delete", self._delete_bodies(list(ids)))
+        return len(ids)
+
+    def delete_session_sync(self, session_id: str) -> int:
+        return self._post("/vectors/delete", self._delete_session_body(session_id)).get("deletedCount", 0)
+
+    def expire_sessions(self, ttl_seconds: float) -> Dict[str, Any]:
+        """Pinecone keeps no per-session access times, so nothing expires remotely."""
+        return {"sessions": [], "chunks_deleted": 0, "pages_freed": 0}
@@ -0,0 +1,7 @@
+"""Process pool settings shared by the shard, embedding and PDF workers."""
+import multiprocessing
+
+
+def _spawn_context():
+    # spawn, not fork: the parent may already run torch / event loop threads
+    return multiprocessing.get_context("spawn")
@@ -0,0 +1,190 @@
+import io
+import numpy as np
+from typing import Optional
+
+# Rows decoded per block when computing asymmetric distances, so the float
+# temporary stays small no matter how large the session is
+_SCORE_BLOCK = 16384
+
+# 256 sub-centroids train well on a few dozen points each
+PQ_TRAIN_SAMPLE = 8192
+
+QUANTIZATION_KINDS = ("int8", "pq")
+
+
+class ScalarQuantizer:
+    """
+    Per-dimension int8 scalar quantization.
+
+    Each dimension is mapped linearly from its observed [min, max] range onto
+    the 256 int8 levels, cutting vector memory 4x versus float32.
+    """
+    def __init__(self, offset: np.ndarray, scale: np.ndarray):
+        self.offset = offset.astype(np.float32)
+        self.scale = scale.astype(np.float32)
+
+    @property
+    def dim(self) -> int:
+        return self.offset.shape[0]
+
+    @property
+    def nbytes(self) -> int:
+        return self.offset.nbytes + self.scale.nbytes
+
+    @property
+    def code_width(self) -> int:
+        return self.dim
+
+    code_dtype = np.int8
+
+    def to_array(self) -> np.ndarray:
+        return np.stack([self.offset, self.scale])
+
+    @classmethod
+    def from_array(cls, params: np.ndarray) -> "ScalarQuantizer":
+        return cls(offset=params[0], scale=params[1])
+
+    @classmethod
+    def fit(cls, matrix: np.ndarray) -> "ScalarQuantizer":
+        lo = matrix.min(axis=0)
+        hi = matrix.max(axis=0)
+        scale = (hi - lo) / 255.0
+        scale[scale == 0] = 1.0
+        # Level -128 decodes to lo, level 127 decodes to hi
+        return cls(offset=lo + 128.0 * scale, scale=scale)
+
+    def encode(self, matrix: np.ndarray) -> np.ndarray:
+        # Values outside the fitted range (rows added later) are clipped
+        levels = np.rint((matrix - self.offset) / self.scale)
+        return np.clip(levels, -128, 127).astype(np.int8)
+
+    def scores(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """Asymmetric dot products: float query against int8 codes."""
+        # q . (c * scale + offset) == c . (q * scale) + q . offset
+        weighted = (query * self.scale).astype(np.float32)
+        bias = np.float32(query @ self.offset)
+        out = np.empty(codes.shape[0], dtype=np.float32)
+        for start in range(0, codes.shape[0], _SCORE_BLOCK):
+            block = codes[start:start + _SCORE_BLOCK].astype(np.float32)
+            out[start:start + block.shape[0]] = block @ weighted
+        return out + bias
+
+
+class ProductQuantizer:
+    """
+    Product quantization: the vector is split into m sub-vectors and each is
+    replaced by the uint8 id of its nearest sub-centroid, so a vector costs m
+    bytes instead of 4 * dim.
+    """
+    def __init__(self, codebooks: np.ndarray):
+        # (m, ksub, dsub)
+        self.codebooks = codebooks.astype(np.float32)
+
+    @property
+    def m(self) -> int:
+        return self.codebooks.shape[0]
+
+    @property
+    def dim(self) -> int:
+        return self.codebooks.shape[0] * self.codebooks.shape[2]
+
+    @property
+    def nbytes(self) -> int:
+        return self.codebooks.nbytes
+
+    @property
+    def code_width(self) -> int:
+        return self.m
+
+    code_dtype = np.uint8
+
+    def to_array(self) -> np.ndarray:
+        return self.codebooks
+
+    @classmethod
+    def from_array(cls, params: np.ndarray) -> "ProductQuantizer":
+        return cls(params)
+
+    @staticmethod
+    def subspaces_for(dim: int, requested: int) -> int:
+        """Largest subspace count <= requested that divides dim."""
+        for m in range(min(requested, dim), 0, -1):
+            if dim % m == 0:
+                return m
+        return 1
+
+    @classmethod
+    def fit(cls, matrix: np.ndarray, m: int, ksub: int = 256, iterations: int = 8,
+            seed: Optional[int] = 0) -> "ProductQuantizer":
+        rng = np.random.default_rng(seed)
+        if matrix.shape[0] > PQ_TRAIN_SAMPLE:
+            matrix = matrix[rng.choice(matrix.shape[0], size=PQ_TRAIN_SAMPLE, replace=False)]
+        n, dim = matrix.shape
+        m = cls.subspaces_for(dim, m)
+        dsub = dim // m
+        ksub = min(ksub, n)
+        codebooks = np.zeros((m, ksub, dsub), dtype=np.float32)
+        for j in range(m):
+            sub = np.ascontiguousarray(matrix[:, j * dsub:(j + 1) * dsub])
+            codebooks[j] = _kmeans(sub, ksub, iterations, seed)
+        return cls(codebooks)
+
+    def encode(self, matrix: np.ndarray) -> np.ndarray:
+        n = matrix.shape[0]
+        dsub = self.codebooks.shape[2]
+        codes = np.empty((n, self.m), dtype=np.uint8)
+        for j in range(self.m):
+            sub = matrix[:, j * dsub:(j + 1) * dsub]
+            book = self.codebooks[j]
+            # argmin ||x - c||^2 == argmax (x . c - ||c||^2 / 2)
+            codes[:, j] = np.argmax(sub @ book.T - 0.5 * (book * book).sum(axis=1), axis=1)
+        return codes
+
+    def scores(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """Asymmetric dot products via a per-query (m, ksub) lookup table."""
+        dsub = self.codebooks.shape[2]
+        table = np.einsum("mkd,md->mk", self.codebooks, query.reshape(self.m, dsub).astype(np.float32))
+        out = np.zeros(codes.shape[0], dtype=np.float32)
+        for j in range(self.m):
+            out += table[j, codes[:, j]]
+        return out
+
+
+def _kmeans(sub: np.ndarray, k: int, iterations: int, seed: Optional[int]) -> np.ndarray:
+    """Plain euclidean k-means for PQ sub-vectors (which are not unit norm)."""
+    rng = np.random.default_rng(seed)
+    centroids = sub[rng.choice(sub.shape[0], size=k, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = np.argmax(sub @ centroids.T - 0.5 * (centroids * centroids).sum(axis=1), axis=1)
+        sums = np.stack(
+            [np.bincount(assignments, weights=sub[:, d], minlength=k) for d in range(sub.shape[1])],
+            axis=1,
+        )
+        counts = np.bincount(assignments, minlength=k)
+        empty = counts == 0
+        centroids = np.where(empty[:, None], centroids, sums / np.maximum(counts, 1)[:, None])
+    return centroids.astype(np.float32)
+
+
+def _quantizer_class(kind: str):
+    if kind == "int8":
+        return ScalarQuantizer
+    if kind == "pq":
+        return ProductQuantizer
+    raise ValueError(f"Unknown vector quantization: {kind!r}. Supported: {', '.join(QUANTIZATION_KINDS)}")
+
+
+def fit_quantizer(kind: str, matrix: np.ndarray, pq_subspaces: int):
+    if kind == "pq":
+        return ProductQuantizer.fit(matrix, pq_subspaces)
+    return _quantizer_class(kind).fit(matrix)
+
+
+def quantizer_to_bytes(quantizer) -> bytes:
+    buf = io.BytesIO()
+    np.save(buf, quantizer.to_array(), allow_pickle=False)
+    return buf.getvalue()
+
+
+def quantizer_from_bytes(kind: str, blob: bytes):
+    return _quantizer_class(kind).from_array(np.load(io.BytesIO(blob), allow_pickle=False))
@@ -0,0 +1,107 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.embedding_cache import EMBEDDING_DTYPE, normalize_text
+
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_TTL_SECONDS = 600.0
+
+# Prefix of the stats line the MCP search tools append to their output; the
+# chat loop moves it into the reasoning trace instead of passing it to Gemini
+STATS_MARKER = "[query-embedding-cache]"
+
+
+@dataclass
+class QueryCacheStats:
+    hits: int = 0
+    misses: int = 0
+
+    def __str__(self) -> str:
+        return f"{self.hits} hit{'s' * (self.hits != 1)}, {self.misses} miss{'es' * (self.misses != 1)}"
+
+
+class QueryEmbeddingCache:
+    """
+    In-process LRU of query text -> embedding, bounded by entry count and
+    entry age.
+
+    Agentic rounds keep re-issuing the same searches; keys are normalized
+    (NFC, collapsed whitespace) so trivially re-spaced repeats hit too.
+    Entries older than ttl_seconds are treated as misses and dropped.
+    """
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, ttl_seconds: float = DEFAULT_TTL_SECONDS):
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, np.ndarray]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.totals = QueryCacheStats()
+        self.expired = 0
+        self.evicted = 0
+
+    def embed(self, texts: List[str],
+              embed_fn: Callable[[List[str]], np.ndarray]) -> Tuple[np.ndarray, QueryCacheStats]:
+        """Vectors for texts in order, running embed_fn once over the distinct misses."""
+        keys = [normalize_text(text) for text in texts]
+        now = time.monotonic()
+        found: Dict[str, np.ndarray] = {}
+        with self._lock:
+            for key in dict.fromkeys(keys):
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                stored_at, vector = entry
+                if self.ttl_seconds > 0 and now - stored_at > self.ttl_seconds:
+                    del self._entries[key]
+                    self.expired += 1
+                    continue
+                self._entries.move_to_end(key)
+                found[key] = vector
+
+        hit_keys = set(found)
+        misses = [key for key in dict.fromkeys(keys) if key not in hit_keys]
+        if misses:
+            vectors = np.asarray(embed_fn(misses), dtype=EMBEDDING_DTYPE)
+            with self._lock:
+                for key, vector in zip(misses, vectors):
+                    # Copied so the cache never pins a whole batch matrix
+                    vector = vector.copy()
+                    self._entries[key] = (now, vector)
+                    self._entries.move_to_end(key)
+                    found[key] = vector
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.evicted += 1
+
+        hits = sum(key in hit_keys for key in keys)
+        stats = QueryCacheStats(hits=hits, misses=len(keys) - hits)
+        with self._lock:
+            self.totals.hits += stats.hits
+            self.totals.misses += stats.misses
+        if not keys:
+            return np.empty((0, 0), dtype=EMBEDDING_DTYPE), stats
+        return np.stack([found[key] for key in keys]), stats
+
+    def stats_line(self, call: Optional[QueryCacheStats] = None) -> str:
+        """One-line summary for the reasoning trace."""
+        with self._lock:
+            total = self.totals.hits + self.totals.misses
+            rate = self.totals.hits / total if total else 0.0
+            parts = [
+                f"this call: {call}" if call is not None else None,
+                f"process: {self.totals} ({rate:.0%} hit rate)",
+                f"{len(self._entries)}/{self.max_entries} entries, ttl {self.ttl_seconds:g}s",
+            ]
+        return f"{STATS_MARKER} " + " · ".join(p for p in parts if p)
+
+
+def split_stats_line(tool_result: str) -> Tuple[str, Optional[str]]:
+    """Separate a search tool's output from its trailing cache stats line, if any."""
+    body, sep, line = tool_result.rpartition("\n\n" + STATS_MARKER)
+    if not sep:
+        return tool_result, None
+    return body, (STATS_MARKER + line).strip()
@@ -0,0 +1,262 @@
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import sqlite3
+
+EMBEDDING_DTYPE = np.float32
+
+# A segment is sealed once it holds this many rows (~100 MB at 384 dims)
+DEFAULT_SEGMENT_MAX_ROWS = 65536
+# Segments whose live fraction drops below this are rewritten by compaction
+COMPACT_MIN_LIVE_FRACTION = 0.7
+# Retired segment files are only unlinked after this long, so readers that
+# resolved row pointers just before a compaction can still map them
+RETIRED_GRACE_SECONDS = 300
+
+
+class SegmentStore:
+    """
+    Append-only float32 segment files for vectors, indexed from SQLite.
+
+    Each segment is a headerless ``seg_<id>.f32`` file of fixed-width rows.
+    Its committed length lives in the vector_segments table, which is only
+    changed under the SQLite write lock, so bytes past that length (left by a
+    crashed writer) are simply truncated by the next append. Readers
+    ``np.memmap`` the files read-only, which means a cold process scores
+    vectors straight from the OS page cache without decoding anything, and
+    the page cache is shared between every process on the box.
+
+    Overwritten or deleted rows stay in their segment and are counted as
+    tombstones; compact() rewrites segments with many tombstones (and merges
+    small sealed ones) into fresh segments.
+    """
+    def __init__(self, directory: str, max_rows: int = DEFAULT_SEGMENT_MAX_ROWS):
+        self.directory = directory
+        self.max_rows = max_rows
+        self._maps: Dict[int, np.memmap] = {}
+        self._dims: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def init_schema(cursor: sqlite3.Cursor):
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS vector_segments (
+                segment_id INTEGER PRIMARY KEY,
+                dim INTEGER NOT NULL,
+                rows INTEGER NOT NULL DEFAULT 0,
+                tombstones INTEGER NOT NULL DEFAULT 0,
+                sealed INTEGER NOT NULL DEFAULT 0,
+                retired_at REAL
+            )
+        """)
+
+    def path(self, segment_id: int) -> str:
+        return os.path.join(self.directory, f"seg_{segment_id:06d}.f32")
+
+    # ── Writes (caller holds the SQLite write lock) ───────────────────────────
+    def append(self, cursor: sqlite3.Cursor, matrix: np.ndarray) -> List[Tuple[int, int]]:
+        """Append rows to the open segment of their dimension; returns (segment_id, row) pointers."""
+        dim = matrix.shape[1]
+        pointers: List[Tuple[int, int]] = []
+        start = 0
+        while start < matrix.shape[0]:
+            segment_id, rows = self._open_segment(cursor, dim)
+            take = min(self.max_rows - rows, matrix.shape[0] - start)
+            self._write(segment_id, rows, dim, matrix[start:start + take])
+            cursor.execute(
+                "UPDATE vector_segments SET rows = ?, sealed = ? WHERE segment_id = ?",
+                (rows + take, int(rows + take >= self.max_rows), segment_id),
+            )
+            pointers.extend((segment_id, r) for r in range(rows, rows + take))
+            start += take
+        return pointers
+
+    def add_tombstones(self, cursor: sqlite3.Cursor, segment_ids: Sequence[int]):
+        counts: Dict[int, int] = {}
+        for segment_id in segment_ids:
+            if segment_id is not None:
+                counts[segment_id] = counts.get(segment_id, 0) + 1
+        cursor.executemany(
+            "UPDATE vector_segments SET tombstones = tombstones + ? WHERE segment_id = ?",
+            [(n, segment_id) for segment_id, n in counts.items()],
+        )
+
+    def _open_segment(self, cursor: sqlite3.Cursor, dim: int) -> Tuple[int, int]:
+        row = cursor.execute(
+            "SELECT segment_id, rows FROM vector_segments WHERE dim = ? AND sealed = 0 AND retired_at IS NULL "
+            "ORDER BY segment_id LIMIT 1",
+            (dim,),
+        ).fetchone()
+        if row is not None:
+            return row
+        cursor.execute("INSERT INTO vector_segments (dim) VALUES (?)", (dim,))
+        return cursor.lastrowid, 0
+
+    def _write(self, segment_id: int, committed_rows: int, dim: int, matrix: np.ndarray):
+        os.makedirs(self.directory, exist_ok=True)
+        row_bytes = dim * np.dtype(EMBEDDING_DTYPE).itemsize
+        with open(self.path(segment_id), "ab") as f:
+            # Drop any tail a crashed writer left past the committed length
+            f.truncate(committed_rows * row_bytes)
+            f.write(np.ascontiguousarray(matrix, dtype=EMBEDDING_DTYPE).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+
+    # ── Reads ─────────────────────────────────────────────────────────────────
+    def dim_of(self, cursor: sqlite3.Cursor, segment_id: int) -> Optional[int]:
+        dim = self._dims.get(segment_id)
+        if dim is None:
+            row = cursor.execute("SELECT dim FROM vector_segments WHERE segment_id = ?", (segment_id,)).fetchone()
+            if row is None:
+                return None
+            dim = self._dims[segment_id] = row[0]
+        return dim
+
+    def _map(self, segment_id: int, dim: int, min_rows: int) -> np.memmap:
+        with self._lock:
+            mapped = self._maps.get(segment_id)
+            if mapped is None or mapped.shape[0] < min_rows:
+                # Appends grow the file, so remap when a pointer is past our view
+                rows = os.path.getsize(self.path(segment_id)) // (dim * np.dtype(EMBEDDING_DTYPE).itemsize)
+                mapped = np.memmap(self.path(segment_id), dtype=EMBEDDING_DTYPE, mode="r", shape=(rows, dim))
+                self._maps[segment_id] = mapped
+            return mapped
+
+    def gather(self, segment_id: int, dim: int, rows: np.ndarray) -> np.ndarray:
+        """Rows of one segment, read through its memory map."""
+        mapped = self._map(segment_id, dim, int(rows.max()) + 1)
+        return mapped[rows]
+
+    # ── Compaction ────────────────────────────────────────────────────────────
+    def compact(self, conn: sqlite3.Connection) -> Dict[str, int]:
+        """
+        Rewrite the live rows of tombstone-heavy or small sealed segments into
+        new segments, repoint document_chunks, then retire the old files.
+
+        conn must be in autocommit mode (isolation_level=None).
+        """
+        cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            candidates = cursor.execute("""
+                SELECT segment_id, dim, rows, tombstones, sealed FROM vector_segments
+                WHERE retired_at IS NULL
+            """).fetchall()
+            by_dim: Dict[int, List[Tuple[int, bool]]] = {}
+            for segment_id, dim, rows, tombstones, sealed in candidates:
+                live = rows - tombstones
+                sparse = rows > 0 and live / rows < COMPACT_MIN_LIVE_FRACTION
+                small = sealed and live < self.max_rows // 4
+                if sparse or small:
+                    by_dim.setdefault(dim, []).append((segment_id, sparse))
+
+            merged = moved = 0
+            for dim, entries in by_dim.items():
+                # Rewriting a lone small segment without tombstones gains nothing
+                if len(entries) < 2 and not entries[0][1]:
+                    continue
+                segment_ids = [segment_id for segment_id, _ in entries]
+                moved += self._rewrite(cursor, dim, segment_ids)
+                merged += len(segment_ids)
+            cursor.execute("COMMIT")
+        except Exception:
+            cursor.execute("ROLLBACK")
+            raise
+
+        removed = self._drop_retired(conn)
+        return {"segments_compacted": merged, "rows_moved": moved, "files_removed": removed}
+
+    def _rewrite(self, cursor: sqlite3.Cursor, dim: int, segment_ids: List[int]) -> int:
+        placeholders = ",".join("?" * len(segment_ids))
+        live = cursor.execute(
+            f"SELECT rowid, segment_id, segment_row FROM document_chunks "
+            f"WHERE segment_id IN ({placeholders}) ORDER BY segment_id, segment_row",
+            segment_ids,
+        ).fetchall()
+
+        # Never append compacted rows to a segment that is being retired
+        cursor.execute(
+            f"UPDATE vector_segments SET sealed = 1 WHERE segment_id IN ({placeholders})", segment_ids
+        )
+        cursor.execute(
+            "UPDATE vector_segments SET sealed = 1 WHERE dim = ? AND sealed = 0", (dim,)
+        )
+
+        if live:
+            rowids = [r[0] for r in live]
+            matrix = np.empty((len(live), dim), dtype=EMBEDDING_DTYPE)
+            seg_col = np.array([r[1] for r in live])
+            row_col = np.array([r[2] for r in live])
+            for segment_id in np.unique(seg_col):
+                mask = seg_col == segment_id
+                matrix[mask] = self.gather(int(segment_id), dim, row_col[mask])
+            pointers = self.append(cursor, matrix)
+            cursor.executemany(
+                "UPDATE document_chunks SET segment_id = ?, segment_row = ? WHERE rowid = ?",
+                [(sid, row, rowid) for (sid, row), rowid in zip(pointers, rowids)],
+            )
+            # The compacted output is complete; start new appends elsewhere
+            cursor.execute("UPDATE vector_segments SET sealed = 1 WHERE dim = ? AND sealed = 0", (dim,))
+
+        cursor.execute(
+            f"UPDATE vector_segments SET retired_at = ? WHERE segment_id IN ({placeholders})",
+            (time.time(), *segment_ids),
+        )
+        return len(live)
+
+    def _drop_retired(self, conn: sqlite3.Connection) -> int:
+        cutoff = time.time() - RETIRED_GRACE_SECONDS
+        retired = [r[0] for r in conn.execute(
+            "SELECT segment_id FROM vector_segments WHERE retired_at IS NOT NULL AND retired_at < ?", (cutoff,)
+        ).fetchall()]
+        for segment_id in retired:
+            with self._lock:
+                self._maps.pop(segment_id, None)
+            try:
+                os.remove(self.path(segment_id))
+            except FileNotFoundError:
+                pass
+        if retired:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany("DELETE FROM vector_segments WHERE segment_id = ?", [(s,) for s in retired])
+            conn.execute("COMMIT")
+        return len(retired)
+
+    def stats(self, cursor: sqlite3.Cursor) -> Dict[str, int]:
+        row = cursor.execute("""
+            SELECT COUNT(*), COALESCE(SUM(rows), 0), COALESCE(SUM(tombstones), 0)
+            FROM vector_segments WHERE retired_at IS NULL
+        """).fetchone()
+        return {"segments": row[0], "rows": row[1], "tombstones": row[2]}
+
+
+class BackgroundCompactor:
+    """Daemon thread that periodically runs SegmentStore.compact()."""
+    def __init__(self, store: SegmentStore, db_path: str, interval: float):
+        self.store = store
+        self.db_path = db_path
+        self.interval = interval
+        self.last_result: Optional[Dict[str, int]] = None
+        self.last_error: Optional[str] = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="segment-compactor", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            conn = sqlite3.connect(self.db_path, isolation_level=None, timeout=30)
+            try:
+                self.last_result = self.store.compact(conn)
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+            finally:
+                conn.close()
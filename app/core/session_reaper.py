@@ -0,0 +1,66 @@
+import asyncio
+from typing import Any, Dict, List, Optional
+
+import redis.asyncio as aioredis
+
+from app.core.document_versions import delete_session_versions, versioning_enabled
+from app.core.near_dedup import get_dedup_index
+
+
+def chat_history_keys(session_id: str) -> List[str]:
+    """Redis keys app.api.chat keeps per session."""
+    return [f"chat:{session_id}"]
+
+
+class SessionReaper:
+    """
+    Background task that expires idle sessions.
+
+    Every interval it asks the vector adapter to delete sessions unused for
+    ttl_seconds (chunks, FTS postings, cached matrices, segment rows) and to
+    vacuum the freed pages, then removes their document versions, their
+    near-duplicate index entries and their chat history from Redis. Chat
+    lists also carry a Redis TTL of their own; deleting them here covers
+    lists written before that TTL was set.
+    """
+    def __init__(self, vector_adapter, redis_url: str, ttl_seconds: float, interval: float):
+        self.vector_adapter = vector_adapter
+        self.redis_url = redis_url
+        self.ttl_seconds = ttl_seconds
+        self.interval = interval
+        self.last_result: Optional[Dict[str, Any]] = None
+        self.last_error: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+
+    async def reap_once(self) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(None, self.vector_adapter.expire_sessions, self.ttl_seconds)
+        if result["sessions"]:
+            if versioning_enabled():
+                await delete_session_versions(result["sessions"])
+            dedup_index = get_dedup_index()
+            if dedup_index is not None:
+                await loop.run_in_executor(None, dedup_index.delete_sessions, result["sessions"])
+            redis = aioredis.from_url(self.redis_url)
+            try:
+                keys = [key for session_id in result["sessions"] for key in chat_history_keys(session_id)]
+                await redis.delete(*keys)
+            finally:
+                await redis.close()
+        return result
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                self.last_result = await self.reap_once()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
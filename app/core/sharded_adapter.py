@@ -0,0 +1,214 @@
+import asyncio
+import heapq
+import os
+import zlib
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.core.pineconeAdapter import DEFAULT_DB_PATH, PineconeVectorAdapter
+from app.core.process_pool import _spawn_context
+
+# "session": a session lives on one shard, so session queries touch a single
+# process and concurrent sessions spread over the cores. "chunk": every
+# session is striped over all shards, so even one large session is scanned
+# by every core at once.
+SHARD_PARTITIONS = ("session", "chunk")
+
+# Adapters opened inside a shard worker process, keyed by database path
+_worker_adapters: Dict[str, PineconeVectorAdapter] = {}
+
+
+def shard_path(db_path: str, shard: int) -> str:
+    root, ext = os.path.splitext(db_path)
+    return f"{root}.shard{shard:02d}{ext or '.db'}"
+
+
+def shard_of(key: Optional[str], num_shards: int) -> int:
+    """Stable across processes and restarts, unlike the salted built-in hash()."""
+    return zlib.crc32((key or "").encode("utf-8")) % num_shards
+
+
+def _shard_call(db_path: str, options: Dict[str, Any], method: str, *args):
+    """Runs in a shard worker: call a method on that process's adapter for db_path."""
+    adapter = _worker_adapters.get(db_path)
+    if adapter is None:
+        adapter = _worker_adapters[db_path] = PineconeVectorAdapter(db_path=db_path, **options)
+    return getattr(adapter, method)(*args)
+
+
+class ShardedVectorAdapter:
+    """
+    Spreads the local vector store over num_shards SQLite databases, each
+    served by its own single-worker process.
+
+    Within one ShardedVectorAdapter all traffic to a shard goes through its
+    worker, so that process's matrix cache, IVF centroids and quantizers
+    stay warm, and queries on different shards run on different cores with
+    no GIL between them. A query is sent to every shard that can hold
+    matching rows; each shard returns its own top_k and the partial lists
+    are merged by score. Only query vectors and top_k results cross process
+    boundaries.
+
+    A shard is not owned exclusively: other processes (each API worker, the
+    MCP server) start their own pools on the same files. They stay correct
+    because every write bumps the shard's generation counters, which cached
+    matrices are checked against on read, and trained centroids and
+    quantizers are reloaded whenever their stored version changes.
+
+    Vector and keyword scores are cosine similarities and merge exactly.
+    Hybrid scores are per-shard rank fusions, so a sharded hybrid query is
+    an approximation of the unsharded one.
+
+    Implements the VectorBackend protocol (see vector_backend).
+
+    With partition="session", a chunk id re-uploaded under another session
+    is stored again on that session's shard rather than moved.
+    """
+    def __init__(self, num_shards: int, partition: str = "session", db_path: str = DEFAULT_DB_PATH,
+                 **adapter_options):
+        if num_shards < 1:
+            raise ValueError("num_shards must be at least 1")
+        if partition not in SHARD_PARTITIONS:
+            raise ValueError(f"Unknown shard partition: {partition!r}. Supported: {', '.join(SHARD_PARTITIONS)}")
+        self.num_shards = num_shards
+        self.partition = partition
+        self.shard_paths = [shard_path(db_path, i) for i in range(num_shards)]
+        self._options = adapter_options
+        self._executors = [ProcessPoolExecutor(max_workers=1, mp_context=_spawn_context()) for _ in range(num_shards)]
+
+    def close(self):
+        for executor in self._executors:
+            executor.shutdown(wait=True)
+
+    def _submit(self, shard: int, method: str, *args) -> Future:
+        return self._executors[shard].submit(_shard_call, self.shard_paths[shard], self._options, method, *args)
+
+    def _route(self, ids: List[str], metadatas: List[Dict[str, Any]]) -> Dict[int, List[int]]:
+        by_shard: Dict[int, List[int]] = {}
+        for i, (vid, meta) in enumerate(zip(ids, metadatas)):
+            key = meta.get("session_id") if self.partition == "session" else vid
+            by_shard.setdefault(shard_of(key, self.num_shards), []).append(i)
+        return by_shard
+
+    def _query_shards(self, session_id: Optional[str]) -> List[int]:
+        if self.partition == "session" and session_id:
+            return [shard_of(session_id, self.num_shards)]
+        return list(range(self.num_shards))
+
+    @staticmethod
+    def _merge(partials: List[List[List[Dict[str, Any]]]], top_k: int) -> List[List[Dict[str, Any]]]:
+        """Merge per-shard top_k lists (one per query) into the global top_k."""
+        return [
+            heapq.nlargest(top_k, (match for shard in per_query for match in shard), key=lambda m: m["score"])
+            for per_query in zip(*partials)
+        ]
+
+    # ── Writes ────────────────────────────────────────────────────────────────
+    def _submit_upsert(self, ids, vectors, metadatas) -> List[Future]:
+        # Each shard gets its rows as one contiguous matrix, pickled as a single buffer
+        vectors = np.asarray(vectors, dtype=np.float32)
+        return [
+            self._submit(
+                shard, "_sync_upsert",
+                [ids[i] for i in rows], vectors[rows], [metadatas[i] for i in rows],
+            )
+            for shard, rows in self._route(ids, metadatas).items()
+        ]
+
+    async def upsert(self, ids: List[str], vectors: List[List[float]], metadatas: List[Dict[str, Any]]):
+        await asyncio.gather(*(asyncio.wrap_future(f) for f in self._submit_upsert(ids, vectors, metadatas)))
+
+    def _sync_upsert(self, ids: List[str], vectors: List[List[float]], metadatas: List[Dict[str, Any]]):
+        for future in self._submit_upsert(ids, vectors, metadatas):
+            future.result()
+
+    # ── Reads ─────────────────────────────────────────────────────────────────
+    def _submit_query(self, vectors, top_k, session_id, nprobe, mode, query_texts) -> List[Future]:
+        return [
+            self._submit(shard, "_sync_query_many", vectors, top_k, session_id, nprobe, mode, query_texts)
+            for shard in self._query_shards(session_id)
+        ]
+
+    async def query_many(
+            self,
+            vectors: List[List[float]],
+            top_k: int,
+            session_id: str = None,
+            nprobe: Optional[int] = None,
+            mode: str = "vector",
+            query_texts: Optional[List[str]] = None
+    ) -> List[List[Dict[str, Any]]]:
+        futures = self._submit_query(vectors, top_k, session_id, nprobe, mode, query_texts)
+        partials = await asyncio.gather(*(asyncio.wrap_future(f) for f in futures))
+        return self._merge(partials, top_k)
+
+    async def query(
+            self,
+            vector: List[float],
+            top_k: int,
+            session_id: str = None,
+            nprobe: Optional[int] = None,
+            mode: str = "vector",
+            query_text: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        query_texts = [query_text] if query_text is not None else None
+        return (await self.query_many([vector], top_k, session_id, nprobe, mode, query_texts))[0]
+
+    def _sync_query_many(self, vectors, top_k, session_id=None, nprobe=None, mode="vector",
+                         query_texts=None) -> List[List[Dict[str, Any]]]:
+        futures = self._submit_query(vectors, top_k, session_id, nprobe, mode, query_texts)
+        return self._merge([f.result() for f in futures], top_k)
+
+    def _sync_query(self, vector, top_k, session_id=None, nprobe=None, mode="vector",
+                    query_text=None) -> List[Dict[str, Any]]:
+        query_texts = [query_text] if query_text is not None else None
+        return self._sync_query_many([vector], top_k, session_id, nprobe, mode, query_texts)[0]
+
+    # ── Deletes ───────────────────────────────────────────────────────────────
+    def _submit_delete(self, ids: List[str]) -> List[Future]:
+        if self.partition == "chunk":
+            by_shard: Dict[int, List[str]] = {}
+            for vid in ids:
+                by_shard.setdefault(shard_of(vid, self.num_shards), []).append(vid)
+            return [self._submit(shard, "_sync_delete", shard_ids) for shard, shard_ids in by_shard.items()]
+        # The owning session of an id is unknown here, so ask every shard
+        return [self._submit(shard, "_sync_delete", ids) for shard in range(self.num_shards)]
+
+    async def delete(self, ids: List[str]) -> int:
+        return sum(await asyncio.gather(*(asyncio.wrap_future(f) for f in self._submit_delete(ids))))
+
+    def _sync_delete(self, ids: List[str]) -> int:
+        return sum(f.result() for f in self._submit_delete(ids))
+
+    # ── Session lifecycle ─────────────────────────────────────────────────────
+    def _submit_delete_session(self, session_id: str) -> List[Future]:
+        return [self._submit(shard, "_sync_delete_session", session_id) for shard in self._query_shards(session_id)]
+
+    async def delete_session(self, session_id: str) -> int:
+        futures = self._submit_delete_session(session_id)
+        return sum(await asyncio.gather(*(asyncio.wrap_future(f) for f in futures)))
+
+    def _sync_delete_session(self, session_id: str) -> int:
+        return sum(f.result() for f in self._submit_delete_session(session_id))
+
+    def expire_sessions(self, ttl_seconds: float) -> Dict[str, Any]:
+        futures = [self._submit(shard, "expire_sessions", ttl_seconds) for shard in range(self.num_shards)]
+        results = [f.result() for f in futures]
+        return {
+            "sessions": sorted({s for r in results for s in r["sessions"]}),
+            "chunks_deleted": sum(r["chunks_deleted"] for r in results),
+            "pages_freed": sum(r["pages_freed"] for r in results),
+        }
+
+    def cache_stats(self) -> List[Dict[str, int]]:
+        """Matrix cache counters of every shard's owner process."""
+        return [self._submit(shard, "cache_stats").result() for shard in range(self.num_shards)]
+
+    # Sync faces of the VectorBackend protocol
+    upsert_sync = _sync_upsert
+    query_sync = _sync_query
+    query_many_sync = _sync_query_many
+    delete_sync = _sync_delete
+    delete_session_sync = _sync_delete_session
@@ -0,0 +1,34 @@
+"""Connection setup and batching shared by the SQLite-backed stores."""
+import sqlite3
+from typing import Iterator, List, Sequence, TypeVar
+
+T = TypeVar("T")
+
+# Stay well below SQLITE_MAX_VARIABLE_NUMBER for IN (...) lookups
+SQL_IN_BATCH = 500
+
+
+def batched(items: Sequence[T], size: int = SQL_IN_BATCH) -> Iterator[List[T]]:
+    for start in range(0, len(items), size):
+        yield list(items[start:start + size])
+
+
+def connect_sqlite(path: str, incremental_vacuum: bool = False) -> sqlite3.Connection:
+    """
+    Autocommit connection (transactions are explicit BEGIN ... COMMIT) in WAL
+    mode with NORMAL sync. check_same_thread is off: callers share it between
+    threads behind their own lock.
+    """
+    conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False, timeout=30)
+    if incremental_vacuum:
+        # Only takes effect on a new file
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    return conn
+
+
+def release_free_pages(conn: sqlite3.Connection):
+    """Hand the file's free pages back to the filesystem (auto_vacuum = INCREMENTAL)."""
+    # executescript steps the pragma to completion; execute() frees one page
+    conn.executescript("PRAGMA incremental_vacuum;")
@@ -0,0 +1,102 @@
+from typing import Any, Dict, List, Optional, Protocol, runtime_checkable
+
+from app.core.config import settings
+
+VECTOR_BACKENDS = ("local", "pinecone")
+
+Match = Dict[str, Any]
+
+
+@runtime_checkable
+class VectorBackend(Protocol):
+    """
+    What the API routes, the MCP server and the session reaper need from a
+    vector store.
+
+    Every operation has an async face for FastAPI handlers and a sync face
+    (``*_sync``) for synchronous callers such as MCP tools. Matches are
+    ``{"id", "score", "metadata"}`` dicts, best first; chunk text travels in
+    ``metadata["text_preview"]`` and the owning session in
+    ``metadata["session_id"]``. Vectors may be lists or an (n, dim) array;
+    the embedders hand over a contiguous float32 ndarray, which the local
+    engines store without unpacking it into Python floats.
+
+    Implemented by PineconeVectorAdapter (local SQLite engine),
+    ShardedVectorAdapter and PineconeRemoteBackend.
+    """
+    async def upsert(self, ids: List[str], vectors: List[List[float]], metadatas: List[Dict[str, Any]]): ...
+
+    async def query(self, vector: List[float], top_k: int, session_id: str = None, nprobe: Optional[int] = None,
+                    mode: str = "vector", query_text: Optional[str] = None) -> List[Match]: ...
+
+    async def query_many(self, vectors: List[List[float]], top_k: int, session_id: str = None,
+                         nprobe: Optional[int] = None, mode: str = "vector",
+                         query_texts: Optional[List[str]] = None) -> List[List[Match]]: ...
+
+    async def delete(self, ids: List[str]) -> int: ...
+
+    async def delete_session(self, session_id: str) -> int: ...
+
+    def upsert_sync(self, ids: List[str], vectors: List[List[float]], metadatas: List[Dict[str, Any]]): ...
+
+    def query_sync(self, vector: List[float], top_k: int, session_id: str = None, nprobe: Optional[int] = None,
+                   mode: str = "vector", query_text: Optional[str] = None) -> List[Match]: ...
+
+    def query_many_sync(self, vectors: List[List[float]], top_k: int, session_id: str = None,
+                        nprobe: Optional[int] = None, mode: str = "vector",
+                        query_texts: Optional[List[str]] = None) -> List[List[Match]]: ...
+
+    def delete_sync(self, ids: List[str]) -> int: ...
+
+    def delete_session_sync(self, session_id: str) -> int: ...
+
+    def expire_sessions(self, ttl_seconds: float) -> Dict[str, Any]: ...
+
+    def close(self): ...
+
+
+def create_vector_backend() -> VectorBackend:
+    """Build the backend selected by settings.vector_backend."""
+    if settings.vector_backend == "pinecone":
+        from app.core.pinecone_remote import PineconeRemoteBackend
+
+        if not settings.pinecone_host:
+            raise ValueError("vector_backend='pinecone' needs pinecone_host (the index host or a stand-in URL)")
+        return PineconeRemoteBackend(
+            host=settings.pinecone_host,
+            api_key=settings.pinecone_api_key,
+            namespace=settings.pinecone_namespace,
+            batch_size=settings.pinecone_upsert_batch_size,
+            max_concurrency=settings.pinecone_max_concurrency,
+        )
+    if settings.vector_backend != "local":
+        raise ValueError(f"Unknown vector backend: {settings.vector_backend!r}. Supported: {', '.join(VECTOR_BACKENDS)}")
+
+    from app.core.pineconeAdapter import PineconeVectorAdapter
+    from app.core.sharded_adapter import ShardedVectorAdapter
+
+    options = dict(
+        cache_max_bytes=settings.vector_cache_max_mb * 1024 * 1024,
+        ann_min_rows=settings.ann_min_rows,
+        ann_nprobe=settings.ann_nprobe,
+        ann_auto_train=settings.ann_auto_train,
+        quantization=settings.vector_quantization,
+        pq_subspaces=settings.pq_subspaces,
+        rerank_factor=settings.rerank_factor,
+        storage=settings.vector_storage,
+        compact_interval=settings.segment_compact_interval,
+    )
+    if settings.vector_shards > 1:
+        return ShardedVectorAdapter(settings.vector_shards, partition=settings.shard_partition, **options)
+    return PineconeVectorAdapter(**options)
+
+
+_vector_backend: Optional[VectorBackend] = None
+
+
+def get_vector_backend() -> VectorBackend:
+    """Process-wide backend, shared so caches and HTTP pools survive across requests."""
+    global _vector_backend
+    if _vector_backend is None:
+        _vector_backend = create_vector_backend()
+    return _vector_backend
@@ -0,0 +1,145 @@
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Hashable, List, Optional
+
+import numpy as np
+
+# Rough per-id bookkeeping cost (list slot + str header) used for budgeting
+_ID_OVERHEAD_BYTES = 64
+
+
+@dataclass
+class CachedMatrix:
+    """
+    A session's normalized vectors plus the chunk id of every row.
+
+    When quantizer is set, matrix holds its codes rather than float vectors.
+    """
+    ids: List[str]
+    matrix: np.ndarray
+    generation: int
+    quantizer: Any = None
+
+    @property
+    def dim(self) -> int:
+        return self.quantizer.dim if self.quantizer is not None else self.matrix.shape[1]
+
+    @property
+    def nbytes(self) -> int:
+        size = self.matrix.nbytes + sum(len(i) for i in self.ids) + _ID_OVERHEAD_BYTES * len(self.ids)
+        if self.quantizer is not None:
+            size += self.quantizer.nbytes
+        return size
+
+
+class SessionMatrixCache:
+    """
+    Thread-safe LRU of per-session vector matrices bounded by a byte budget.
+
+    Entries carry the store generation they were loaded at, so callers can
+    detect writes made by other processes and treat the entry as stale.
+    """
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, CachedMatrix]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, generation: int, dim: int) -> Optional[CachedMatrix]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.generation != generation or entry.dim != dim:
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: Hashable, entry: CachedMatrix):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            size = entry.nbytes
+            if size > self.max_bytes:
+                return
+            self._entries[key] = entry
+            self._bytes += size
+            self._evict()
+
+    def extend(self, key: Hashable, expected_generation: int, new_generation: int,
+               ids: List[str], matrix: np.ndarray):
+        """
+        Apply freshly upserted rows to a cached entry.
+
+        Only valid when the entry is exactly one write behind; otherwise some
+        other writer got in between and the entry is dropped instead.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            if entry.generation != expected_generation or entry.dim != matrix.shape[1]:
+                self._remove(key)
+                return
+            if entry.quantizer is not None:
+                matrix = entry.quantizer.encode(matrix)
+
+            # Build a fresh entry rather than mutating the old one, so readers
+            # holding a reference keep a consistent (ids, matrix) pair.
+            new_ids = list(entry.ids)
+            positions: Dict[str, int] = {vid: i for i, vid in enumerate(new_ids)}
+            rows = []
+            for vid in ids:
+                pos = positions.get(vid)
+                if pos is None:
+                    pos = positions[vid] = len(new_ids)
+                    new_ids.append(vid)
+                rows.append(pos)
+
+            new_matrix = np.empty((len(new_ids), entry.matrix.shape[1]), dtype=entry.matrix.dtype)
+            new_matrix[:entry.matrix.shape[0]] = entry.matrix
+            new_matrix[rows] = matrix
+
+            self._remove(key)
+            updated = CachedMatrix(ids=new_ids, matrix=new_matrix, generation=new_generation,
+                                   quantizer=entry.quantizer)
+            self._entries[key] = updated
+            self._bytes += updated.nbytes
+            self._evict()
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+    def _remove(self, key: Hashable):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.nbytes
+
+    def _evict(self):
+        while self._bytes > self.max_bytes and self._entries:
+            _, entry = self._entries.popitem(last=False)
+            self._bytes -= entry.nbytes
+            self.evictions += 1
@@ -1,8 +1,63 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
-from app.api.upload import router as upload_router
+from app.api.upload import get_ingest_queue, router as upload_router
 from app.api.chat import router as chat_router
+from app.api.sessions import router as sessions_router
+from app.core.config import settings
+from app.core.db import close_db, init_db
+from app.core.document_versions import versioning_enabled
+from app.core.embeddings import embedding_registry_stats, get_embedding_provider
+from app.core.near_dedup import close_dedup_index
+from app.core.pdf_extractor import close_pdf_extractor
+from app.core.session_reaper import SessionReaper
+from app.core.vector_backend import get_vector_backend
+
+logger = logging.getLogger("uvicorn.error")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load and warm the embedding model before the first upload or query needs it
+    loop = asyncio.get_running_loop()
+    provider = await loop.run_in_executor(None, get_embedding_provider, settings.embedding_model)
+    await loop.run_in_executor(None, provider.warm_up)
+    stats = provider.stats()
+    logger.info(
+        "Embedding model %s loaded in %.2fs (+%.0f MB RSS), warm-up %.3fs; process RSS %.0f MB",
+        stats["model"], stats["load_seconds"], stats["load_rss_mb"], stats["warmup_seconds"],
+        embedding_registry_stats()["rss_mb"],
+    )
+
+    if versioning_enabled():
+        await init_db()
+
+    reaper = None
+    if settings.session_ttl_seconds > 0:
+        reaper = SessionReaper(
+            get_vector_backend(),
+            settings.redis_url,
+            ttl_seconds=settings.session_ttl_seconds,
+            interval=settings.session_reap_interval,
+        )
+        reaper.start()
+    app.state.session_reaper = reaper
+
+    ingest_queue = get_ingest_queue()
+    ingest_queue.start()
+    yield
+    await ingest_queue.stop()
+    if reaper is not None:
+        reaper.stop()
+    close_pdf_extractor()
+    close_dedup_index()
+    await close_db()
+
 
-app = FastAPI(title="AuraRAG Chatbot Backend")
+app = FastAPI(title="AuraRAG Chatbot Backend", lifespan=lifespan)
 
 app.include_router(upload_router, prefix="/rag", tags=["upload"])
 app.include_router(chat_router, prefix="/rag", tags=["chat"])
+app.include_router(sessions_router, prefix="/rag", tags=["sessions"])
@@ -1,38 +1,70 @@
+from typing import Any, Dict, List, Optional, Tuple
+
 from fastmcp import FastMCP
 from googleapiclient.discovery import build
-from app.core.pineconeAdapter import PineconeVectorAdapter
-from app.core.embeddings import HFEmbeddingProvider
+from app.core.embeddings import get_embedding_provider
 from app.core.config import settings
+from app.core.query_cache import QueryCacheStats, QueryEmbeddingCache
+from app.core.vector_backend import get_vector_backend
 
 # ── MCP Server ────────────────────────────────────────────────────────────────
 mcp = FastMCP("AuraRAG Server")
 
 # ── Lazy initialization ───────────────────────────────────────────────────────
-_embeddings = None
-_vector_adapter = None
-
-
 def get_embeddings():
-    global _embeddings
-    if _embeddings is None:
-        _embeddings = HFEmbeddingProvider()
-    return _embeddings
+    return get_embedding_provider(settings.embedding_model)
 
 
 def get_vector_adapter():
-    global _vector_adapter
-    if _vector_adapter is None:
-        _vector_adapter = PineconeVectorAdapter(
-            api_key=settings.pinecone_api_key,
-            index_name=settings.pinecone_index_name,
-            dimension=settings.embedding_dimension,
+    return get_vector_backend()
+
+
+_query_cache: Optional[QueryEmbeddingCache] = None
+
+
+def get_query_cache() -> Optional[QueryEmbeddingCache]:
+    global _query_cache
+    if _query_cache is None and settings.query_cache_size > 0:
+        _query_cache = QueryEmbeddingCache(settings.query_cache_size, settings.query_cache_ttl_seconds)
+    return _query_cache
+
+
+def embed_search_queries(queries: List[str]) -> Tuple[Any, Optional[QueryCacheStats]]:
+    """
+    Query vectors, from the in-process LRU when this chat already asked the
+    same thing. Misses go through the shared disk cache, which carries
+    repeats across chats (each chat runs its own MCP server process).
+    """
+    embeddings = get_embeddings()
+    cache = get_query_cache()
+    if cache is None:
+        return embeddings.embed_queries(queries, cached=True), None
+    return cache.embed(queries, lambda misses: embeddings.embed_queries(misses, cached=True))
+
+
+def with_cache_stats(text: str, call: Optional[QueryCacheStats]) -> str:
+    cache = get_query_cache()
+    if cache is None:
+        return text
+    return f"{text}\n\n{cache.stats_line(call)}"
+
+
+def format_segments(results: List[Dict[str, Any]]) -> str:
+    chunks = []
+    for i, match in enumerate(results):
+        metadata = match.get("metadata", {})
+        text = metadata.get("text_preview") or metadata.get("text", "")
+        source = metadata.get("source", "Unknown Document")
+        score = match.get("score", 0.0)
+        chunks.append(
+            f"[Segment {i+1}] Source: {source} (Score: {score:.2f})\n---\n{text}\n---"
         )
-    return _vector_adapter
+    return "\n\n".join(chunks)
 
 
 # ── Tool 1: Document Search (Pinecone RAG) ────────────────────────────────────
 @mcp.tool
-def search_documents(query: str, session_id: str = None, top_k: int = 3) -> str:
+def search_documents(query: str, session_id: str = None, top_k: int = 3, mode: str = "vector") -> str:
     """
     Search the securely ingested document base for a user query.
 
@@ -40,34 +72,76 @@ def search_documents(query: str, session_id: str = None, top_k: int = 3) -> str:
         query: The search term or user question.
         session_id: Optional ID to restrict retrieval to a specific user session.
         top_k: Number of relevant document chunks to return (default 3).
+        mode: "vector" (semantic similarity, default), "keyword" (exact words,
+            identifiers, codes or names) or "hybrid" (both, rank-fused).
 
     Returns:
         Formatted string of relevant document segments with match scores.
     """
     try:
-        embeddings = get_embeddings()
         vector_adapter = get_vector_adapter()
 
-        query_vector = embeddings.embed_query(query)
-        results = vector_adapter.query(
-            vector=query_vector,
+        query_vectors, cache_stats = embed_search_queries([query])
+        results = vector_adapter.query_sync(
+            vector=query_vectors[0],
             top_k=top_k,
             session_id=session_id,
+            mode=mode,
+            query_text=query,
         )
 
         if not results:
-            return "No matching document segments found in the ingested base."
-
-        chunks = []
-        for i, match in enumerate(results):
-            text = match.get("metadata", {}).get("text", "")
-            source = match.get("metadata", {}).get("source", "Unknown Document")
-            score = match.get("score", 0.0)
-            chunks.append(
-                f"[Segment {i+1}] Source: {source} (Score: {score:.2f})\n---\n{text}\n---"
-            )
+            return with_cache_stats("No matching document segments found in the ingested base.", cache_stats)
+
+        return with_cache_stats(format_segments(results), cache_stats)
+
+    except Exception as e:
+        return f"Error searching documents: {str(e)}"
+
+
+@mcp.tool
+def search_documents_batch(queries: List[str], session_id: str = None, top_k: int = 3,
+                           mode: str = "vector") -> str:
+    """
+    Search the ingested document base for several queries at once.
+
+    Prefer this over repeated search_documents calls when a question breaks
+    into sub-questions: the queries are embedded together and scored in a
+    single pass over the session's vectors.
+
+    Args:
+        queries: The search terms or sub-questions.
+        session_id: Optional ID to restrict retrieval to a specific user session.
+        top_k: Number of relevant document chunks to return per query (default 3).
+        mode: "vector", "keyword" or "hybrid", as for search_documents.
+
+    Returns:
+        Document segments with match scores, grouped under each query.
+    """
+    try:
+        if not queries:
+            return "No queries given."
+
+        vector_adapter = get_vector_adapter()
+
+        query_vectors, cache_stats = embed_search_queries(queries)
+        batch_results = vector_adapter.query_many_sync(
+            vectors=query_vectors,
+            top_k=top_k,
+            session_id=session_id,
+            mode=mode,
+            query_texts=queries,
+        )
+
+        sections = []
+        for i, (query, results) in enumerate(zip(queries, batch_results)):
+            header = f"### Query {i+1}: {query}"
+            if not results:
+                sections.append(f"{header}\nNo matching document segments found in the ingested base.")
+            else:
+                sections.append(f"{header}\n\n{format_segments(results)}")
 
-        return "\n\n".join(chunks)
+        return with_cache_stats("\n\n".join(sections), cache_stats)
 
     except Exception as e:
         return f"Error searching documents: {str(e)}"
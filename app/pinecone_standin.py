@@ -0,0 +1,121 @@
+"""
+Local stand-in for the Pinecone data-plane API, backed by the SQLite vector
+store, for exercising and load-testing the remote backend offline.
+
+    uvicorn app.pinecone_standin:app --port 5081
+
+then run the app with VECTOR_BACKEND=pinecone and
+PINECONE_HOST=http://127.0.0.1:5081. Supports /vectors/upsert, /query,
+/vectors/delete and /describe_index_stats; the only metadata filter
+understood is equality on session_id. Namespaces are accepted and echoed
+but share one store. The Api-Key header is not checked.
+"""
+import os
+from typing import Any, Dict, List, Optional
+
+from fastapi import FastAPI, HTTPException
+from pydantic import BaseModel, Field
+
+from app.core.pineconeAdapter import PineconeVectorAdapter
+
+STANDIN_DB_PATH = os.environ.get("PINECONE_STANDIN_DB", "app/core/pinecone_standin.db")
+
+app = FastAPI(title="Pinecone data-plane stand-in")
+
+_adapter = None
+
+
+def get_adapter() -> PineconeVectorAdapter:
+    global _adapter
+    if _adapter is None:
+        _adapter = PineconeVectorAdapter(db_path=STANDIN_DB_PATH)
+    return _adapter
+
+
+# ── Request schemas (Pinecone field names) ────────────────────────────────────
+class Vector(BaseModel):
+    id: str
+    values: List[float]
+    metadata: Dict[str, Any] = Field(default_factory=dict)
+
+
+class UpsertRequest(BaseModel):
+    vectors: List[Vector]
+    namespace: str = ""
+
+
+class QueryRequest(BaseModel):
+    vector: List[float]
+    topK: int = Field(ge=1, le=10000)
+    filter: Optional[Dict[str, Any]] = None
+    includeMetadata: bool = False
+    includeValues: bool = False
+    namespace: str = ""
+
+
+class DeleteRequest(BaseModel):
+    ids: Optional[List[str]] = None
+    filter: Optional[Dict[str, Any]] = None
+    deleteAll: bool = False
+    namespace: str = ""
+
+
+def session_from_filter(metadata_filter: Optional[Dict[str, Any]]) -> Optional[str]:
+    """Accept {"session_id": x} or {"session_id": {"$eq": x}}; nothing else."""
+    if not metadata_filter:
+        return None
+    if set(metadata_filter) == {"session_id"}:
+        condition = metadata_filter["session_id"]
+        if isinstance(condition, str):
+            return condition
+        if isinstance(condition, dict) and set(condition) == {"$eq"} and isinstance(condition["$eq"], str):
+            return condition["$eq"]
+    raise HTTPException(status_code=400, detail="The stand-in only supports equality filters on session_id")
+
+
+# ── Endpoints ─────────────────────────────────────────────────────────────────
+@app.post("/vectors/upsert")
+async def upsert(request: UpsertRequest):
+    if not request.vectors:
+        return {"upsertedCount": 0}
+    await get_adapter().upsert(
+        ids=[v.id for v in request.vectors],
+        vectors=[v.values for v in request.vectors],
+        metadatas=[v.metadata for v in request.vectors],
+    )
+    return {"upsertedCount": len(request.vectors)}
+
+
+@app.post("/query")
+async def query(request: QueryRequest):
+    results = await get_adapter().query(
+        vector=request.vector,
+        top_k=request.topK,
+        session_id=session_from_filter(request.filter),
+    )
+    matches = []
+    for match in results:
+        item = {"id": match["id"], "score": match["score"]}
+        if request.includeMetadata:
+            item["metadata"] = match["metadata"]
+        matches.append(item)
+    return {"matches": matches, "namespace": request.namespace}
+
+
+@app.post("/vectors/delete")
+async def delete(request: DeleteRequest):
+    if request.deleteAll:
+        raise HTTPException(status_code=400, detail="deleteAll is not supported by the stand-in")
+    if request.ids:
+        return {"deletedCount": await get_adapter().delete(request.ids)}
+    session_id = session_from_filter(request.filter)
+    if session_id is None:
+        raise HTTPException(status_code=400, detail="Delete needs ids or a session_id filter")
+    return {"deletedCount": await get_adapter().delete_session(session_id)}
+
+
+@app.api_route("/describe_index_stats", methods=["GET", "POST"])
+async def describe_index_stats():
+    cursor = get_adapter()._connection().cursor()
+    total = cursor.execute("SELECT COUNT(*) FROM document_chunks").fetchone()[0]
+    return {"totalVectorCount": total, "namespaces": {"": {"vectorCount": total}}}
@@ -0,0 +1,78 @@
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from app.core.embedding_cache import EmbeddingCacheStats
+from app.core.ingest_pipeline import IngestSource, ingest_documents
+from app.core.pineconeAdapter import PineconeVectorAdapter
+
+# Many small documents: one pipeline run per file (the sidebar's one-by-one
+# uploads) vs one bulk run pooling all chunks. The stub embedder charges a
+# fixed cost per call plus a cost per text, roughly like a CPU forward pass;
+# upserts go to a real SQLite store.
+DOCS = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+WORDS_PER_DOC = 1500
+DIM = 384
+CALL_MS, TEXT_MS = 8.0, 0.5
+
+
+class StubEmbedder:
+    def __init__(self):
+        self.calls = 0
+
+    async def embed_with_stats(self, texts):
+        self.calls += 1
+        await asyncio.sleep((CALL_MS + TEXT_MS * len(texts)) / 1000)
+        return np.random.default_rng(0).normal(size=(len(texts), DIM)).astype(np.float32), EmbeddingCacheStats()
+
+
+def naming(session_id: str, name: str):
+    return (lambda i, text: f"{session_id}_{name}_chunk{i}",
+            lambda i, text: {"text_preview": text, "source": name, "session_id": session_id, "chunk_index": i})
+
+
+class CountingStore:
+    def __init__(self, adapter):
+        self.adapter = adapter
+        self.upserts = 0
+
+    async def upsert(self, ids, vectors, metadatas):
+        self.upserts += 1
+        await self.adapter.upsert(ids, vectors, metadatas)
+
+
+async def one_by_one(paths, store, embedder):
+    for path in paths:
+        source = IngestSource(path, "txt", *naming("bench_bulk_a", os.path.basename(path)))
+        await ingest_documents([source], embedder, store)
+
+
+async def bulk(paths, store, embedder):
+    sources = [IngestSource(path, "txt", *naming("bench_bulk_b", os.path.basename(path))) for path in paths]
+    await ingest_documents(sources, embedder, store, batch_size=1024, extract_concurrency=4)
+
+
+if __name__ == "__main__":
+    workdir = tempfile.mkdtemp()
+    paths = []
+    for d in range(DOCS):
+        path = os.path.join(workdir, f"doc{d:04d}.txt")
+        with open(path, "w") as f:
+            f.write(" ".join(f"d{d}w{i}" for i in range(WORDS_PER_DOC)))
+        paths.append(path)
+    adapter = PineconeVectorAdapter(db_path=os.path.join(workdir, "bench_bulk.db"))
+
+    print(f"{DOCS} documents of {WORDS_PER_DOC} words; embed cost {CALL_MS:g} ms/call + {TEXT_MS:g} ms/text")
+    for label, run in (("one by one", one_by_one), ("bulk", bulk)):
+        store, embedder = CountingStore(adapter), StubEmbedder()
+        start = time.perf_counter()
+        asyncio.run(run(paths, store, embedder))
+        elapsed = time.perf_counter() - start
+        print(f"   [{label}] {elapsed:.2f}s, {DOCS / elapsed:.1f} docs/s, "
+              f"{embedder.calls} embed calls, {store.upserts} upsert transactions")
@@ -0,0 +1,76 @@
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from app.core.embedding_cache import EmbeddingCacheStats
+from app.core.ingest_pipeline import IngestSource, content_chunk_ids, ingest_documents
+from app.core.pineconeAdapter import PineconeVectorAdapter
+
+# A large manual ingested in full, then again after a 1% edit (a few words
+# changed in scattered places plus one rewritten section), with the first
+# version's chunk ids as known_ids. Chunks are named by content hash in both
+# runs; fixed windows vs content-defined boundaries: an insertion shifts
+# every fixed window after it, so nothing past it can be reused.
+WORDS = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+DIM = 384
+CALL_MS, TEXT_MS = 8.0, 0.5
+
+
+class StubEmbedder:
+    def __init__(self):
+        self.texts = 0
+
+    async def embed_with_stats(self, texts):
+        self.texts += len(texts)
+        await asyncio.sleep((CALL_MS + TEXT_MS * len(texts)) / 1000)
+        return np.random.default_rng(0).normal(size=(len(texts), DIM)).astype(np.float32), EmbeddingCacheStats()
+
+
+def edit(words, fraction=0.01, seed=1):
+    """Rewrite half the budget as one section, spread the rest as single-word inserts."""
+    rng = random.Random(seed)
+    words = list(words)
+    budget = int(len(words) * fraction)
+    at = rng.randrange(len(words) - budget)
+    words[at:at + budget // 2] = [f"new{i}" for i in range(budget // 2)]
+    for i in range(budget // 2 // 50):
+        words.insert(rng.randrange(len(words)), f"ins{i}")
+    return words
+
+
+async def run(path, adapter, boundaries, known_ids=()):
+    source = IngestSource(path, "txt", content_chunk_ids("bench_inc_manual"),
+                          lambda i, text: {"text_preview": text, "session_id": "bench_inc"},
+                          known_ids=set(known_ids))
+    embedder = StubEmbedder()
+    start = time.perf_counter()
+    await ingest_documents([source], embedder, adapter, batch_size=256, boundaries=boundaries)
+    return source, embedder.texts, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    workdir = tempfile.mkdtemp()
+    rng = random.Random(0)
+    words = [f"w{rng.randrange(20000)}" for _ in range(WORDS)]
+    v1, v2 = os.path.join(workdir, "v1.txt"), os.path.join(workdir, "v2.txt")
+    with open(v1, "w") as f:
+        f.write(" ".join(words))
+    with open(v2, "w") as f:
+        f.write(" ".join(edit(words)))
+
+    print(f"{WORDS} words, 1% edit; embed cost {CALL_MS:g} ms/call + {TEXT_MS:g} ms/text")
+    for boundaries in ("fixed", "content"):
+        adapter = PineconeVectorAdapter(db_path=os.path.join(workdir, f"bench_inc_{boundaries}.db"))
+        first, full_texts, full_s = asyncio.run(run(v1, adapter, boundaries))
+        second, texts, seconds = asyncio.run(run(v2, adapter, boundaries, first.chunk_ids))
+        print(f"   [{boundaries}] full: {len(first.chunk_ids)} chunks in {full_s:.2f}s; "
+              f"re-ingest: {texts} embedded, {second.progress.chunks_reused} reused, "
+              f"{len(set(first.chunk_ids) - set(second.chunk_ids))} removed in {seconds:.2f}s "
+              f"({100 * texts / max(1, full_texts):.1f}% of a full ingest)")
@@ -0,0 +1,77 @@
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from app.core.pineconeAdapter import PineconeVectorAdapter, _encode_vector, _encode_vectors
+
+N_CHUNKS = 1000
+DIM = 384
+ROUNDS = 5
+# Optional: a sentence-transformers model to also measure length bucketing in the ONNX encoder
+MODEL = sys.argv[1] if len(sys.argv) > 1 else None
+
+rng = np.random.default_rng(0)
+encoded = rng.normal(size=(N_CHUNKS, DIM)).astype(np.float32)  # what encode() produced
+metadatas = [{"session_id": "bench_ingest_session", "text_preview": f"chunk {i}"} for i in range(N_CHUNKS)]
+
+
+def before():
+    # encode(convert_to_tensor=True).cpu().tolist(), ingest.py's float() pass, per-row normalize
+    rows = encoded.tolist()
+    clean = [[float(x) for x in row] for row in rows]
+    return [_encode_vector(v) for v in clean]
+
+
+def after():
+    # the float32 matrix goes straight to the adapter
+    return _encode_vectors(np.ascontiguousarray(encoded))
+
+
+def measure(fn):
+    times = []
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return min(times) * 1000, peak / 2**20
+
+
+print(f"1. Embedder output -> stored BLOBs, {N_CHUNKS} x {DIM} float32 (best of {ROUNDS})")
+for label, fn in (("lists + float() boxing", before), ("float32 ndarray", after)):
+    ms, peak_mb = measure(fn)
+    print(f"   [{label}] {ms:.1f} ms, peak {peak_mb:.1f} MB traced per {N_CHUNKS} chunks")
+assert before() == after() or np.allclose(
+    np.frombuffer(b"".join(before()), np.float32), np.frombuffer(b"".join(after()), np.float32), atol=1e-6
+)
+
+adapter = PineconeVectorAdapter(db_path=os.path.join(tempfile.mkdtemp(), "bench_ingest.db"))
+for label, vectors in (("lists", [[float(x) for x in row] for row in encoded.tolist()]), ("ndarray", encoded)):
+    ids = [f"{label}_chunk_{i}" for i in range(N_CHUNKS)]
+    start = time.perf_counter()
+    adapter._sync_upsert(ids, vectors, metadatas)
+    print(f"2. [{label}] full _sync_upsert: {(time.perf_counter() - start) * 1000:.1f} ms per {N_CHUNKS} chunks")
+
+if MODEL:
+    from app.core.onnx_embeddings import OnnxEmbeddingProvider
+
+    vocabulary = "the vector document query embedding chunk session search report revenue pipeline".split()
+    # Mixed lengths, as sentence chunking produces
+    texts = [" ".join(rng.choice(vocabulary, size=rng.integers(5, 250))) for _ in range(256)]
+    for bucket_size in (len(texts), 16):
+        provider = OnnxEmbeddingProvider(MODEL, model_dir=tempfile.mkdtemp(), bucket_size=bucket_size)
+        provider.warm_up()
+        start = time.perf_counter()
+        provider._embed_sync(texts)
+        elapsed = time.perf_counter() - start
+        print(f"3. [onnx, bucket_size={bucket_size}] {len(texts) / elapsed:.1f} chunks/s "
+              f"({elapsed * 1000 / len(texts) * N_CHUNKS:.0f} ms per {N_CHUNKS} chunks)")
@@ -0,0 +1,73 @@
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from app.core.embedding_cache import EmbeddingCacheStats
+from app.core.ingest_pipeline import IngestSource, ingest_documents
+from app.core.near_dedup import NearDuplicateIndex
+from app.core.pineconeAdapter import PineconeVectorAdapter
+
+# A bulk upload of contracts that share long boilerplate (terms, disclaimers)
+# with a word or two changed per document, ingested without dedup and with
+# each mode. The stub embedder charges per text it is given, like a model
+# without the embedding cache would.
+DOCS = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+BODY_WORDS, BOILERPLATE_WORDS = 2000, 3000
+DIM = 384
+CALL_MS, TEXT_MS = 8.0, 0.5
+
+
+class StubEmbedder:
+    def __init__(self):
+        self.texts = 0
+
+    async def embed_with_stats(self, texts):
+        self.texts += len(set(texts))  # repeats within a batch are embedded once
+        await asyncio.sleep((CALL_MS + TEXT_MS * len(set(texts))) / 1000)
+        return np.random.default_rng(0).normal(size=(len(texts), DIM)).astype(np.float32), EmbeddingCacheStats()
+
+
+async def run(paths, adapter, dedup):
+    sources = [IngestSource(path, "txt", lambda i, text, d=d: f"bench_dedup_{d}_chunk{i}",
+                            lambda i, text: {"text_preview": text, "session_id": "bench_dedup"})
+               for d, path in enumerate(paths)]
+    embedder = StubEmbedder()
+    start = time.perf_counter()
+    progress = await ingest_documents(sources, embedder, adapter, batch_size=1024, extract_concurrency=4,
+                                      dedup=dedup)
+    return progress, embedder.texts, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    workdir = tempfile.mkdtemp()
+    rng = random.Random(0)
+    boilerplate = [f"b{rng.randrange(5000)}" for _ in range(BOILERPLATE_WORDS)]
+    paths = []
+    for d in range(DOCS):
+        words = list(boilerplate)
+        words[rng.randrange(len(words))] = f"Party{d}"
+        path = os.path.join(workdir, f"contract{d:03d}.txt")
+        with open(path, "w") as f:
+            f.write(" ".join([f"d{d}w{rng.randrange(5000)}" for _ in range(BODY_WORDS)] + words))
+        paths.append(path)
+
+    print(f"{DOCS} documents of {BODY_WORDS} own + {BOILERPLATE_WORDS} shared words; "
+          f"embed cost {CALL_MS:g} ms/call + {TEXT_MS:g} ms/text")
+    for mode in (None, "skip", "link"):
+        adapter = PineconeVectorAdapter(db_path=os.path.join(workdir, f"bench_dedup_{mode}.db"))
+        dedup = None
+        if mode:
+            index = NearDuplicateIndex(os.path.join(workdir, f"dedup_{mode}.db"))
+            dedup = index.run("bench_dedup", "session", mode)
+        progress, texts, seconds = asyncio.run(run(paths, adapter, dedup))
+        stored = len(adapter.query_sync(np.ones(DIM, np.float32), top_k=100000, session_id="bench_dedup"))
+        print(f"   [{mode or 'no dedup'}] {seconds:.2f}s, {progress.chunks} chunks, "
+              f"{progress.chunks_duplicate} near-duplicates ({progress.chunks_duplicate / progress.chunks:.0%}), "
+              f"{texts} texts embedded, {stored} stored")
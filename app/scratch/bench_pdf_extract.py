@@ -0,0 +1,46 @@
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from reportlab.pdfgen import canvas
+
+from app.core.extract import iter_pdf_pages
+from app.core.pdf_extractor import PdfExtractor
+
+# Serial page extraction vs the process pool on a generated text-heavy PDF.
+PAGES = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+WORKERS = [1, 2, 4]
+
+
+def make_pdf(path: str):
+    c = canvas.Canvas(path)
+    for p in range(PAGES):
+        for line in range(48):
+            c.drawString(40, 800 - line * 16, " ".join(f"p{p}l{line}w{w}" for w in range(10)))
+        c.showPage()
+    c.save()
+
+
+if __name__ == "__main__":
+    path = os.path.join(tempfile.mkdtemp(), "bench_pdf_extract.pdf")
+    make_pdf(path)
+    print(f"{PAGES} pages, {os.path.getsize(path) / 2**20:.1f} MB")
+
+    start = time.perf_counter()
+    reference = list(iter_pdf_pages(path))
+    serial = time.perf_counter() - start
+    print(f"   [serial] {serial:.2f}s, {PAGES / serial:.0f} pages/s")
+
+    for workers in WORKERS:
+        extractor = PdfExtractor(workers=workers)
+        list(extractor.iter_pages(path))  # spawn the workers
+        start = time.perf_counter()
+        pages = list(extractor.iter_pages(path))
+        elapsed = time.perf_counter() - start
+        extractor.close()
+        assert pages == reference
+        print(f"   [{workers} workers] {elapsed:.2f}s, {PAGES / elapsed:.0f} pages/s, x{serial / elapsed:.1f}")
+    os.unlink(path)
@@ -0,0 +1,49 @@
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from app.core.pineconeAdapter import PineconeVectorAdapter
+
+N_CHUNKS = 20000
+DIM = 384
+N_QUERIES = 50
+TOP_K = 10
+session_id = "bench_quantization_session"
+
+rng = np.random.default_rng(0)
+topics = rng.normal(size=(200, DIM))
+vectors = (topics[rng.integers(0, len(topics), N_CHUNKS)] + 0.8 * rng.normal(size=(N_CHUNKS, DIM))).astype(np.float32)
+queries = topics[rng.integers(0, len(topics), N_QUERIES)] + 0.8 * rng.normal(size=(N_QUERIES, DIM))
+
+db_path = os.path.join(tempfile.mkdtemp(), "bench_vectors.db")
+# ann_min_rows=0 keeps every query on the cached (exact or quantized) path
+exact = PineconeVectorAdapter(db_path=db_path, ann_min_rows=0)
+print(f"1. Upserting {N_CHUNKS} random {DIM}-d chunks into {db_path}...")
+exact._sync_upsert(
+    [f"chunk_{i}" for i in range(N_CHUNKS)],
+    vectors,
+    [{"session_id": session_id, "text_preview": f"chunk {i}"} for i in range(N_CHUNKS)],
+)
+
+ground_truth = [{m["id"] for m in exact._sync_query(q, TOP_K, session_id)} for q in queries]
+print(f"   exact cache: {exact.cache_stats()['bytes'] / 1e6:.1f} MB")
+
+for kind in ("int8", "pq"):
+    adapter = PineconeVectorAdapter(db_path=db_path, ann_min_rows=0, quantization=kind)
+    start = time.perf_counter()
+    adapter.build_quantizer(kind)
+    print(f"\n2. [{kind}] trained + backfilled codes in {time.perf_counter() - start:.2f}s")
+
+    adapter._sync_query(queries[0], TOP_K, session_id)  # load the cache
+    start = time.perf_counter()
+    results = [{m["id"] for m in adapter._sync_query(q, TOP_K, session_id)} for q in queries]
+    elapsed = (time.perf_counter() - start) / N_QUERIES
+
+    recall = np.mean([len(r & g) / TOP_K for r, g in zip(results, ground_truth)])
+    print(f"   recall@{TOP_K}: {recall:.3f}")
+    print(f"   cache: {adapter.cache_stats()['bytes'] / 1e6:.1f} MB, {elapsed * 1000:.1f} ms/query")
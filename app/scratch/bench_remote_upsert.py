@@ -0,0 +1,94 @@
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(ROOT)
+
+from app.core.pinecone_remote import PineconeRemoteBackend
+
+N_CHUNKS = 10000
+DIM = 384
+CHUNK_CHARS = 500
+TOP_K = 5
+N_QUERIES = 200
+# (batch_size, max_concurrency)
+CONFIGS = [(100, 1), (100, 8), (500, 4), (1000, 8)]
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_standin(db_path: str, port: int) -> subprocess.Popen:
+    """Run app/pinecone_standin.py under uvicorn and wait until it answers."""
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.pinecone_standin:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT,
+        env={**os.environ, "PINECONE_STANDIN_DB": db_path},
+    )
+    for _ in range(100):
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/describe_index_stats", timeout=1)
+            return proc
+        except httpx.TransportError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError("stand-in did not start")
+
+
+def main():
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(N_CHUNKS, DIM)).astype(np.float32)
+    texts = ["x" * CHUNK_CHARS] * N_CHUNKS
+    workdir = tempfile.mkdtemp(prefix="bench_remote_")
+    port = free_port()
+    proc = start_standin(os.path.join(workdir, "standin.db"), port)
+    host = f"http://127.0.0.1:{port}"
+
+    try:
+        print(f"{N_CHUNKS} chunks x {DIM} dims against the local Pinecone stand-in")
+        for batch_size, concurrency in CONFIGS:
+            backend = PineconeRemoteBackend(host, batch_size=batch_size, max_concurrency=concurrency)
+            ids = [f"b{batch_size}_c{concurrency}_{i}" for i in range(N_CHUNKS)]
+            metadatas = [{"text_preview": t, "session_id": f"bench_{batch_size}_{concurrency}"} for t in texts]
+
+            start = time.perf_counter()
+            upserted = asyncio.run(backend.upsert(ids, vectors, metadatas))
+            elapsed = time.perf_counter() - start
+            print(f"  async upsert batch={batch_size:<5} concurrency={concurrency:<2} "
+                  f"{upserted / elapsed:9.0f} vectors/s")
+
+            start = time.perf_counter()
+            backend.upsert_sync(ids, vectors, metadatas)
+            elapsed = time.perf_counter() - start
+            print(f"  sync  upsert batch={batch_size:<5} concurrency={concurrency:<2} "
+                  f"{N_CHUNKS / elapsed:9.0f} vectors/s")
+            backend.close()
+
+        backend = PineconeRemoteBackend(host, max_concurrency=8)
+        session_id = f"bench_{CONFIGS[0][0]}_{CONFIGS[0][1]}"
+        queries = rng.normal(size=(N_QUERIES, DIM)).astype(np.float32)
+        start = time.perf_counter()
+        results = asyncio.run(backend.query_many(queries, TOP_K, session_id=session_id))
+        elapsed = time.perf_counter() - start
+        assert all(len(r) == TOP_K for r in results)
+        print(f"  {N_QUERIES} concurrent queries: {N_QUERIES / elapsed:.0f} queries/s")
+        print(f"  delete_session removed {backend.delete_session_sync(session_id)} vectors")
+        backend.close()
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+if __name__ == "__main__":
+    main()
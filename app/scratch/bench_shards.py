@@ -0,0 +1,78 @@
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from app.core.pineconeAdapter import PineconeVectorAdapter
+from app.core.sharded_adapter import ShardedVectorAdapter
+
+N_CHUNKS = 200000
+DIM = 384
+N_SESSIONS = 16
+N_QUERIES = 64
+TOP_K = 5
+SHARD_COUNTS = [1, 2, 4, os.cpu_count() or 1]
+
+
+def make_corpus(rng):
+    vectors = rng.normal(size=(N_CHUNKS, DIM)).astype(np.float32)
+    ids = [f"chunk_{i}" for i in range(N_CHUNKS)]
+    metadatas = [
+        {"text_preview": f"chunk {i}", "source": "bench", "session_id": f"session_{i % N_SESSIONS}"}
+        for i in range(N_CHUNKS)
+    ]
+    return ids, vectors, metadatas
+
+
+async def run_queries(adapter, queries, session_ids):
+    """Fire every query at once, as concurrent chat requests would."""
+    return await asyncio.gather(*(
+        adapter.query(q, TOP_K, session_id=s) for q, s in zip(queries, session_ids)
+    ))
+
+
+def main():
+    rng = np.random.default_rng(0)
+    ids, vectors, metadatas = make_corpus(rng)
+    queries = rng.normal(size=(N_QUERIES, DIM)).astype(np.float32)
+    workdir = tempfile.mkdtemp(prefix="bench_shards_")
+    # Exact search only, so every configuration returns the same results
+    options = dict(ann_min_rows=0, compact_interval=0)
+
+    try:
+        baseline = PineconeVectorAdapter(db_path=os.path.join(workdir, "single.db"), **options)
+        baseline._sync_upsert(ids, vectors, metadatas)
+        expected = [baseline._sync_query(q, TOP_K) for q in queries]
+
+        print(f"{N_CHUNKS} chunks x {DIM} dims, {N_QUERIES} concurrent queries, {os.cpu_count()} cores")
+        for partition in ("session", "chunk"):
+            for n in sorted(set(SHARD_COUNTS)):
+                adapter = ShardedVectorAdapter(n, partition=partition,
+                                               db_path=os.path.join(workdir, f"{partition}{n}.db"), **options)
+                adapter._sync_upsert(ids, vectors, metadatas)
+                for label, session_ids in (
+                    ("global", [None] * N_QUERIES),
+                    ("per-session", [f"session_{i % N_SESSIONS}" for i in range(N_QUERIES)]),
+                ):
+                    asyncio.run(run_queries(adapter, queries[:2], session_ids[:2]))  # warm the shard caches
+                    start = time.perf_counter()
+                    results = asyncio.run(run_queries(adapter, queries, session_ids))
+                    elapsed = time.perf_counter() - start
+                    line = f"{partition:>7} shards={n:<3} {label:<12} {N_QUERIES / elapsed:8.1f} queries/s"
+                    if label == "global":
+                        same = all([m["id"] for m in r] == [m["id"] for m in e] for r, e in zip(results, expected))
+                        line += f"  matches unsharded: {same}"
+                    print(line)
+                adapter.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from app.core.embedding_cache import EmbeddingCacheStats
+from app.core.ingest_pipeline import IngestSource, ingest_documents
+
+# Peak memory of ingesting one large text document: everything at once
+# (read, split, embed every chunk, upsert) vs the streaming pipeline.
+# A stub embedder and store isolate the pipeline's own memory from the model's.
+WORDS = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+DIM = 384
+CHUNK_SIZE, OVERLAP, BATCH_SIZE = 500, 50, 256
+
+path = os.path.join(tempfile.mkdtemp(), "bench_streaming.txt")
+with open(path, "w") as f:
+    for i in range(0, WORDS, 10000):
+        f.write(" ".join(f"token{j}" for j in range(i, min(i + 10000, WORDS))) + "\n")
+
+
+class StubEmbedder:
+    async def embed_with_stats(self, texts):
+        return np.ones((len(texts), DIM), dtype=np.float32), EmbeddingCacheStats(misses=len(texts))
+
+
+class StubStore:
+    def __init__(self):
+        self.rows = 0
+
+    async def upsert(self, ids, vectors, metadatas):
+        self.rows += len(ids)
+
+
+async def all_at_once(store):
+    # The old /rag/upload: whole file, whole text, every chunk and vector held together
+    with open(path, "rb") as f:
+        data = f.read()
+    words = data.decode("utf-8").split()
+    chunks = [" ".join(words[s:s + CHUNK_SIZE]) for s in range(0, len(words), CHUNK_SIZE - OVERLAP)]
+    vectors, _ = await StubEmbedder().embed_with_stats(chunks)
+    await store.upsert([f"chunk{i}" for i in range(len(chunks))], vectors, [{"text_preview": c} for c in chunks])
+
+
+async def streaming(store):
+    source = IngestSource(path, "txt", lambda i, text: f"chunk{i}", lambda i, text: {"text_preview": text})
+    await ingest_documents(
+        [source], StubEmbedder(), store, chunk_size=CHUNK_SIZE, overlap=OVERLAP, batch_size=BATCH_SIZE,
+    )
+
+
+size_mb = os.path.getsize(path) / 2**20
+print(f"{WORDS} words, {size_mb:.1f} MB on disk, batches of {BATCH_SIZE} chunks")
+for label, fn in (("all at once", all_at_once), ("streaming", streaming)):
+    store = StubStore()
+    tracemalloc.start()
+    start = time.perf_counter()
+    asyncio.run(fn(store))
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"   [{label}] {store.rows} chunks in {elapsed:.2f}s, peak {peak / 2**20:.1f} MB traced")
+os.unlink(path)
@@ -0,0 +1,77 @@
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from app.core.pineconeAdapter import EMBEDDING_DTYPE, PineconeVectorAdapter
+
+N_CHUNKS = 20000
+DIM = 384
+CHUNK_CHARS = 2000
+N_QUERIES = 20
+TOP_K = 5
+session_id = "bench_two_phase_session"
+
+
+def single_phase_query(adapter, query, top_k):
+    """The pre-two-phase query path: fetch and decode every row's metadata, then score."""
+    cursor = adapter._connection().cursor()
+    rows = cursor.execute(
+        "SELECT id, embedding, text_preview, metadata FROM document_chunks WHERE session_id = ?", (session_id,)
+    ).fetchall()
+    query = query / np.linalg.norm(query)
+    matches = []
+    for vid, blob, text_preview, meta_str in rows:
+        meta = json.loads(meta_str)
+        meta.setdefault("text_preview", text_preview)
+        score = float(np.frombuffer(blob, dtype=EMBEDDING_DTYPE) @ query)
+        matches.append({"id": vid, "score": score, "metadata": meta})
+    matches.sort(key=lambda m: m["score"], reverse=True)
+    return matches[:top_k]
+
+
+def measure(label, fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    for q in queries:
+        fn(q)
+    elapsed = (time.perf_counter() - start) / N_QUERIES
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"   {label:<12} {elapsed * 1000:8.1f} ms/query   peak alloc {peak / 1e6:8.1f} MB")
+
+
+rng = np.random.default_rng(0)
+vectors = rng.normal(size=(N_CHUNKS, DIM)).astype(np.float32)
+queries = rng.normal(size=(N_QUERIES, DIM))
+filler = "lorem ipsum dolor sit amet " * (CHUNK_CHARS // 27)
+
+db_path = os.path.join(tempfile.mkdtemp(), "bench_vectors.db")
+# Cache disabled and ANN off so both paths read every row from SQLite
+adapter = PineconeVectorAdapter(db_path=db_path, cache_max_bytes=0, ann_min_rows=0)
+print(f"1. Upserting {N_CHUNKS} chunks of ~{CHUNK_CHARS} chars into {db_path}...")
+adapter._sync_upsert(
+    [f"chunk_{i}" for i in range(N_CHUNKS)],
+    vectors,
+    [{"session_id": session_id, "source": "bench.pdf", "text_preview": f"{i} {filler}"} for i in range(N_CHUNKS)],
+)
+
+print(f"\n2. Querying top-{TOP_K} over the session ({N_QUERIES} queries each)...")
+measure("single-phase", lambda q: single_phase_query(adapter, q, TOP_K))
+measure("two-phase", lambda q: adapter._sync_query(q, TOP_K, session_id))
+
+cached = PineconeVectorAdapter(db_path=db_path, ann_min_rows=0)
+cached._sync_query(queries[0], TOP_K, session_id)  # warm the session matrix cache
+measure("+ cache", lambda q: cached._sync_query(q, TOP_K, session_id))
+
+same = all(
+    [m["id"] for m in single_phase_query(adapter, q, TOP_K)] == [m["id"] for m in adapter._sync_query(q, TOP_K, session_id)]
+    for q in queries
+)
+print(f"\n3. Identical results: {same}")
@@ -4,6 +4,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import streamlit as st
 import requests
+import time
 import uuid
 
 st.set_page_config(
@@ -174,6 +175,11 @@ with st.sidebar:
             st.toast("Copied session ID!")
     with col2:
         if st.button("Reset Chat"):
+            # Free the old session's chunks and history right away
+            try:
+                requests.delete(f"{FASTAPI_URL}/rag/sessions/{st.session_state.session_id}", timeout=10)
+            except requests.RequestException:
+                pass
             st.session_state.session_id = f"session_{uuid.uuid4().hex[:8]}"
             st.session_state.messages = []
             st.session_state.uploaded_docs = []
@@ -191,33 +197,68 @@ with st.sidebar:
 
     uploaded_files = st.file_uploader(
         "Upload documents",
-        type=["pdf", "txt", "md"],
+        type=["pdf", "txt", "md", "zip", "tar", "gz", "tgz", "bz2", "xz"],
         accept_multiple_files=True,
         label_visibility="collapsed",
     )
 
-    if uploaded_files:
-        for uploaded_file in uploaded_files:
-            # Only ingest files not already uploaded this session
-            if uploaded_file.name not in st.session_state.uploaded_docs:
-                with st.spinner(f"Ingesting {uploaded_file.name}..."):
-                    try:
-                        files = {"file": (uploaded_file.name, uploaded_file.getvalue(), uploaded_file.type)}
-                        params = {"session_id": st.session_state.session_id}
-                        res = requests.post(
-                            f"{FASTAPI_URL}/rag/upload",
-                            files=files,
-                            params=params,
-                            timeout=60,
+    # Only ingest files not already uploaded this session, all in one bulk job
+    new_files = [f for f in (uploaded_files or []) if f.name not in st.session_state.uploaded_docs]
+    if new_files:
+        try:
+            files = [("files", (f.name, f.getvalue(), f.type)) for f in new_files]
+            params = {"session_id": st.session_state.session_id}
+            # Returns once the files are queued; ingestion is polled below
+            res = requests.post(
+                f"{FASTAPI_URL}/rag/upload/bulk",
+                files=files,
+                params=params,
+                timeout=60,
+            )
+            if res.status_code != 202:
+                st.error(f"Failed to ingest {len(new_files)} file(s): {res.json().get('detail', 'Unknown error')}")
+            else:
+                job = res.json()
+                bar = st.progress(0.0, text=f"Queued {len(new_files)} file(s)...")
+                while job["status"] in ("queued", "running"):
+                    time.sleep(1)
+                    job = requests.get(f"{FASTAPI_URL}/rag/jobs/{job['job_id']}", timeout=10).json()
+                    progress = job["progress"]
+                    if job["status"] == "running" and progress.get("chunks"):
+                        bar.progress(
+                            min(1.0, (progress["chunks_upserted"] + progress.get("chunks_reused", 0))
+                                / progress["chunks"]),
+                            text=f"{progress['documents']} document(s) read, "
+                                 f"{progress['chunks_embedded']}/{progress['chunks']} chunks embedded, "
+                                 f"{progress['chunks_upserted']} stored",
                         )
-                        if res.status_code == 200:
-                            data = res.json()
-                            st.session_state.uploaded_docs.append(uploaded_file.name)
-                            st.toast(f"✅ {uploaded_file.name} ingested ({data.get('chunks', '?')} chunks)")
-                        else:
-                            st.error(f"Failed to ingest {uploaded_file.name}: {res.json().get('detail', 'Unknown error')}")
-                    except Exception as e:
-                        st.error(f"Upload error: {str(e)}")
+                bar.empty()
+
+                if job["status"] == "succeeded":
+                    data = job["result"]
+                    for result in data["files"]:
+                        if result["status"] in ("ingested", "unchanged"):
+                            st.session_state.uploaded_docs.append(result["filename"])
+                        elif result["status"] == "failed":
+                            st.error(f"Failed to ingest {result['filename']}: {result['error']}")
+                    # Archives are remembered by name too, so they are not sent again
+                    for f in new_files:
+                        if f.name.lower().endswith((".zip", ".tar", ".gz", ".tgz")):
+                            st.session_state.uploaded_docs.append(f.name)
+                    cache = data.get("embedding_cache") or {}
+                    reused = f", {cache['hits']:.0f} reused from cache" if cache.get("hits") else ""
+                    if data.get("chunks_reused"):
+                        reused += f", {data['chunks_reused']} unchanged since the last version"
+                    if data.get("chunks_duplicate"):
+                        reused += f", {data['dedup_ratio']:.0%} near-duplicates"
+                    st.toast(
+                        f"✅ {data['documents']} document(s) ingested ({data['chunks']} chunks{reused}, "
+                        f"{data['docs_per_second']:.1f} docs/s)"
+                    )
+                else:
+                    st.error(f"Failed to ingest {len(new_files)} file(s): {job.get('error') or 'Unknown error'}")
+        except Exception as e:
+            st.error(f"Upload error: {str(e)}")
 
     # Show ingested docs
     if st.session_state.uploaded_docs:
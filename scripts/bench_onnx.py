@@ -0,0 +1,51 @@
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.embeddings import HFEmbeddingProvider
+from app.core.onnx_embeddings import OnnxEmbeddingProvider
+
+MODEL = sys.argv[1] if len(sys.argv) > 1 else "all-MiniLM-L6-v2"
+N_CHUNKS = 512
+BATCH = 64
+N_QUERIES = 200
+INTRA_OP_THREADS = int(os.environ.get("ONNX_INTRA_OP_THREADS", "0"))
+
+rng = np.random.default_rng(0)
+vocabulary = ("the vector document query embedding chunk session search report revenue pipeline "
+              "conference passphrase latency throughput index shard cache model").split()
+chunks = [" ".join(rng.choice(vocabulary, size=rng.integers(150, 350))) for _ in range(N_CHUNKS)]
+queries = [" ".join(rng.choice(vocabulary, size=rng.integers(4, 16))) for _ in range(N_QUERIES)]
+
+model_dir = tempfile.mkdtemp()
+backends = [
+    ("torch", lambda: HFEmbeddingProvider(MODEL)),
+    ("onnx", lambda: OnnxEmbeddingProvider(MODEL, model_dir=model_dir, intra_op_threads=INTRA_OP_THREADS)),
+    ("onnx-int8", lambda: OnnxEmbeddingProvider(MODEL, model_dir=model_dir, quantize=True,
+                                                intra_op_threads=INTRA_OP_THREADS)),
+]
+
+print(f"{N_CHUNKS} chunks of 150-350 words in batches of {BATCH}; {N_QUERIES} single-query embeds\n")
+for label, make in backends:
+    provider = make()
+    provider.warm_up()
+
+    start = time.perf_counter()
+    for i in range(0, N_CHUNKS, BATCH):
+        provider._embed_sync(chunks[i:i + BATCH])
+    throughput = N_CHUNKS / (time.perf_counter() - start)
+
+    latencies = []
+    for q in queries:
+        start = time.perf_counter()
+        provider._embed_sync([q])
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    print(f"[{label}] load {provider.load_seconds:.2f}s (+{provider.load_rss_bytes / 2**20:.0f} MB RSS), "
+          f"{throughput:.1f} chunks/s, query p50 {np.percentile(latencies, 50):.2f} ms, "
+          f"p99 {np.percentile(latencies, 99):.2f} ms")
@@ -0,0 +1,41 @@
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.embeddings import HFEmbeddingProvider
+from app.core.onnx_embeddings import OnnxEmbeddingProvider
+
+MODEL = sys.argv[1] if len(sys.argv) > 1 else "all-MiniLM-L6-v2"
+# Minimum per-text cosine similarity against the torch embedding
+THRESHOLDS = {"onnx": 0.9999, "onnx-int8": 0.99}
+
+texts = [
+    "What is the secret passphrase for the 2026 conference?",
+    "vector search",
+    "The quarterly report covers revenue, churn and the new document ingestion pipeline. " * 3,
+    "Richa's favorite color is deep violet.",
+    " ".join(f"word{i}" for i in range(400)),  # longer than max_seq_length: exercises truncation
+    "a",
+]
+
+model_dir = tempfile.mkdtemp()
+print(f"1. Embedding {len(texts)} texts with torch ({MODEL})...")
+reference = np.asarray(HFEmbeddingProvider(MODEL)._embed_sync(texts))
+
+failed = False
+for label, quantize in (("onnx", False), ("onnx-int8", True)):
+    provider = OnnxEmbeddingProvider(MODEL, model_dir=model_dir, quantize=quantize)
+    vectors = np.asarray(provider._embed_sync(texts))
+    cosine = (vectors * reference).sum(axis=1) / (
+        np.linalg.norm(vectors, axis=1) * np.linalg.norm(reference, axis=1)
+    )
+    ok = cosine.min() >= THRESHOLDS[label]
+    failed |= not ok
+    print(f"2. [{label}] cosine vs torch: min {cosine.min():.6f}, mean {cosine.mean():.6f} "
+          f"(threshold {THRESHOLDS[label]}) {'✅' if ok else '❌'}")
+
+sys.exit(1 if failed else 0)